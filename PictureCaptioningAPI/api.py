@@ -1,77 +1,86 @@
 from flask import Flask, request, jsonify
 from PIL import Image
 import requests
-import io
+import os
 
-# Import các thành phần cụ thể cho mô hình VisionEncoderDecoderModel
-from transformers import ViTImageProcessor, AutoTokenizer, VisionEncoderDecoderModel
+# Shim tương thích: dùng chung engine caption với ToolScoring (ToolScoring/caption_engine.py),
+# không còn bản code tải model / generate_caption riêng. Thư mục ToolScoring phải nằm trên
+# PYTHONPATH (xem RunScritpt.txt).
+try:
+    from caption_engine import CaptionEngine
+    from image_decode import ImageDecodeError, decode_image
+    from model_loader import ComponentUnavailable
+except ImportError as e:
+    raise ImportError(
+        f"{e}. PictureCaptioningAPI uses the caption engine from ToolScoring: "
+        "add the ToolScoring directory to PYTHONPATH (see RunScritpt.txt)."
+    ) from e
 
 app = Flask(__name__)
 
-# --- CẤU HÌNH VÀ TẢI MÔ HÌNH CỦA BẠN TẠY ĐÂY ---
-model_name = "nlpconnect/vit-gpt2-image-captioning"
+# Nếu đặt URL của ToolScoring (vd. http://localhost:5000), shim chỉ chuyển tiếp /caption
+# sang đó và không tải model: cả hai dịch vụ dùng đúng một bản trọng số.
+CAPTION_UPSTREAM_URL = os.getenv("CAPTION_UPSTREAM_URL", "").rstrip("/")
+CAPTION_DOWNLOAD_TIMEOUT = float(os.getenv("CAPTION_DOWNLOAD_TIMEOUT", "20"))
+CAPTION_MAX_IMAGE_BYTES = int(os.getenv("CAPTION_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
 
-try:
-    # Tải bộ xử lý ảnh (Feature Extractor)
-    # Bộ xử lý này sẽ chuẩn bị ảnh (resize, normalize) cho mô hình
-    feature_extractor = ViTImageProcessor.from_pretrained(model_name)
-    
-    # Tải bộ mã hóa/giải mã văn bản (Tokenizer)
-    # Dùng để chuyển đổi văn bản thành token ID và ngược lại
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    # Một số tokenizer (ví dụ GPT-2) không có pad token, dẫn đến cảnh báo attention_mask
-    # Thiết lập pad_token = eos_token để tránh cảnh báo và xử lý padding đúng
-    if tokenizer.pad_token is None:
-        tokenizer.pad_token = tokenizer.eos_token
-    
-    # Tải mô hình VisionEncoderDecoderModel
-    # Đây là mô hình chính kết hợp Vision Transformer (ViT) và GPT-2
-    model = VisionEncoderDecoderModel.from_pretrained(model_name)
-    
-    # Cấu hình một số tham số tạo văn bản cho mô hình
-    # Đây là các tham số giúp mô hình tạo ra chú thích tốt hơn
-    # Sử dụng BOS làm token bắt đầu cho decoder nếu có, fallback về CLS
-    model.config.decoder_start_token_id = getattr(tokenizer, "bos_token_id", None) or tokenizer.cls_token_id
-    # Thiết lập EOS và PAD thống nhất để tránh cảnh báo khi generate
-    model.config.eos_token_id = tokenizer.eos_token_id
-    model.config.pad_token_id = tokenizer.pad_token_id
-    model.config.vocab_size = model.config.decoder.vocab_size
-    
-    # Nếu có GPU, di chuyển mô hình sang GPU để tăng tốc
-    import torch
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model.to(device)
-    
-    print(f"Mô hình {model_name} đã được tải thành công trên {device}.")
-    
-except Exception as e:
-    print(f"Lỗi khi tải mô hình {model_name}: {e}")
-    # Xử lý lỗi nếu không thể tải mô hình (ví dụ: không có kết nối internet, tên mô hình sai)
-    exit(1) # Thoát ứng dụng nếu mô hình không thể tải
-
-# Hàm để tạo chú thích từ ảnh (thay thế pipeline)
-def generate_caption(image_input):
-    # Tiền xử lý ảnh và chuyển đổi thành tensor
-    pixel_values = feature_extractor(images=image_input, return_tensors="pt").pixel_values
-    
-    # Di chuyển pixel_values sang cùng thiết bị với mô hình (CPU/GPU)
-    pixel_values = pixel_values.to(device)
-    
-    # Cấu hình tham số tạo văn bản (generation parameters)
-    # max_length: độ dài tối đa của chú thích
-    # num_beams: số lượng "tia" tìm kiếm để chọn câu tốt nhất (beam search)
-    gen_kwargs = {"max_length": 16, "num_beams": 4} 
-    
-    # Tạo văn bản (chú thích)
-    output_ids = model.generate(pixel_values, **gen_kwargs)
-    
-    # Giải mã các ID token thành văn bản
-    preds = tokenizer.batch_decode(output_ids, skip_special_tokens=True)
-    
-    # Loại bỏ khoảng trắng thừa
-    caption_text = preds[0].strip()
-    
-    return caption_text
+engine = None
+if not CAPTION_UPSTREAM_URL:
+    engine = CaptionEngine(
+        default_mode=os.getenv("CAPTION_DECODING", "beam4"),
+        quantize=os.getenv("CAPTION_QUANTIZE", "false").lower() == "true",
+    )
+    # Tải model trên thread nền; lỗi tải trả về 503 thay vì thoát ứng dụng
+    engine.component.start_background()
+
+
+def download_image(image_url):
+    """Tải ảnh có timeout và giới hạn kích thước."""
+    with requests.get(image_url, stream=True, timeout=CAPTION_DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()  # Ném lỗi cho phản hồi HTTP không thành công
+        content = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            content.extend(chunk)
+            if len(content) > CAPTION_MAX_IMAGE_BYTES:
+                raise requests.exceptions.RequestException(
+                    f"Image exceeds {CAPTION_MAX_IMAGE_BYTES} bytes"
+                )
+    return bytes(content)
+
+
+def forward_caption(image_url):
+    try:
+        response = requests.post(
+            f"{CAPTION_UPSTREAM_URL}/caption",
+            json={'imageUrl': image_url},
+            timeout=CAPTION_DOWNLOAD_TIMEOUT * 3,
+        )
+    except requests.exceptions.RequestException as e:
+        return jsonify({'error': f'Caption service unavailable: {e}'}), 503
+
+    # Upstream lỗi / proxy trả HTML thay vì JSON -> 502 kèm thông tin đủ để chẩn đoán
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    body = None
+    if content_type == 'application/json':
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+    if not isinstance(body, dict):
+        return jsonify({
+            'error': f'Caption service returned an invalid response '
+                     f'(HTTP {response.status_code}, Content-Type {content_type or "none"}).'
+        }), 502
+
+    if response.ok:
+        caption = body.get('caption')
+        if not isinstance(caption, str):
+            return jsonify({'error': 'Caption service response has no caption.'}), 502
+        return jsonify({'caption': caption})
+    # FastAPI trả lỗi dạng {"detail": ...}; giữ định dạng {"error": ...} của API cũ.
+    # 4xx (ảnh sai, quá lớn...) và 503 (model đang tải) giữ nguyên status; lỗi 5xx khác là 502
+    status = response.status_code if response.status_code < 500 or response.status_code == 503 else 502
+    return jsonify({'error': body.get('detail', body)}), status
 
 
 @app.route('/caption', methods=['POST'])
@@ -82,17 +91,14 @@ def get_image_caption():
     if not image_url:
         return jsonify({'error': 'imageUrl is required'}), 400
 
-    try:
-        # Tải ảnh từ URL
-        response = requests.get(image_url, stream=True)
-        response.raise_for_status() # Ném lỗi cho phản hồi HTTP không thành công
+    if CAPTION_UPSTREAM_URL:
+        return forward_caption(image_url)
 
-        # Đọc nội dung ảnh vào bộ nhớ và mở bằng Pillow
-        # Đảm bảo chuyển đổi sang "RGB" để có định dạng màu chuẩn
-        image = Image.open(io.BytesIO(response.content)).convert("RGB")
+    try:
+        # Decode RGB thẳng về kích thước input của model (JPEG draft mode)
+        image = decode_image(download_image(image_url), engine.input_size)
 
-        # Gọi hàm tạo chú thích của chúng ta
-        caption_text = generate_caption(image)
+        caption_text = engine.generate_caption(image)
 
         return jsonify({'caption': caption_text})
 
@@ -100,6 +106,10 @@ def get_image_caption():
         return jsonify({'error': f'Failed to download image from URL: {e}'}), 500
     except Image.UnidentifiedImageError:
         return jsonify({'error': 'The provided URL does not point to a valid image.'}), 400
+    except ImageDecodeError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except ComponentUnavailable as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': f'An unexpected error occurred: {e}'}), 500
 
@@ -107,4 +117,4 @@ if __name__ == '__main__':
     # Chạy Flask app. Trong môi trường dev, bạn có thể dùng debug=True.
     # Trong môi trường sản phẩm, hãy dùng một WSGI server như Gunicorn hoặc uWSGI.
     # Đảm bảo cổng này không trùng với ứng dụng ASP.NET của bạn.
-    app.run(host='0.0.0.0', port=5000, debug=True,use_reloader=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=int(os.getenv("PORT", "5000")), debug=True,use_reloader=False)
@@ -1,18 +1,45 @@
 # app.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import io
-import requests
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
+from pydantic import BaseModel, model_validator
+import os
+import asyncio
+import re
+import threading
+import time
+from typing import List
 
 # --- Image captioning dependencies ---
 from PIL import Image, UnidentifiedImageError
-from transformers import ViTImageProcessor, AutoTokenizer, VisionEncoderDecoderModel
 import torch
+from image_fetch import ALLOWED_EXTRA_CONTENT_TYPES, ImageDownloadError, create_http_client, download_image
+from caption_cache import CaptionCache, content_hash
+from caption_decoding import DECODING_MODES, resolve_mode, variant_key
+from caption_engine import MODEL_NAME as CAPTION_MODEL_NAME, CaptionEngine
+from image_decode import DEFAULT_MAX_PIXELS, ImageDecodeError, decode_image as decode_model_input
 
 # --- NLP scoring dependencies ---
 import language_tool_python
+from grammar_pool import GrammarCheckError, GrammarToolPool
+from grammar_cache import GrammarCache, GrammarMatch, rules_signature
 from sentence_transformers import SentenceTransformer, util
+from embedding_cache import EmbeddingCache
+from encoder_backends import load_onnx_encoder, parity_check
+from lexicon import Lexicon
+from word_tiers import ADVANCED, BUSINESS, INTERMEDIATE, TIER_SCORES, get_word_tiers
+from streaming import SentenceChecker, TranscriptAccumulator
+from job_queue import JobError, JobQueue, JobQueueFull, JobStore, PriorityClass
+from callback_url import CallbackURLRejected, check_callback_url
+from word_alignment import align_words
+from negation import find_negated_clauses
+from prompt_registry import PromptArtifacts, PromptRegistry, build_prompt_artifacts
+from model_loader import ComponentUnavailable, LazyComponent
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsRegistry, TrackedThreadPoolExecutor
+from score_trace import ScoreTrace, create_async_logger, log_trace, start_trace
 
 # -----------------------------------------------------------------------------
 # Khởi tạo FastAPI + CORS
@@ -34,177 +61,693 @@ app.add_middleware(
 )
 
 # -----------------------------------------------------------------------------
-# Tải model cho IMAGE CAPTIONING (giữ nguyên logic từ api.py)
+# Logging + trace breakdown của /score_nlp
 # -----------------------------------------------------------------------------
-model_name = "nlpconnect/vit-gpt2-image-captioning"
+# SCORE_LOG_LEVEL=INFO để ghi các trace được lấy mẫu; mặc định chỉ ghi cảnh báo
+SCORE_LOG_LEVEL = os.getenv("SCORE_LOG_LEVEL", "WARNING")
+# Tỉ lệ request được trace ngẫu nhiên (0 = tắt); request có explain=true luôn được trace
+SCORE_TRACE_SAMPLE_RATE = float(os.getenv("SCORE_TRACE_SAMPLE_RATE", "0"))
+score_logger = create_async_logger("scoring", SCORE_LOG_LEVEL)
 
-try:
-    feature_extractor = ViTImageProcessor.from_pretrained(model_name)
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    if tokenizer.pad_token is None:
-        tokenizer.pad_token = tokenizer.eos_token
+# -----------------------------------------------------------------------------
+# Metrics (Prometheus text format tại GET /metrics)
+# -----------------------------------------------------------------------------
+metrics = MetricsRegistry()
+
+SCORING_PART_CODES = {"SPEAKING_PART_1", "SPEAKING_PART_2", "SPEAKING_PART_3", "SPEAKING_PART_4", "SPEAKING_PART_5"}
 
-    vision2text_model = VisionEncoderDecoderModel.from_pretrained(model_name)
+def part_label(part_code: str) -> str:
+    """Giới hạn giá trị label part_code (tránh label tùy ý từ client)."""
+    if not part_code:
+        return "none"
+    if part_code == "MIXED":  # một lần gọi phục vụ nhiều part (/score_nlp/batch)
+        return "mixed"
+    return part_code if part_code in SCORING_PART_CODES else "other"
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    vision2text_model.to(device)
+# stage: grammar_check | embedding_encode | contradiction | vocabulary | total
+scoring_stage_seconds = metrics.histogram(
+    "scoring_stage_seconds", "Latency of each /score_nlp pipeline stage", ("stage", "part_code")
+)
+scoring_requests_total = metrics.counter(
+    "scoring_requests_total", "Scored answers (single and batch)", ("part_code",)
+)
+embedding_texts_total = metrics.counter(
+    "embedding_texts_total", "Texts sent to the sentence encoder (before cache lookup)", ("part_code",)
+)
+# stage: download | decode | generate (generate đo theo batch, label theo chế độ decode)
+caption_stage_seconds = metrics.histogram(
+    "caption_stage_seconds", "Latency of each /caption pipeline stage", ("stage", "mode")
+)
+caption_batch_size = metrics.histogram(
+    "caption_batch_size", "Images per caption generate call", ("mode",), buckets=(1, 2, 4, 8, 16, 32)
+)
+caption_requests_total = metrics.counter(
+    "caption_requests_total", "Caption requests by outcome", ("result",)
+)
+http_request_seconds = metrics.histogram(
+    "http_request_seconds", "End-to-end HTTP request latency", ("method", "path", "status")
+)
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("path",)
+)
+streaming_sessions_active = metrics.gauge(
+    "streaming_sessions_active", "Open /score_nlp/stream WebSocket sessions"
+)
+jobs_submitted_total = metrics.counter(
+    "jobs_submitted_total", "Job submissions by outcome (accepted / rejected with 429)", ("kind", "priority", "outcome")
+)
 
-    # Thiết lập tham số decoder giống bản gốc
-    vision2text_model.config.decoder_start_token_id = getattr(tokenizer, "bos_token_id", None) or tokenizer.cls_token_id
-    vision2text_model.config.eos_token_id = tokenizer.eos_token_id
-    vision2text_model.config.pad_token_id = tokenizer.pad_token_id
-    vision2text_model.config.vocab_size = vision2text_model.config.decoder.vocab_size
+def queue_depths() -> dict:
+    """Số việc đang chờ trong từng hàng đợi nội bộ (đọc lúc scrape)."""
+    depths = {
+        ("caption_batcher",): caption_batcher.queue_depth,
+        # Task chưa xong (đang chờ + đang chạy), đếm bởi TrackedThreadPoolExecutor
+        ("grammar_batch",): grammar_executor.pending,
+        ("caption_decode",): decode_executor.pending,
+    }
+    if grammar_component.ready:
+        depths[("grammar_pool",)] = sum(w["in_flight"] for w in grammar_component.get().status())
+    for priority, depth in job_queue.queue_depths().items():
+        depths[(f"jobs_{priority}",)] = depth
+    return depths
 
-    print(f"[Caption] Loaded {model_name} on {device}")
-except Exception as e:
-    # Nếu không tải được model thì raise lỗi ngay khi khởi động
-    raise RuntimeError(f"Failed to load caption model '{model_name}': {e}")
+metrics.gauge("queue_depth", "Pending work items per internal queue", ("queue",), callback=queue_depths)
 
-def generate_caption(image_input: Image.Image) -> str:
-    """
-    Sinh caption cho ảnh. Giữ nguyên tham số sinh từ api.py.
-    """
-    pixel_values = feature_extractor(images=image_input, return_tensors="pt").pixel_values.to(device)
-    gen_kwargs = {"max_length": 16, "num_beams": 4}
-    output_ids = vision2text_model.generate(pixel_values, **gen_kwargs)
-    preds = tokenizer.batch_decode(output_ids, skip_special_tokens=True)
-    return preds[0].strip()
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """In-flight + latency theo route (dùng path template để label không bùng nổ)."""
+    # Route chưa được resolve trước call_next: chỉ giữ path tĩnh đã đăng ký
+    path = request.url.path
+    if path not in {getattr(route, "path", None) for route in app.routes}:
+        path = "other"
+    http_requests_in_flight.inc(path=path)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_requests_in_flight.dec(path=path)
+        route = request.scope.get("route")
+        http_request_seconds.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
 
 # -----------------------------------------------------------------------------
-# Tải công cụ cho NLP SCORING (giữ nguyên logic từ main.py)
+# Cấu hình subsystem: chỉ tải những gì instance này cần
 # -----------------------------------------------------------------------------
-grammar_tool = language_tool_python.LanguageTool('en-US')
+# ENABLED_SUBSYSTEMS: danh sách trong {caption, grammar, semantic}, mặc định tất cả
+# MODEL_LOAD_MODE:
+#   background - tải + warmup trên thread nền khi app khởi động (mặc định)
+#   lazy       - chỉ tải khi request đầu tiên cần đến
+#   eager      - tải đồng bộ ngay khi import app
+ENABLED_SUBSYSTEMS = {
+    s.strip().lower() for s in os.getenv("ENABLED_SUBSYSTEMS", "caption,grammar,semantic").split(",") if s.strip()
+}
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "background").lower()
+
+# Số thread intra-op của torch cho process này (0 = mặc định của torch = số core).
+# Khi chạy nhiều worker, đặt sao cho workers x threads <= số core (xem gunicorn.conf.py).
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+
+def configure_torch_threads(num_threads: int = TORCH_NUM_THREADS) -> None:
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+configure_torch_threads()
 
+def require(component: LazyComponent):
+    """component.get(), chuyển lỗi subsystem bị tắt / tải lỗi thành HTTP 503."""
+    try:
+        return component.get()
+    except ComponentUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# -----------------------------------------------------------------------------
+# Model IMAGE CAPTIONING (caption_engine.py, dùng chung với PictureCaptioningAPI/api.py)
+# -----------------------------------------------------------------------------
+# Chế độ decode mặc định của deployment (beam4 = cấu hình gốc, beam2 / greedy = nhanh hơn);
+# mỗi request có thể chọn riêng qua CaptionRequest.decoding
+CAPTION_DECODING = resolve_mode(os.getenv("CAPTION_DECODING", "beam4"))
+# Quantize dynamic int8 model caption khi chạy trên CPU
+CAPTION_QUANTIZE = os.getenv("CAPTION_QUANTIZE", "false").lower() == "true"
+
+# Micro-batching: gom các request /caption đồng thời vào một lần generate
+CAPTION_MAX_BATCH_SIZE = int(os.getenv("CAPTION_MAX_BATCH_SIZE", "8"))
+CAPTION_MAX_WAIT_MS = float(os.getenv("CAPTION_MAX_WAIT_MS", "20"))
+
+def observe_caption_batch(mode: str, seconds: float, images: int) -> None:
+    caption_stage_seconds.observe(seconds, stage="generate", mode=mode)
+    caption_batch_size.observe(images, mode=mode)
+
+caption_engine = CaptionEngine(
+    CAPTION_MODEL_NAME,
+    default_mode=CAPTION_DECODING,
+    quantize=CAPTION_QUANTIZE,
+    max_batch_size=CAPTION_MAX_BATCH_SIZE,
+    max_wait_ms=CAPTION_MAX_WAIT_MS,
+    enabled="caption" in ENABLED_SUBSYSTEMS,
+    on_batch=observe_caption_batch,
+)
+caption_component = caption_engine.component
+caption_batcher = caption_engine.batcher
+caption_latency = caption_engine.latency
+generate_caption = caption_engine.generate_caption
+
+# -----------------------------------------------------------------------------
+# Tải công cụ cho NLP SCORING (giữ nguyên logic từ main.py)
+# -----------------------------------------------------------------------------
 # CRITICAL: Configure for spoken language (less strict than written)
 # Disable overly formal rules that flag natural speech
-grammar_tool.disabled_rules = {
+GRAMMAR_DISABLED_RULES = {
     'SENT_START_NUM',              # "2 people are..." OK in speaking
     'WHITESPACE_RULE',             # Less critical in transcripts
     'EN_QUOTES',                   # Quote formatting not critical
     'EN_UNPAIRED_BRACKETS',        # Transcripts may be incomplete
 }
 
-semantic_model = SentenceTransformer('all-MiniLM-L6-v2')
+# Pool LanguageTool: mỗi backend là một JVM riêng, phân phối round-robin
+GRAMMAR_POOL_SIZE = int(os.getenv("GRAMMAR_POOL_SIZE", "1"))
+GRAMMAR_CHECK_TIMEOUT = float(os.getenv("GRAMMAR_CHECK_TIMEOUT", "15"))
+GRAMMAR_HEALTH_CHECK_INTERVAL = float(os.getenv("GRAMMAR_HEALTH_CHECK_INTERVAL", "30"))
+# Số request chờ tối đa trên mỗi backend; vượt quá -> 503 ngay (không restart backend)
+GRAMMAR_MAX_QUEUE = int(os.getenv("GRAMMAR_MAX_QUEUE", "32"))
+# Tùy chọn: chỉ chạy các category LanguageTool cần cho phân loại lỗi
+# (ví dụ "GRAMMAR,TYPOS,CONFUSED_WORDS"). Để trống = chạy tất cả rule như cũ.
+GRAMMAR_ENABLED_CATEGORIES = {
+    c.strip().upper() for c in os.getenv("GRAMMAR_ENABLED_CATEGORIES", "").split(",") if c.strip()
+}
+
+# Tùy chọn: URL của một LanguageTool server chạy riêng (vd. http://localhost:8081).
+# Khi đặt, mọi worker / backend trong pool chỉ là client HTTP tới server đó (không tự chạy JVM).
+GRAMMAR_REMOTE_SERVER = os.getenv("GRAMMAR_REMOTE_SERVER", "")
+
+def create_grammar_tool():
+    if GRAMMAR_REMOTE_SERVER:
+        tool = language_tool_python.LanguageTool('en-US', remote_server=GRAMMAR_REMOTE_SERVER)
+    else:
+        tool = language_tool_python.LanguageTool('en-US')
+    tool.disabled_rules = set(GRAMMAR_DISABLED_RULES)
+    if GRAMMAR_ENABLED_CATEGORIES:
+        tool.enabled_categories = set(GRAMMAR_ENABLED_CATEGORIES)
+        tool.enabled_rules_only = True
+    return tool
+
+def load_grammar_pool() -> GrammarToolPool:
+    pool = GrammarToolPool(
+        create_grammar_tool,
+        size=GRAMMAR_POOL_SIZE,
+        check_timeout=GRAMMAR_CHECK_TIMEOUT,
+        health_check_interval=GRAMMAR_HEALTH_CHECK_INTERVAL,
+        max_queue=GRAMMAR_MAX_QUEUE,
+    )
+    pool.start_supervisor()
+    return pool
+
+grammar_component = LazyComponent(
+    "grammar",
+    load_grammar_pool,
+    warmup=lambda pool: pool.check("This is a warmup sentence for the grammar checker."),
+    enabled="grammar" in ENABLED_SUBSYSTEMS,
+)
+
+# Cache kết quả LanguageTool (retry từ backend C#, chấm lại, câu trả lời trùng)
+GRAMMAR_CACHE_SIZE = int(os.getenv("GRAMMAR_CACHE_SIZE", "4096"))
+GRAMMAR_CACHE_PATH = os.getenv("GRAMMAR_CACHE_PATH", "")  # để trống = chỉ cache trong bộ nhớ
+# Tầng SQLite: giới hạn số dòng + TTL, dọn mỗi N lần ghi (giống CaptionCache)
+GRAMMAR_CACHE_DISK_MAX_ENTRIES = int(os.getenv("GRAMMAR_CACHE_DISK_MAX_ENTRIES", "100000"))
+GRAMMAR_CACHE_TTL_SECONDS = float(os.getenv("GRAMMAR_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+GRAMMAR_CACHE_EVICT_EVERY = int(os.getenv("GRAMMAR_CACHE_EVICT_EVERY", "64"))
+grammar_cache = GrammarCache(
+    rules_signature(GRAMMAR_DISABLED_RULES, GRAMMAR_ENABLED_CATEGORIES),
+    max_entries=GRAMMAR_CACHE_SIZE,
+    path=GRAMMAR_CACHE_PATH or None,
+    disk_max_entries=GRAMMAR_CACHE_DISK_MAX_ENTRIES,
+    ttl_seconds=GRAMMAR_CACHE_TTL_SECONDS,
+    evict_every=GRAMMAR_CACHE_EVICT_EVERY,
+)
+
+def check_grammar(text: str, part_code: str = None) -> List[GrammarMatch]:
+    """
+    grammar_pool.check có cache; chuyển lỗi timeout/backend thành HTTP 503.
+    Trả về GrammarMatch (ruleId, category, offset, errorLength).
+    """
+    with scoring_stage_seconds.time(stage="grammar_check", part_code=part_label(part_code)):
+        cached = grammar_cache.get(text)
+        if cached is not None:
+            return cached
+        grammar_pool = require(grammar_component)
+        try:
+            matches = [GrammarMatch.from_match(m) for m in grammar_pool.check(text)]
+        except GrammarCheckError as e:
+            raise HTTPException(status_code=503, detail=f"Grammar check unavailable: {e}")
+        grammar_cache.put(text, matches)
+        return matches
+
+# Cache embedding cho question / sample answer (lặp lại giữa các thí sinh);
+# model được gắn vào khi semantic_component tải xong
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+embedding_cache = EmbeddingCache(None, max_entries=EMBEDDING_CACHE_SIZE)
+
+# Backend encoder: "torch" (SentenceTransformer) hoặc "onnx" (ONNX Runtime CPU, tùy chọn int8)
+SEMANTIC_BACKEND = os.getenv("SEMANTIC_BACKEND", "torch").lower()
+SEMANTIC_ONNX_DIR = os.getenv("SEMANTIC_ONNX_DIR", "onnx_minilm")
+SEMANTIC_ONNX_QUANTIZE = os.getenv("SEMANTIC_ONNX_QUANTIZE", "false").lower() == "true"
+SEMANTIC_ONNX_THREADS = int(os.getenv("SEMANTIC_ONNX_THREADS", "0"))
+# Khi bật: so sánh cosine similarity với backend torch lúc khởi động, lệch quá tolerance thì quay về torch
+SEMANTIC_PARITY_CHECK = os.getenv("SEMANTIC_PARITY_CHECK", "false").lower() == "true"
+SEMANTIC_PARITY_TOLERANCE = float(os.getenv("SEMANTIC_PARITY_TOLERANCE", "0.02"))
+
+def load_semantic_model() -> EmbeddingCache:
+    if SEMANTIC_BACKEND == "onnx":
+        encoder = load_onnx_encoder(
+            SEMANTIC_ONNX_DIR, quantize=SEMANTIC_ONNX_QUANTIZE, intra_op_threads=SEMANTIC_ONNX_THREADS
+        )
+        if SEMANTIC_PARITY_CHECK:
+            reference = SentenceTransformer('all-MiniLM-L6-v2')
+            result = parity_check(reference, encoder, tolerance=SEMANTIC_PARITY_TOLERANCE)
+            print(f"[Semantic] ONNX parity check: {result}")
+            if not result["ok"]:
+                print("[Semantic] Parity check failed, falling back to the torch backend")
+                encoder = reference
+        print(f"[Semantic] Using encoder backend: {type(encoder).__name__}")
+    else:
+        encoder = SentenceTransformer('all-MiniLM-L6-v2')
+    embedding_cache.model = encoder
+    return embedding_cache
+
+semantic_component = LazyComponent(
+    "semantic",
+    load_semantic_model,
+    warmup=lambda cache: cache.model.encode(["warmup sentence"], convert_to_tensor=True),
+    enabled="semantic" in ENABLED_SUBSYSTEMS,
+)
+
+def get_embedding_cache() -> EmbeddingCache:
+    return require(semantic_component)
+
+def encode_texts(texts: List[str], cache, part_code: str = None):
+    """get_embedding_cache().encode_many có đo thời gian (mỗi lần gọi encoder là một sample)."""
+    label = part_label(part_code)
+    encoder = get_embedding_cache()
+    with scoring_stage_seconds.time(stage="embedding_encode", part_code=label):
+        embeddings = encoder.encode_many(texts, cache=cache)
+    embedding_texts_total.inc(len(texts), part_code=label)
+    return embeddings
+
+# Bảng tier tần suất từ cho vocabulary scoring (build từ wordfreq, hoặc đọc file đã build sẵn)
+WORD_TIER_TABLE_PATH = os.getenv("WORD_TIER_TABLE_PATH", "")
+
+subsystems = [caption_component, grammar_component, semantic_component]
+
+# gunicorn --preload (gunicorn.conf.py đặt SERVE_PRELOAD=true): LanguageTool không được tải
+# trong master. JVM thuộc về process tạo ra nó (close() khi restart và hook atexit của
+# language_tool_python đều tắt JVM), nên mỗi worker tự tải pool riêng sau fork.
+SERVE_PRELOAD = os.getenv("SERVE_PRELOAD", "false").lower() == "true"
+FORK_LOCAL_SUBSYSTEMS = {grammar_component.name}
+
+if MODEL_LOAD_MODE == "eager":
+    for component in subsystems:
+        if component.enabled and not (SERVE_PRELOAD and component.name in FORK_LOCAL_SUBSYSTEMS):
+            component.load()
+    get_word_tiers(WORD_TIER_TABLE_PATH or None)
+
+@app.on_event("startup")
+def start_background_loading():
+    if MODEL_LOAD_MODE == "background":
+        for component in subsystems:
+            component.start_background()
+        threading.Thread(
+            target=get_word_tiers, args=(WORD_TIER_TABLE_PATH or None,), name="load-word-tiers", daemon=True
+        ).start()
+
+@app.get("/ready")
+def readiness():
+    """
+    Trạng thái từng subsystem; 200 khi mọi subsystem được bật đã READY, 503 nếu chưa.
+    """
+    states = {component.name: component.status() for component in subsystems}
+    is_ready = all(component.ready for component in subsystems if component.enabled)
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, "subsystems": states})
+
+# Artifact tính sẵn cho từng prompt đã đăng ký (keywords, embedding, ...).
+# PROMPT_REGISTRY_PATH: file SQLite dùng chung giữa các worker (bắt buộc khi chạy nhiều
+# worker, nếu không prompt chỉ tồn tại trong worker đã nhận request đăng ký).
+PROMPT_REGISTRY_PATH = os.getenv("PROMPT_REGISTRY_PATH", "")
+
+def prompt_encoder(part_code: str = None):
+    """Encoder để tính sẵn embedding cho prompt; Read Aloud không dùng embedding (không cần semantic)."""
+    if (part_code or "").upper() == "SPEAKING_PART_1":
+        return None
+    return get_embedding_cache()
+
+prompt_registry = PromptRegistry(
+    PROMPT_REGISTRY_PATH or None,
+    builder=lambda question, sample_answer, part_code, prompt_id: build_prompt_artifacts(
+        question, sample_answer, part_code, prompt_id=prompt_id, encoder=prompt_encoder(part_code),
+    ),
+)
 
 # -----------------------------------------------------------------------------
 # Pydantic models
 # -----------------------------------------------------------------------------
 class ScoreRequest(BaseModel):
     transcript: str
-    sample_answer: str
+    sample_answer: str = ""  # Bắt buộc nếu không có prompt_id
     question: str = ""  # NEW: Question text for QA relevance detection
     part_code: str = None  # Optional: e.g., "SPEAKING_PART_1" for Read Aloud
+    prompt_id: str = None  # Optional: dùng artifact của prompt đã đăng ký thay cho question/sample_answer
+    explain: bool = False  # Optional: trả về breakdown (dimension, penalty, bonus) trong response
+    include_alignment: bool = False  # Optional (Part 1): trả về căn chỉnh từng từ với bài đọc
+
+    @model_validator(mode="after")
+    def require_sample_or_prompt(self):
+        # Như trước khi có prompt_id: thiếu sample_answer -> 422, không chấm với sample rỗng
+        if not self.prompt_id and "sample_answer" not in self.model_fields_set:
+            raise ValueError("sample_answer is required when prompt_id is not given")
+        return self
+
+class PromptRegistrationRequest(BaseModel):
+    prompt_id: str
+    sample_answer: str
+    question: str = ""
+    part_code: str = None
+
+class PromptRegistrationResponse(BaseModel):
+    prompt_id: str
+    part_code: str = None
+    question_keywords: List[str]
+    sample_length: int
 
 class ScoreResponse(BaseModel):
     grammar_score: float
     content_score: float
     vocabulary_score: float
+    breakdown: dict = None  # Chỉ có khi request gửi explain=true
+    alignment: dict = None  # Chỉ có với Read Aloud khi request gửi include_alignment=true
+
+class BatchScoreRequest(BaseModel):
+    items: List[ScoreRequest]
+
+class BatchScoreResponse(BaseModel):
+    results: List[ScoreResponse]
 
 class CaptionRequest(BaseModel):
-    imageUrl: str
+    imageUrl: str = None
+    imagePath: str = None  # Optional: đường dẫn tương đối trong CAPTION_LOCAL_IMAGE_DIR (thay cho imageUrl)
+    decoding: str = None  # Optional: "beam4" | "beam2" | "greedy" (mặc định theo CAPTION_DECODING)
 
 class CaptionResponse(BaseModel):
     caption: str
 
+# -----------------------------------------------------------------------------
+# Lexicon cho chấm điểm: mọi danh sách từ được biên dịch một lần khi khởi động
+# và quét transcript trong một lượt (so khớp theo ranh giới từ)
+# -----------------------------------------------------------------------------
+FILLER_WORDS = ['uh', 'um', 'mmm', 'hmm', 'er', 'ah']
+
+# Complex sentence markers
+COMPLEX_MARKERS = ['although', 'though', 'even though', 'because', 'since', 'while', 'whereas', 'if', 'unless', 'until']
+COMPOUND_MARKERS = ['and', 'but', 'or', 'so', 'yet']
+
+# Passive voice detection (simple heuristic)
+PASSIVE_INDICATORS = ['was', 'were', 'been', 'being']
+
+DISCOURSE_MARKERS = {
+    'sequencing': ['first', 'second', 'third', 'finally', 'lastly', 'next', 'then'],
+    'addition': ['in addition', 'furthermore', 'moreover', 'also', 'besides'],
+    'contrast': ['however', 'on the other hand', 'although', 'but', 'yet', 'nevertheless'],
+    'conclusion': ['in conclusion', 'to sum up', 'overall', 'in summary', 'therefore']
+}
+
+# Opinion/Response quality markers (for speaking tasks)
+OPINION_MARKERS = ['i think', 'i believe', 'in my opinion', 'from my perspective', 'i feel']
+REASONING_MARKERS = ['because', 'therefore', 'so', 'thus', 'as a result', 'consequently']
+EXAMPLE_MARKERS = ['for example', 'for instance', 'such as', 'like']
+
+# Part 2: Descriptive Vocabulary
+DESCRIPTIVE_WORDS = {
+    'visual': ['see', 'picture', 'image', 'show', 'display', 'appear', 'visible'],
+    'colors': ['red', 'blue', 'green', 'yellow', 'white', 'black', 'colorful', 'vibrant', 'bright', 'dark'],
+    'positions': ['front', 'behind', 'next to', 'above', 'below', 'left', 'right', 'center', 'background', 'foreground'],
+    'sizes': ['large', 'small', 'big', 'tiny', 'huge', 'massive', 'little'],
+    'actions': ['walking', 'talking', 'selling', 'buying', 'standing', 'sitting', 'running', 'working'],
+    'adjectives': ['beautiful', 'busy', 'crowded', 'peaceful', 'lively', 'quiet', 'modern', 'old', 'new']
+}
+
+# Collocations & Phrasal Verbs
+COMMON_COLLOCATIONS = [
+    'make decision', 'take responsibility', 'carry out', 'put forward',
+    'bring up', 'look forward to', 'get along', 'work out', 'find out',
+    'take place', 'make sense', 'pay attention', 'keep in mind',
+    'deal with', 'focus on', 'depend on', 'participate in'
+]
+
+NON_WORD_RE = re.compile(r'[^\w]')
+
+scoring_lexicon = Lexicon({
+    'filler': FILLER_WORDS,
+    'complex': COMPLEX_MARKERS,
+    'compound': COMPOUND_MARKERS,
+    'passive': PASSIVE_INDICATORS,
+    **{f'discourse_{category}': markers for category, markers in DISCOURSE_MARKERS.items()},
+    'opinion': OPINION_MARKERS,
+    'reasoning': REASONING_MARKERS,
+    'example': EXAMPLE_MARKERS,
+    **{f'descriptive_{category}': words for category, words in DESCRIPTIVE_WORDS.items()},
+    'collocation': COMMON_COLLOCATIONS,
+})
+
 # -----------------------------------------------------------------------------
 # Contradiction Detection (for Part 2)
 # -----------------------------------------------------------------------------
-def detect_semantic_contradiction(transcript_text: str, sample_answer_text: str) -> float:
+CONTRADICTION_MAX_CLAUSES = int(os.getenv("CONTRADICTION_MAX_CLAUSES", "8"))
+
+def extract_negated_clauses(transcript_text: str) -> list:
+    """
+    Tìm các mệnh đề có từ phủ định (theo token, xem negation.py) và trả về
+    list (clause, clean_clause), trong đó clean_clause là nội dung bị phủ định
+    sau khi bỏ / đổi từ phủ định. Tối đa CONTRADICTION_MAX_CLAUSES mệnh đề.
+    """
+    return find_negated_clauses(transcript_text, CONTRADICTION_MAX_CLAUSES)
+
+def detect_semantic_contradiction(transcript_text: str, sample_answer_text: str,
+                                  negated_clauses: list = None,
+                                  clause_embeddings=None, emb_sample=None,
+                                  trace: ScoreTrace = None) -> float:
     """
     INTELLIGENT contradiction detection using Semantic Similarity + Negation Analysis.
     
     Strategy:
-    1. Find sentences with negation words (not, no, cannot, nobody, etc.)
-    2. Remove negation words to get the actual content being negated
+    1. Find clauses with negation tokens (not, no, cannot, nobody, n't, etc.)
+    2. Remove / flip negation words to get the actual content being negated
     3. Compare semantic similarity between negated content and sample answer
     4. If similarity is HIGH → CONTRADICTION!
     
     Example:
         Sample: "people walking in the market"
         Transcript: "I cannot see anyone"
-        → Remove "cannot": "I see anyone"
+        → "cannot" -> "can": "i can see anyone"
         → Similarity("see anyone", "people walking") = HIGH
         → CONTRADICTION!
     
+    Khi được gọi từ /score_nlp, các embedding đã được tính sẵn trong một lần
+    encode batch (negated_clauses, clause_embeddings, emb_sample); nếu không
+    truyền vào thì hàm tự encode tất cả clause + sample trong một lần gọi.
+    Chi tiết từng clause bị phạt được ghi vào `trace` (nếu có).
+    
     Returns: Contradiction penalty (0-50 points)
     """
-    import re
-    
-    negation_words = [
-        'not', 'no', 'cannot', "can't", 'cant',
-        'nobody', 'no one', 'noone', 'nothing', 'nowhere',
-        'neither', 'never', 'none', 'without'
-    ]
-    
-    sentences = re.split(r'[.!?]+', transcript_text)
-    sentences = [s.strip() for s in sentences if s.strip()]
+    if negated_clauses is None:
+        negated_clauses = extract_negated_clauses(transcript_text)
+    if not negated_clauses:
+        return 0
     
     contradiction_penalty = 0
     
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        has_negation = any(neg in sentence_lower for neg in negation_words)
-        
-        if has_negation:
-            clean_sentence = sentence_lower
-            for neg in negation_words:
-                clean_sentence = clean_sentence.replace(neg, ' ')
-            clean_sentence = ' '.join(clean_sentence.split()).strip()
-            
-            if len(clean_sentence) < 5:
-                continue
+    try:
+        if trace is not None:
+            trace.record("contradiction", negated_clauses=len(negated_clauses))
+        if clause_embeddings is None or emb_sample is None:
+            embs = encode_texts(
+                [sample_answer_text] + [clean for _, clean in negated_clauses],
+                cache=[True] + [False] * len(negated_clauses),
+                part_code="SPEAKING_PART_2",
+            )
+            emb_sample, clause_embeddings = embs[0], embs[1:]
+        similarities = util.cos_sim(clause_embeddings, emb_sample)[:, 0].tolist()
+    except Exception as e:
+        score_logger.warning("Contradiction detection error: %s", e)
+        return 0
+    
+    for (sentence, clean_sentence), similarity_score in zip(negated_clauses, similarities):
+        if similarity_score > 0.45:
+            penalty_amount = similarity_score * 80
+            contradiction_penalty += penalty_amount
             
-            try:
-                emb_clean = semantic_model.encode(clean_sentence, convert_to_tensor=True)
-                emb_sample = semantic_model.encode(sample_answer_text, convert_to_tensor=True)
-                similarity = util.cos_sim(emb_clean, emb_sample)
-                similarity_score = float(similarity.item())
-                
-                if similarity_score > 0.45:
-                    penalty_amount = similarity_score * 80
-                    contradiction_penalty += penalty_amount
-                    
-                    print(f"[CONTRADICTION] Negation + high similarity ({similarity_score:.2f}): '{sentence}'")
-                    print(f"  → Negated content: '{clean_sentence}' vs Sample: '{sample_answer_text[:50]}...'")
-                    print(f"  → Penalty: {penalty_amount:.1f} points")
-            except Exception as e:
-                print(f"[WARNING] Contradiction detection error: {e}")
+            if trace is not None:
+                trace.append("contradiction", "clauses", {
+                    "sentence": sentence,
+                    "negated_content": clean_sentence,
+                    "similarity": round(similarity_score, 4),
+                    "penalty": round(penalty_amount, 2),
+                })
     
     final_penalty = min(contradiction_penalty, 50)
-    if final_penalty > 0:
-        print(f"[CONTRADICTION] Total penalty: {final_penalty:.1f} points")
+    if trace is not None:
+        trace.record("contradiction", total_penalty=round(final_penalty, 2))
     
     return final_penalty
 
 # -----------------------------------------------------------------------------
 # Endpoint: NLP Scoring (giữ nguyên thuật toán từ main.py)
 # -----------------------------------------------------------------------------
-@app.post("/score_nlp", response_model=ScoreResponse)
+def get_prompt_artifacts(request: ScoreRequest) -> PromptArtifacts:
+    """
+    Lấy artifact của prompt đã đăng ký (prompt_id), hoặc tính tại chỗ từ
+    question / sample_answer trong request (không có embedding sẵn).
+    """
+    if request.prompt_id:
+        prompt = prompt_registry.get(request.prompt_id)
+        if prompt is None:
+            raise HTTPException(status_code=404, detail=f"Prompt '{request.prompt_id}' is not registered")
+        return prompt
+    return build_prompt_artifacts(request.question, request.sample_answer, request.part_code)
+
+def resolve_part_code(request: ScoreRequest, prompt: PromptArtifacts) -> str:
+    return (request.part_code or prompt.part_code or "").upper()
+
+def needs_nlp_analysis(request: ScoreRequest, prompt: PromptArtifacts) -> bool:
+    """Read Aloud và transcript rỗng không cần LanguageTool hay embedding."""
+    transcript_text = request.transcript.strip() if request.transcript else ""
+    return bool(transcript_text) and resolve_part_code(request, prompt) != "SPEAKING_PART_1"
+
+def embedding_inputs(request: ScoreRequest, prompt: PromptArtifacts):
+    """
+    Liệt kê các text cần embedding cho một request (theo đúng thứ tự mà
+    score_request sử dụng): question, transcript, sample answer, rồi các
+    clause phủ định của Part 2. Với prompt đã đăng ký, question và sample
+    answer đã có embedding nên chỉ còn transcript + clause.
+
+    Returns: (texts, cache_flags, negated_clauses) - rỗng nếu request không cần embedding.
+    """
+    if not needs_nlp_analysis(request, prompt):
+        return [], [], []
+    
+    transcript_text = request.transcript.strip()
+    part_code = resolve_part_code(request, prompt)
+    
+    negated_clauses = extract_negated_clauses(transcript_text) if part_code == "SPEAKING_PART_2" else []
+    clause_texts = [clean for _, clean in negated_clauses]
+    if prompt.question_embedding is not None:
+        texts = [transcript_text] + clause_texts
+        flags = [False] * len(texts)
+    else:
+        texts = [prompt.question_text, transcript_text, prompt.sample_answer_text] + clause_texts
+        flags = [True, False, True] + [False] * len(negated_clauses)
+    return texts, flags, negated_clauses
+
+def unpack_embeddings(prompt: PromptArtifacts, embeddings):
+    """Tách ma trận embedding thành (question, transcript, sample, clauses)."""
+    if prompt.question_embedding is not None:
+        return prompt.question_embedding, embeddings[0], prompt.sample_embedding, embeddings[1:]
+    return embeddings[0], embeddings[1], embeddings[2], embeddings[3:]
+
+@app.post("/prompts", response_model=PromptRegistrationResponse)
+def register_prompt(body: PromptRegistrationRequest):
+    """
+    Đăng ký / cập nhật một prompt: keywords, từ của bài Read Aloud, độ dài sample
+    và embedding của question + sample answer được tính một lần tại đây.
+    Sau đó /score_nlp chỉ cần gửi prompt_id + transcript.
+    """
+    prompt = build_prompt_artifacts(
+        body.question, body.sample_answer, body.part_code,
+        prompt_id=body.prompt_id, encoder=prompt_encoder(body.part_code),
+    )
+    prompt_registry.register(prompt)
+    return PromptRegistrationResponse(
+        prompt_id=prompt.prompt_id,
+        part_code=prompt.part_code,
+        question_keywords=prompt.question_keywords,
+        sample_length=prompt.sample_length,
+    )
+
+@app.delete("/prompts/{prompt_id}")
+def unregister_prompt(prompt_id: str):
+    if not prompt_registry.remove(prompt_id):
+        raise HTTPException(status_code=404, detail=f"Prompt '{prompt_id}' is not registered")
+    return {"prompt_id": prompt_id, "removed": True}
+
+@app.post("/score_nlp", response_model=ScoreResponse, response_model_exclude_none=True)
 def score_natural_language_processing(request: ScoreRequest):
     """
     Enhanced TOEIC Speaking scoring aligned with ETS criteria.
+    Xem score_request để biết chi tiết thuật toán.
+    """
+    return score_request(request)
+
+@app.get("/metrics")
+def get_metrics():
+    """Histogram theo stage, queue depth, in-flight... theo định dạng text của Prometheus."""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+def score_request(request: ScoreRequest, matches=None, embeddings=None,
+                  prompt: PromptArtifacts = None) -> ScoreResponse:
+    """
+    Enhanced TOEIC Speaking scoring aligned with ETS criteria.
     Scores Grammar, Vocabulary, and Content (Task Appropriateness).
     
     For Part 1 (Read Aloud): Uses TEXT MATCHING instead of semantic similarity.
     The transcript should match the given text exactly to get a high content score.
     """
+    if prompt is None:
+        prompt = get_prompt_artifacts(request)
+    
+    part_code = resolve_part_code(request, prompt)
+    label = part_label(part_code)
+    scoring_requests_total.inc(part_code=label)
+    # Breakdown chỉ được tính khi explain=true hoặc request được lấy mẫu
+    trace = start_trace(request.explain, SCORE_TRACE_SAMPLE_RATE)
+    with scoring_stage_seconds.time(stage="total", part_code=label):
+        response = _score_request(request, matches, embeddings, prompt, part_code, trace)
+    if trace is not None:
+        if request.explain:
+            response.breakdown = trace.to_dict()
+        else:
+            log_trace(score_logger, trace, part_code=part_code, prompt_id=request.prompt_id,
+                      grammar_score=response.grammar_score, content_score=response.content_score,
+                      vocabulary_score=response.vocabulary_score)
+    return response
+
+def _score_request(request: ScoreRequest, matches, embeddings, prompt: PromptArtifacts,
+                   part_code: str, trace: ScoreTrace = None) -> ScoreResponse:
     transcript_text = request.transcript.strip() if request.transcript else ""
-    sample_answer_text = request.sample_answer
-    part_code = (request.part_code or "").upper()
+    sample_answer_text = prompt.sample_answer_text
     
     # Check if this is Part 1 (Read Aloud) - uses different scoring
     is_read_aloud = part_code == "SPEAKING_PART_1"
 
     if not transcript_text:
+        if trace is not None:
+            trace.record("request", part_code=part_code, word_count=0, empty_transcript=True)
         return ScoreResponse(grammar_score=0.0, content_score=0.0, vocabulary_score=0.0)
 
     words = transcript_text.split()
     word_count = len(words)
     
+    # Quét mọi danh sách marker trong một lượt
+    lexical = scoring_lexicon.scan(transcript_text)
+    
     # =========================================================================
     # 1. GRAMMAR SCORING - Enhanced with error classification & complexity
     # =========================================================================
-    matches = grammar_tool.check(transcript_text)
+    # matches / embeddings có thể được tính sẵn bởi /score_nlp/batch
+    if matches is None:
+        matches = check_grammar(transcript_text, part_code) if not is_read_aloud else []
     
     # 1.1 Classify errors by severity
     critical_errors = 0
@@ -237,11 +780,7 @@ def score_natural_language_processing(request: ScoreRequest):
     fragment_ratio = fragment_count / max(len(sentences), 1)
     
     # Count filler words and hesitations
-    filler_words = ['uh', 'um', 'mmm', 'hmm', 'er', 'ah']
-    filler_count = sum(transcript_text.lower().count(f' {filler} ') + 
-                       transcript_text.lower().count(f'{filler} ') + 
-                       transcript_text.lower().count(f' {filler}')
-                       for filler in filler_words)
+    filler_count = lexical.count('filler')
     
     # Penalty for fragmented responses
     fragment_penalty = 0
@@ -260,18 +799,12 @@ def score_natural_language_processing(request: ScoreRequest):
             filler_penalty = 10
     
     # 1.3 Analyze grammar complexity
-    text_lower = transcript_text.lower()
-    
-    # Complex sentence markers
-    complex_markers = ['although', 'though', 'even though', 'because', 'since', 'while', 'whereas', 'if', 'unless', 'until']
-    compound_markers = [' and ', ' but ', ' or ', ' so ', ' yet ']
-    
-    complex_count = sum(1 for s in sentences if any(marker in s.lower() for marker in complex_markers))
-    compound_count = sum(1 for s in sentences if any(marker in s.lower() for marker in compound_markers))
+    # Sentences containing complex / compound markers
+    complex_count = lexical.sentences('complex')
+    compound_count = lexical.sentences('compound')
     
     # Passive voice detection (simple heuristic)
-    passive_indicators = [' was ', ' were ', ' been ', ' being ']
-    passive_count = sum(1 for ind in passive_indicators if ind in text_lower)
+    passive_count = lexical.distinct('passive')
     
     # Complexity bonus (0-15 points) - BUT only if response has substance
     complexity_bonus = 0
@@ -313,6 +846,19 @@ def score_natural_language_processing(request: ScoreRequest):
         grammar_score = round(max(0, min(100, grammar_score)), 2)
     else:
         grammar_score = 0.0
+    
+    if trace is not None:
+        trace.record("request", part_code=part_code, word_count=word_count, sentence_count=len(sentences))
+        trace.record(
+            "grammar",
+            errors={"critical": critical_errors, "major": major_errors, "minor": minor_errors,
+                    "weighted": weighted_errors},
+            fragment_ratio=round(fragment_ratio, 4),
+            filler_count=filler_count,
+            bonuses={"complexity": complexity_bonus},
+            penalties={"fragment": fragment_penalty, "filler": filler_penalty},
+            score=grammar_score,
+        )
 
     # =========================================================================
     # 2. CONTENT SCORING - Enhanced with flexibility for creative answers
@@ -325,43 +871,27 @@ def score_natural_language_processing(request: ScoreRequest):
     # - Score 1 (17-50): Intelligible at times, significant gaps (30-50% coverage)
     # - Score 0 (0-17): No response or completely unrelated (<30% coverage)
     if is_read_aloud:
-        import re
-        # Normalize both texts for comparison
-        sample_normalized = re.sub(r'[^\w\s]', '', sample_answer_text.lower())
+        # Normalize both texts for comparison (sample đã chuẩn hóa sẵn trong prompt artifacts)
         transcript_normalized = re.sub(r'[^\w\s]', '', transcript_text.lower())
         
-        sample_words = sample_normalized.split()
+        sample_words = prompt.read_aloud_words
         transcript_words = transcript_normalized.split()
+        alignment = None
         
         if not sample_words:
             content_score = 0.0
         else:
-            # Calculate word-level matching (words from sample that appear in transcript)
-            matched_words = 0
-            sample_word_set = set(sample_words)
-            
-            for word in transcript_words:
-                if word in sample_word_set:
-                    matched_words += 1
+            # Căn chỉnh từng từ của transcript với bài đọc (DP có band, một lượt):
+            # từ lặp lại / đọc sai thứ tự không được tính hai lần
+            alignment = align_words(sample_words, transcript_words)
             
-            # Coverage: what % of SAMPLE words appear in transcript
+            # Coverage: what % of SAMPLE words were read (in place)
             # This allows partial credit when user reads only part of the text
-            coverage = matched_words / len(sample_words) if sample_words else 0
+            coverage = alignment.coverage
             
-            # Order accuracy: check if words appear in roughly correct order
-            # Using consecutive pair matching
-            if len(transcript_words) > 1 and len(sample_words) > 1:
-                order_matches = 0
-                for i, word in enumerate(transcript_words[:-1]):
-                    if word in sample_word_set:
-                        next_word = transcript_words[i + 1]
-                        if next_word in sample_word_set:
-                            order_matches += 1
-                # Normalize by expected pairs in transcript
-                max_possible_pairs = min(len(transcript_words) - 1, len(sample_words) - 1)
-                order_ratio = order_matches / max(max_possible_pairs, 1)
-            else:
-                order_ratio = 0 if len(transcript_words) <= 1 else 0.5
+            # Order accuracy: of the sample words present in the transcript,
+            # how many were read in the correct order
+            order_ratio = alignment.order_accuracy
             
             # Calculate content score aligned with ETS 0-3 scale
             # Mapping: 0→0-16.67, 1→16.68-50, 2→50.01-83, 3→83.01-100
@@ -397,6 +927,20 @@ def score_natural_language_processing(request: ScoreRequest):
                     content_score = 0
             
             content_score = round(min(100, max(0, content_score)), 2)
+            
+            if trace is not None:
+                trace.record(
+                    "content",
+                    method="read_aloud_alignment",
+                    coverage=round(coverage, 4),
+                    order_ratio=round(order_ratio, 4),
+                    matched_words=alignment.matches,
+                    skipped_words=alignment.deletions,
+                    substituted_words=alignment.substitutions,
+                    inserted_words=alignment.insertions,
+                    sample_words=len(sample_words),
+                    score=content_score,
+                )
         
         # For Read Aloud, grammar and vocabulary are not evaluated by NLP
         # (pronunciation/intonation handled by Azure Speech)
@@ -406,7 +950,8 @@ def score_natural_language_processing(request: ScoreRequest):
         return ScoreResponse(
             grammar_score=grammar_score,
             content_score=content_score,
-            vocabulary_score=vocabulary_score
+            vocabulary_score=vocabulary_score,
+            alignment=alignment.to_dict() if request.include_alignment and alignment is not None else None,
         )
     
     # =========================================================================
@@ -417,23 +962,22 @@ def score_natural_language_processing(request: ScoreRequest):
     # - Creative correct answers (different from sample but answers question)
     # - Keyword parroting (mentions sample keywords but doesn't answer)
     
-    question_text = request.question or sample_answer_text  # Fallback to sample if no question
+    question_text = prompt.question_text  # Fallback to sample if no question
+    
+    # Gom mọi text cần embedding (question, transcript, sample, các clause phủ định
+    # của Part 2) và encode trong MỘT lần gọi batch
+    embedding_texts, embedding_flags, negated_clauses = embedding_inputs(request, prompt)
+    if embeddings is None:
+        embeddings = encode_texts(embedding_texts, embedding_flags, part_code)
+    emb_question, emb_transcript, emb_sample, clause_embeddings = unpack_embeddings(prompt, embeddings)
     
     # =================================================================
     # DIMENSION 1: Question-Answer Relevance (40% - MOST IMPORTANT!)
     # =================================================================
     # Does the transcript actually ANSWER the question asked?
-    emb_question = semantic_model.encode(question_text, convert_to_tensor=True)
-    emb_transcript = semantic_model.encode(transcript_text, convert_to_tensor=True)
-    
     qa_relevance = util.cos_sim(emb_question, emb_transcript)
     qa_relevance_score = float(qa_relevance.item()) * 100
     
-    # 🔍 DEBUG LOG
-    print(f"\n[NLP DEBUG] Question: {question_text[:100]}...")
-    print(f"[NLP DEBUG] Transcript: {transcript_text[:100]}...")
-    print(f"[NLP DEBUG] QA Relevance Score: {qa_relevance_score:.2f}")
-    
     # Off-topic penalty for completely irrelevant responses
     # CRITICAL FIX: Skip off-topic penalty for Part 2 (picture description)
     # Part 2 questions are always generic ("Describe the picture..."), so QA relevance is meaningless
@@ -442,18 +986,15 @@ def score_natural_language_processing(request: ScoreRequest):
         if qa_relevance_score < 20:
             # Transcript has NOTHING to do with question
             off_topic_penalty = 30
-            print(f"[NLP DEBUG] ❌ Off-topic penalty: {off_topic_penalty} (score < 20)")
         elif qa_relevance_score < 35:
             # Marginally related but doesn't really answer
             off_topic_penalty = 15
-            print(f"[NLP DEBUG] ⚠️  Off-topic penalty: {off_topic_penalty} (score < 35)")
     
     # =================================================================
     # DIMENSION 2: Sample Answer Similarity (30% - Reference Quality)
     # =================================================================
     # How similar to the expected answer style/content?
     # This is for reference only, NOT required to match exactly
-    emb_sample = semantic_model.encode(sample_answer_text, convert_to_tensor=True)
     sample_similarity = util.cos_sim(emb_transcript, emb_sample)
     sample_similarity_score = float(sample_similarity.item()) * 100
     
@@ -461,17 +1002,8 @@ def score_natural_language_processing(request: ScoreRequest):
     # DIMENSION 3: Question Keyword Coverage (15%)
     # =================================================================
     # Extract keywords FROM QUESTION to check if answer is on-topic
-    import re
-    
-    def extract_keywords(text):
-        question_words = {'what', 'when', 'where', 'who', 'why', 'how', 'which', 
-                          'do', 'does', 'did', 'is', 'are', 'was', 'were', 'can'}
-        stop_words = {'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have',
-                      'it', 'for', 'not', 'on', 'with', 'as', 'you', 'at'}
-        words = re.sub(r'[^\w\s]', '', text.lower()).split()
-        return [w for w in words if w not in question_words and w not in stop_words and len(w) > 3]
-    
-    question_keywords = extract_keywords(question_text)
+    # (tính sẵn trong prompt artifacts bằng extract_keywords)
+    question_keywords = prompt.question_keywords
     transcript_lower = transcript_text.lower()
     
     if question_keywords:
@@ -541,30 +1073,15 @@ def score_natural_language_processing(request: ScoreRequest):
                 min_word_count_penalty = 10
     
     # 2.5 Discourse markers detection (organization bonus)
-    discourse_markers = {
-        'sequencing': ['first', 'second', 'third', 'finally', 'lastly', 'next', 'then'],
-        'addition': ['in addition', 'furthermore', 'moreover', 'also', 'besides'],
-        'contrast': ['however', 'on the other hand', 'although', 'but', 'yet', 'nevertheless'],
-        'conclusion': ['in conclusion', 'to sum up', 'overall', 'in summary', 'therefore']
-    }
-    
-    discourse_count = 0
-    for category, markers in discourse_markers.items():
-        for marker in markers:
-            if marker in text_lower:
-                discourse_count += 1
-                break  # Count each category only once
+    # Count each category only once
+    discourse_count = sum(1 for category in DISCOURSE_MARKERS if lexical.has(f'discourse_{category}'))
     
     discourse_bonus = min(discourse_count * 3, 12)  # Max 12 points bonus (increased)
     
     # 2.5 Opinion/Response quality markers (for speaking tasks)
-    opinion_markers = ['i think', 'i believe', 'in my opinion', 'from my perspective', 'i feel']
-    reasoning_markers = ['because', 'therefore', 'so', 'thus', 'as a result', 'consequently']
-    example_markers = ['for example', 'for instance', 'such as', 'like']
-    
-    has_opinion = any(marker in text_lower for marker in opinion_markers)
-    has_reasoning = any(marker in text_lower for marker in reasoning_markers)
-    has_example = any(marker in text_lower for marker in example_markers)
+    has_opinion = lexical.has('opinion')
+    has_reasoning = lexical.has('reasoning')
+    has_example = lexical.has('example')
     
     quality_bonus = 0
     if has_opinion:
@@ -578,8 +1095,7 @@ def score_natural_language_processing(request: ScoreRequest):
     # =================================================================
     # Calculate DIMENSION 4: Completeness Score (15%)
     # =================================================================
-    sample_words = sample_answer_text.split()
-    sample_length = len(sample_words)
+    sample_length = prompt.sample_length
     
     # CRITICAL FIX: Handle empty or very short sample answers
     # For Part 2-5, sample should always exist. If not, it's a data issue.
@@ -629,21 +1145,8 @@ def score_natural_language_processing(request: ScoreRequest):
         # Part 2: Describe a Picture - Use sample_answer as IMAGE CONTENT ground truth
         # Sample answer represents what's IN THE PICTURE, not just one way to describe
         
-        # Calculate Descriptive Vocabulary Score
-        descriptive_words = {
-            'visual': ['see', 'picture', 'image', 'show', 'display', 'appear', 'visible'],
-            'colors': ['red', 'blue', 'green', 'yellow', 'white', 'black', 'colorful', 'vibrant', 'bright', 'dark'],
-            'positions': ['front', 'behind', 'next to', 'above', 'below', 'left', 'right', 'center', 'background', 'foreground'],
-            'sizes': ['large', 'small', 'big', 'tiny', 'huge', 'massive', 'little'],
-            'actions': ['walking', 'talking', 'selling', 'buying', 'standing', 'sitting', 'running', 'working'],
-            'adjectives': ['beautiful', 'busy', 'crowded', 'peaceful', 'lively', 'quiet', 'modern', 'old', 'new']
-        }
-        
-        descriptive_count = 0
-        for category, words in descriptive_words.items():
-            for word in words:
-                if word in transcript_lower:
-                    descriptive_count += 1
+        # Calculate Descriptive Vocabulary Score (distinct descriptive words used)
+        descriptive_count = sum(lexical.distinct(f'descriptive_{category}') for category in DESCRIPTIVE_WORDS)
         
         # Score based on descriptive word count
         if descriptive_count >= 8:
@@ -676,7 +1179,14 @@ def score_natural_language_processing(request: ScoreRequest):
         )
         
         # Apply semantic contradiction detection
-        contradiction_penalty = detect_semantic_contradiction(transcript_text, sample_answer_text)
+        with scoring_stage_seconds.time(stage="contradiction", part_code=part_label(part_code)):
+            contradiction_penalty = detect_semantic_contradiction(
+                transcript_text, sample_answer_text,
+                negated_clauses=negated_clauses,
+                clause_embeddings=clause_embeddings,
+                emb_sample=emb_sample,
+                trace=trace,
+            )
     else:
         # Part 3, 4, 5: Standard weights
         content_score = (
@@ -686,27 +1196,34 @@ def score_natural_language_processing(request: ScoreRequest):
             completeness_score * 0.15          # DIMENSION 4: Sufficient detail? (15%)
         )
     
-    # 🔍 DEBUG LOG - Show all dimensions
-    print(f"\n[NLP DEBUG] ========== CONTENT SCORE BREAKDOWN ==========")
-    print(f"[NLP DEBUG] Part Code: {part_code}")
-    print(f"[NLP DEBUG] Word Count: {word_count}")
-    
-    if part_code == "SPEAKING_PART_2":
-        print(f"[NLP DEBUG] Dimension 1 - Picture Content Match: {sample_similarity_score:.2f}")
-        print(f"[NLP DEBUG] Dimension 2 - Descriptive Vocabulary: {descriptive_vocab_score:.2f}")
-        print(f"[NLP DEBUG] Dimension 3 - Completeness: {completeness_score:.2f}")
-        print(f"[NLP DEBUG] Dimension 4 - Structure Keywords: {keyword_coverage_score:.2f}")
-    else:
-        print(f"[NLP DEBUG] Dimension 1 - QA Relevance: {qa_relevance_score:.2f}")
-        print(f"[NLP DEBUG] Dimension 2 - Sample Similarity: {sample_similarity_score:.2f}")
-        print(f"[NLP DEBUG] Dimension 3 - Keyword Coverage: {keyword_coverage_score:.2f}")
-        print(f"[NLP DEBUG] Dimension 4 - Completeness: {completeness_score:.2f}")
-    
-    print(f"[NLP DEBUG] Off-topic Penalty: -{off_topic_penalty}")
-    if part_code == "SPEAKING_PART_2":
-        print(f"[NLP DEBUG] Contradiction Penalty: -{contradiction_penalty:.1f}")
-    print(f"[NLP DEBUG] Word Count Penalty: -{min_word_count_penalty}")
-    print(f"[NLP DEBUG] Content (before penalties): {content_score:.2f}")
+    if trace is not None:
+        if part_code == "SPEAKING_PART_2":
+            dimensions = {
+                "picture_content_match": round(sample_similarity_score, 2),
+                "descriptive_vocabulary": round(descriptive_vocab_score, 2),
+                "completeness": round(completeness_score, 2),
+                "structure_keywords": round(keyword_coverage_score, 2),
+            }
+        else:
+            dimensions = {
+                "qa_relevance": round(qa_relevance_score, 2),
+                "sample_similarity": round(sample_similarity_score, 2),
+                "keyword_coverage": round(keyword_coverage_score, 2),
+                "completeness": round(completeness_score, 2),
+            }
+        trace.record(
+            "content",
+            method="semantic",
+            question=question_text[:100],
+            dimensions=dimensions,
+            bonuses={"discourse": discourse_bonus, "quality": quality_bonus},
+            penalties={
+                "off_topic": off_topic_penalty,
+                "contradiction": round(contradiction_penalty, 2) if part_code == "SPEAKING_PART_2" else 0,
+                "word_count": min_word_count_penalty,
+            },
+            before_penalties=round(content_score, 2),
+        )
     
     # Apply off-topic penalty (from Dimension 1)
     content_score = content_score - off_topic_penalty
@@ -719,21 +1236,19 @@ def score_natural_language_processing(request: ScoreRequest):
     content_score = content_score - min_word_count_penalty
     
     content_score = round(min(100, max(0, content_score)), 2)
-    
-    print(f"[NLP DEBUG] ========== FINAL CONTENT SCORE: {content_score:.2f} ==========\n")
+    if trace is not None:
+        trace.record("content", score=content_score)
 
     # =========================================================================
     # 3. VOCABULARY SCORING - CRITICAL FIX: Use wordfreq instead of hardcoded lists
     # =========================================================================
     
+    vocabulary_started = time.perf_counter()
     if not words:
         vocabulary_score = 0.0
     else:
         # Clean words (remove punctuation)
-        import re
-        from wordfreq import word_frequency, zipf_frequency
-        
-        clean_words = [re.sub(r'[^\w]', '', w).lower() for w in words if re.sub(r'[^\w]', '', w)]
+        clean_words = [w for w in (NON_WORD_RE.sub('', word).lower() for word in words) if w]
         
         # ===============================================================
         # 3.1 INTELLIGENT Word Difficulty Analysis using wordfreq
@@ -741,29 +1256,14 @@ def score_natural_language_processing(request: ScoreRequest):
         # Zipf scale: 1-7 (7 = very common like "the", 1 = very rare/academic)
         # TOEIC high scores need diverse, less common vocabulary
         
-        word_scores = []
-        advanced_count = 0
-        business_count = 0
-        intermediate_count = 0
+        # Tier tính sẵn theo Zipf: advanced (<3.5), business (<4.5), intermediate (<5.5), common
+        word_tiers = get_word_tiers(WORD_TIER_TABLE_PATH or None)
+        tiers = [word_tiers.tier(word) for word in clean_words if len(word) > 2]  # Skip very short words
         
-        for word in clean_words:
-            if len(word) <= 2:  # Skip very short words
-                continue
-                
-            zipf = zipf_frequency(word, 'en')
-            
-            # Categorize by Zipf frequency
-            if zipf < 3.5:  # Very rare (academic/technical)
-                word_scores.append(100)
-                advanced_count += 1
-            elif zipf < 4.5:  # Uncommon (business/advanced)
-                word_scores.append(85)
-                business_count += 1
-            elif zipf < 5.5:  # Intermediate
-                word_scores.append(65)
-                intermediate_count += 1
-            else:  # Common (basic words)
-                word_scores.append(40)
+        word_scores = [TIER_SCORES[tier] for tier in tiers]
+        advanced_count = tiers.count(ADVANCED)
+        business_count = tiers.count(BUSINESS)
+        intermediate_count = tiers.count(INTERMEDIATE)
         
         # Calculate frequency-based score (50%)
         if word_scores:
@@ -788,14 +1288,7 @@ def score_natural_language_processing(request: ScoreRequest):
         diversity_score = min(100, max(0, diversity_score))
         
         # 3.3 Collocations & Phrasal Verbs (20%)
-        common_collocations = [
-            'make decision', 'take responsibility', 'carry out', 'put forward',
-            'bring up', 'look forward to', 'get along', 'work out', 'find out',
-            'take place', 'make sense', 'pay attention', 'keep in mind',
-            'deal with', 'focus on', 'depend on', 'participate in'
-        ]
-        
-        collocation_count = sum(1 for coll in common_collocations if coll in text_lower)
+        collocation_count = lexical.distinct('collocation')
         collocation_score = min(collocation_count * 15, 100)
         
         # 3.4 Word Length Distribution (10%)
@@ -819,6 +1312,22 @@ def score_natural_language_processing(request: ScoreRequest):
             length_score * 0.10
         )
         vocabulary_score = round(max(0, min(100, vocabulary_score)), 2)
+        
+        if trace is not None:
+            trace.record(
+                "vocabulary",
+                components={
+                    "frequency": round(freq_score, 2),
+                    "diversity": round(diversity_score, 2),
+                    "collocation": collocation_score,
+                    "word_length": round(length_score, 2),
+                },
+                tiers={"advanced": advanced_count, "business": business_count, "intermediate": intermediate_count},
+                score=vocabulary_score,
+            )
+    scoring_stage_seconds.observe(
+        time.perf_counter() - vocabulary_started, stage="vocabulary", part_code=part_label(part_code)
+    )
 
     return ScoreResponse(
         grammar_score=grammar_score,
@@ -826,28 +1335,665 @@ def score_natural_language_processing(request: ScoreRequest):
         vocabulary_score=vocabulary_score
     )
 
+# -----------------------------------------------------------------------------
+# Endpoint: Batch NLP Scoring (chấm cả một lượt thi / nhiều lượt thi)
+# -----------------------------------------------------------------------------
+GRAMMAR_BATCH_WORKERS = int(os.getenv("GRAMMAR_BATCH_WORKERS", "4"))
+grammar_executor = TrackedThreadPoolExecutor(max_workers=GRAMMAR_BATCH_WORKERS, thread_name_prefix="grammar")
+
+@app.post("/score_nlp/batch", response_model=BatchScoreResponse, response_model_exclude_none=True)
+def score_nlp_batch(body: BatchScoreRequest):
+    """
+    Chấm nhiều câu trả lời trong một request:
+    - Một lần encode batch cho toàn bộ text của mọi item.
+    - LanguageTool chạy song song trên grammar_executor.
+    Mỗi kết quả giống hệt khi gọi /score_nlp cho từng item.
+    """
+    items = body.items
+    prompts = [get_prompt_artifacts(item) for item in items]
+    
+    part_codes = [resolve_part_code(item, prompt) for item, prompt in zip(items, prompts)]
+    grammar_futures = [
+        grammar_executor.submit(check_grammar, item.transcript.strip(), part_code)
+        if needs_nlp_analysis(item, prompt) else None
+        for item, prompt, part_code in zip(items, prompts, part_codes)
+    ]
+    
+    all_texts, all_flags, spans = [], [], []
+    for item, prompt in zip(items, prompts):
+        texts, flags, _ = embedding_inputs(item, prompt)
+        spans.append((len(all_texts), len(all_texts) + len(texts)))
+        all_texts.extend(texts)
+        all_flags.extend(flags)
+    batch_part = part_codes[0] if len(set(part_codes)) == 1 else "MIXED"
+    all_embeddings = encode_texts(all_texts, all_flags, batch_part) if all_texts else None
+    
+    results = []
+    for item, prompt, future, (start, end) in zip(items, prompts, grammar_futures, spans):
+        matches = future.result() if future is not None else []
+        embeddings = all_embeddings[start:end] if end > start else None
+        results.append(score_request(item, matches=matches, embeddings=embeddings, prompt=prompt))
+    
+    return BatchScoreResponse(results=results)
+
+# -----------------------------------------------------------------------------
+# Endpoint: Streaming NLP Scoring (WebSocket, chấm dần trong lúc thí sinh nói)
+# -----------------------------------------------------------------------------
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", "120"))
+
+class StreamingScoreSession:
+    """
+    Một lượt nói được chấm dần theo từng câu hoàn chỉnh:
+    - LanguageTool chạy trên từng câu vừa hoàn chỉnh (kèm câu trước làm ngữ cảnh),
+      mỗi câu một lần, chỉ để báo số lỗi trong progress.
+    - Embedding của các clause phủ định (Part 2) được tính ngay khi câu kết thúc;
+      question / sample answer được đưa vào embedding_cache từ đầu.
+    - Lexicon / tier tần suất của từng câu được gửi lại client dưới dạng progress.
+    Khi kết thúc, score_request chạy trên transcript đầy đủ với embedding đã tính
+    sẵn; LanguageTool chạy một lần trên cả transcript (qua grammar_cache) giống hệt
+    /score_nlp, vì rule nhìn xa hơn một câu có thể đổi số lỗi so với kết quả gộp
+    theo câu. Nên kết quả giống /score_nlp với cùng transcript.
+    """
+
+    def __init__(self, request: ScoreRequest, prompt: PromptArtifacts):
+        self.request = request
+        self.prompt = prompt
+        self.part_code = resolve_part_code(request, prompt)
+        self.analyze = self.part_code != "SPEAKING_PART_1"
+        self.transcript = TranscriptAccumulator()
+        self.grammar = SentenceChecker(lambda text: check_grammar(text, self.part_code), grammar_executor)
+        self.clause_embeddings = {}
+        self.word_count = 0
+        self.filler_count = 0
+        self.tier_counts = [0] * len(TIER_SCORES)
+        self._background = []
+
+    def start(self) -> None:
+        if self.analyze and self.prompt.question_embedding is None:
+            texts = [self.prompt.question_text, self.prompt.sample_answer_text]
+            self._background.append(asyncio.get_running_loop().run_in_executor(
+                None, encode_texts, texts, True, self.part_code
+            ))
+
+    def _analyze_sentences(self, sentences: List[str]) -> None:
+        word_tiers = get_word_tiers(WORD_TIER_TABLE_PATH or None)
+        for sentence in sentences:
+            words = sentence.split()
+            self.word_count += len(words)
+            self.filler_count += scoring_lexicon.scan(sentence).count('filler')
+            for word in (NON_WORD_RE.sub('', w).lower() for w in words):
+                if len(word) > 2:
+                    self.tier_counts[word_tiers.tier(word)] += 1
+
+        if self.analyze and self.part_code == "SPEAKING_PART_2":
+            clauses = [clean for sentence in sentences for _, clean in extract_negated_clauses(sentence)]
+            clauses = [clean for clean in clauses if clean not in self.clause_embeddings]
+            # Bước cuối chỉ dùng CONTRADICTION_MAX_CLAUSES mệnh đề đầu tiên của transcript
+            clauses = clauses[:max(0, CONTRADICTION_MAX_CLAUSES - len(self.clause_embeddings))]
+            if clauses:
+                try:
+                    embeddings = encode_texts(clauses, False, self.part_code)
+                except HTTPException:
+                    return  # encoder chưa sẵn sàng: để bước cuối tự tính (và báo lỗi nếu cần)
+                self.clause_embeddings.update(zip(clauses, embeddings))
+
+    async def _process(self, sentences: List[str]) -> dict:
+        if self.analyze:
+            done = self.transcript.sentences
+            for offset, sentence in done[len(done) - len(sentences):]:
+                self.grammar.submit(offset, sentence)
+        await asyncio.get_running_loop().run_in_executor(None, self._analyze_sentences, sentences)
+        last_matches = self.grammar.completed()
+        return {
+            "sentences": self.transcript.sentence_count,
+            "word_count": self.word_count,
+            "filler_count": self.filler_count,
+            "tiers": {
+                "advanced": self.tier_counts[ADVANCED],
+                "business": self.tier_counts[BUSINESS],
+                "intermediate": self.tier_counts[INTERMEDIATE],
+            },
+            # Số lỗi của các câu đã check xong (có thể chậm hơn transcript vài câu)
+            "grammar_errors": len(last_matches) if last_matches is not None else None,
+        }
+
+    async def add_segment(self, text: str) -> dict:
+        sentences = self.transcript.append(text)
+        return await self._process(sentences) if sentences else None
+
+    def _final_embeddings(self, request: ScoreRequest):
+        """Như embedding_inputs + encode_texts, nhưng dùng lại embedding clause đã tính."""
+        texts, flags, negated_clauses = embedding_inputs(request, self.prompt)
+        split = len(texts) - len(negated_clauses)
+        clause_texts = texts[split:]
+        missing = [text for text in clause_texts if text not in self.clause_embeddings]
+        encoded = encode_texts(texts[:split] + missing, flags[:split] + [False] * len(missing), self.part_code)
+        fresh = dict(zip(missing, encoded[split:]))
+        clause_embeddings = [self.clause_embeddings.get(text, fresh.get(text)) for text in clause_texts]
+        if not clause_embeddings:
+            return encoded[:split]
+        return torch.cat([encoded[:split], torch.stack(clause_embeddings)])
+
+    async def finish(self, transcript: str = None) -> ScoreResponse:
+        loop = asyncio.get_running_loop()
+        trailing = self.transcript.flush()
+        if trailing:
+            await self._process(trailing)
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+        request = ScoreRequest(
+            transcript=transcript if transcript is not None else self.transcript.text,
+            sample_answer=self.request.sample_answer,
+            question=self.request.question,
+            part_code=self.request.part_code,
+            prompt_id=self.request.prompt_id,
+            explain=self.request.explain,
+            include_alignment=self.request.include_alignment,
+        )
+        embeddings = None
+        if needs_nlp_analysis(request, self.prompt):
+            embeddings = await loop.run_in_executor(None, self._final_embeddings, request)
+        # matches=None: score_request tự check_grammar trên transcript đầy đủ, như /score_nlp
+        return await loop.run_in_executor(None, score_request, request, None, embeddings, self.prompt)
+
+@app.websocket("/score_nlp/stream")
+async def score_nlp_stream(websocket: WebSocket):
+    """
+    Chấm điểm dần trong lúc thí sinh nói. Client gửi các message JSON:
+      1. {"question", "sample_answer", "part_code", "prompt_id", "explain"} - như ScoreRequest, không có transcript
+      2. {"type": "segment", "text": "..."} cho mỗi đoạn transcript từ speech recognizer
+      3. {"type": "end"} (tùy chọn "transcript": transcript cuối cùng, nếu recognizer đã sửa lại)
+    Server trả {"type": "progress", ...} sau mỗi câu hoàn chỉnh, rồi
+    {"type": "result", ...ScoreResponse} giống /score_nlp với cùng transcript.
+    Lỗi: {"type": "error", "status", "detail"} rồi đóng kết nối.
+    """
+    await websocket.accept()
+    streaming_sessions_active.inc()
+    try:
+        try:
+            init = await asyncio.wait_for(websocket.receive_json(), STREAM_IDLE_TIMEOUT)
+            request = ScoreRequest(**{**init, "transcript": ""})
+            # Prompt đăng ký ở worker khác được tính lại (encode) lần đầu: không chạy trên event loop
+            prompt = await asyncio.get_running_loop().run_in_executor(None, get_prompt_artifacts, request)
+            session = StreamingScoreSession(request, prompt)
+            session.start()
+            while True:
+                message = await asyncio.wait_for(websocket.receive_json(), STREAM_IDLE_TIMEOUT)
+                kind = message.get("type")
+                if kind == "segment":
+                    progress = await session.add_segment(message.get("text", ""))
+                    if progress is not None:
+                        await websocket.send_json({"type": "progress", **progress})
+                elif kind == "end":
+                    response = await session.finish(message.get("transcript"))
+                    await websocket.send_json({"type": "result", **jsonable_encoder(response, exclude_none=True)})
+                    break
+                else:
+                    raise ValueError(f"Unknown message type: {kind!r}")
+        except HTTPException as e:
+            await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail})
+        except asyncio.TimeoutError:
+            await websocket.send_json({"type": "error", "status": 408, "detail": "No message received in time"})
+        except (ValueError, TypeError, AttributeError) as e:
+            # JSON lỗi, message không phải object, hoặc ScoreRequest không hợp lệ
+            await websocket.send_json({"type": "error", "status": 422, "detail": str(e)})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        streaming_sessions_active.dec()
+
+@app.get("/grammar/status")
+def get_grammar_status():
+    workers = grammar_component.get().status() if grammar_component.ready else []
+    return {"state": grammar_component.state, "workers": workers, "cache": grammar_cache.stats()}
+
+@app.get("/embedding_cache/stats")
+def get_embedding_cache_stats():
+    return embedding_cache.stats()
+
 # -----------------------------------------------------------------------------
 # Endpoint: Image Caption (giữ nguyên hành vi từ api.py)
 # -----------------------------------------------------------------------------
-@app.post("/caption", response_model=CaptionResponse)
-def get_image_caption(body: CaptionRequest):
-    image_url = body.imageUrl
-    if not image_url:
-        raise HTTPException(status_code=400, detail="imageUrl is required")
+CAPTION_MAX_IMAGE_BYTES = int(os.getenv("CAPTION_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Phần bao của multipart (boundary, header từng part, field "decoding") được cộng thêm vào giới hạn ảnh
+CAPTION_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+CAPTION_DOWNLOAD_TIMEOUT = float(os.getenv("CAPTION_DOWNLOAD_TIMEOUT", "20"))
+CAPTION_HTTP_MAX_CONNECTIONS = int(os.getenv("CAPTION_HTTP_MAX_CONNECTIONS", "32"))
+CAPTION_MAX_REDIRECTS = int(os.getenv("CAPTION_MAX_REDIRECTS", "5"))
+CAPTION_DECODE_WORKERS = int(os.getenv("CAPTION_DECODE_WORKERS", "4"))
+# Giới hạn số pixel được decode (sau khi JPEG đã decode rút gọn); vượt quá -> 413
+CAPTION_MAX_IMAGE_PIXELS = int(os.getenv("CAPTION_MAX_IMAGE_PIXELS", str(DEFAULT_MAX_PIXELS)))
+# Thư mục được phép tham chiếu bằng CaptionRequest.imagePath (để trống = tắt)
+CAPTION_LOCAL_IMAGE_DIR = os.getenv("CAPTION_LOCAL_IMAGE_DIR", "")
+
+# Cache caption trên đĩa (để trống CAPTION_CACHE_PATH để tắt)
+CAPTION_CACHE_PATH = os.getenv("CAPTION_CACHE_PATH", "caption_cache.sqlite3")
+CAPTION_CACHE_TTL_SECONDS = float(os.getenv("CAPTION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CAPTION_CACHE_MAX_ENTRIES = int(os.getenv("CAPTION_CACHE_MAX_ENTRIES", "10000"))
+# Dọn TTL / số dòng mỗi N lần ghi thay vì mỗi lần ghi
+CAPTION_CACHE_EVICT_EVERY = int(os.getenv("CAPTION_CACHE_EVICT_EVERY", "64"))
+# true: mỗi lần hit vẫn revalidate với server ảnh (ETag/Last-Modified, rồi so hash nội dung)
+CAPTION_CACHE_REVALIDATE = os.getenv("CAPTION_CACHE_REVALIDATE", "false").lower() == "true"
+
+# SQLite đồng bộ: mọi lời gọi từ handler async đi qua run_in_threadpool
+caption_cache = (
+    CaptionCache(
+        CAPTION_CACHE_PATH,
+        ttl_seconds=CAPTION_CACHE_TTL_SECONDS,
+        max_entries=CAPTION_CACHE_MAX_ENTRIES,
+        evict_every=CAPTION_CACHE_EVICT_EVERY,
+    )
+    if CAPTION_CACHE_PATH else None
+)
+
+# Decode ảnh (CPU) chạy trên pool riêng, không chiếm thread của event loop
+decode_executor = TrackedThreadPoolExecutor(max_workers=CAPTION_DECODE_WORKERS, thread_name_prefix="caption-decode")
+http_client = None
+
+def get_http_client():
+    global http_client
+    if http_client is None:
+        http_client = create_http_client(
+            timeout=CAPTION_DOWNLOAD_TIMEOUT,
+            max_connections=CAPTION_HTTP_MAX_CONNECTIONS,
+            max_redirects=CAPTION_MAX_REDIRECTS,
+        )
+    return http_client
+
+@app.on_event("shutdown")
+async def close_resources():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+    if caption_cache:
+        caption_cache.close()
+    grammar_cache.close()
+    prompt_registry.close()
+
+def decode_image(content: bytes) -> Image.Image:
+    """Decode (JPEG draft mode) thẳng về kích thước input của model caption, xem image_decode.py."""
+    return decode_model_input(content, caption_engine.input_size, CAPTION_MAX_IMAGE_PIXELS)
 
+@app.get("/caption/decoding")
+def get_caption_decoding():
+    """Các chế độ decode và độ trễ đo được (ms/ảnh) so với baseline beam4."""
+    return {
+        "default": CAPTION_DECODING,
+        "quantized": caption_engine.quantized,
+        "modes": DECODING_MODES,
+        "latency": caption_latency.report(),
+    }
+
+@app.get("/caption_cache/stats")
+def get_caption_cache_stats():
+    return caption_cache.stats() if caption_cache else {"enabled": False}
+
+def caption_mode(decoding: str = None) -> str:
     try:
-        resp = requests.get(image_url, stream=True, timeout=20)
-        resp.raise_for_status()
+        return resolve_mode(decoding, CAPTION_DECODING)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def caption_content(content: bytes, mode: str, digest: str) -> str:
+    """
+    Pipeline chung cho mọi nguồn ảnh (URL, upload, raw bytes, file local):
+    cache theo hash nội dung -> decode trên decode_executor -> caption_engine.
+    """
+    caption_text = await run_in_threadpool(caption_cache.get_by_hash, digest) if caption_cache else None
+    if caption_text is not None:
+        caption_requests_total.inc(result="cache_hit")
+        return caption_text
+
+    loop = asyncio.get_running_loop()
+    # Đảm bảo model caption đã tải (lazy mode) mà không chặn event loop
+    await loop.run_in_executor(decode_executor, require, caption_component)
+    with caption_stage_seconds.time(stage="decode", mode=mode):
+        image = await loop.run_in_executor(decode_executor, decode_image, content)
+    # Inference chạy trên thread của caption_batcher; chỉ await Future
+    caption_text = await asyncio.wrap_future(caption_engine.submit(image, mode))
+    caption_requests_total.inc(result="generated")
+    return caption_text
+
+async def caption_image_bytes(content: bytes, mode: str) -> CaptionResponse:
+    """Caption cho ảnh client gửi thẳng (không có URL): cache theo hash nội dung."""
+    digest = variant_key(content_hash(content), mode, caption_engine.quantized)
+    caption_text = await caption_content(content, mode, digest)
+    if caption_cache:
+        await run_in_threadpool(caption_cache.put, f"content:{digest}", caption_text, digest)
+    return CaptionResponse(caption=caption_text)
+
+async def caption_image_url(image_url: str, mode: str) -> CaptionResponse:
+    # Caption của mỗi biến thể model (chế độ decode, trọng số int8 / float32) được cache riêng
+    cache_key = variant_key(image_url, mode, caption_engine.quantized)
+    cached = await run_in_threadpool(caption_cache.get, cache_key) if caption_cache else None
+    if cached and not CAPTION_CACHE_REVALIDATE:
+        caption_requests_total.inc(result="cache_hit")
+        return CaptionResponse(caption=cached.caption)
+
+    with caption_stage_seconds.time(stage="download", mode=mode):
+        fetched = await download_image(
+            get_http_client(), image_url, CAPTION_MAX_IMAGE_BYTES,
+            etag=cached.etag if cached else None,
+            last_modified=cached.last_modified if cached else None,
+        )
+    if cached and fetched.not_modified:
+        caption_requests_total.inc(result="cache_hit")
+        return CaptionResponse(caption=cached.caption)
+
+    digest = variant_key(content_hash(fetched.content), mode, caption_engine.quantized)
+    if cached and cached.content_hash == digest:
+        caption_text = cached.caption
+        caption_requests_total.inc(result="cache_hit")
+    else:
+        # Cùng nội dung ảnh nhưng khác URL -> cache theo hash trong caption_content
+        caption_text = await caption_content(fetched.content, mode, digest)
+
+    if caption_cache:
+        await run_in_threadpool(caption_cache.put, cache_key, caption_text, digest, fetched.etag, fetched.last_modified)
+    return CaptionResponse(caption=caption_text)
+
+def read_local_image(image_path: str) -> bytes:
+    """Đọc file ảnh nằm trong CAPTION_LOCAL_IMAGE_DIR (chặn path traversal / symlink ra ngoài)."""
+    if not CAPTION_LOCAL_IMAGE_DIR:
+        raise HTTPException(status_code=403, detail="Local image references are disabled on this instance.")
+    root = os.path.realpath(CAPTION_LOCAL_IMAGE_DIR)
+    path = os.path.realpath(os.path.join(root, image_path))
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(status_code=403, detail="imagePath is outside the allowed image directory.")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Image '{image_path}' not found.")
+    if os.path.getsize(path) > CAPTION_MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {CAPTION_MAX_IMAGE_BYTES} bytes.")
+    with open(path, "rb") as f:
+        return f.read()
+
+def body_too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes.")
+
+def check_content_length(request: Request, limit: int) -> None:
+    """Từ chối ngay theo Content-Length (nếu có), trước khi đọc byte nào của body."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise body_too_large(limit)
 
-        image = Image.open(io.BytesIO(resp.content)).convert("RGB")
-        caption_text = generate_caption(image)
-        return CaptionResponse(caption=caption_text)
+async def limited_stream(request: Request, limit: int):
+    """request.stream() với bộ đếm byte: dừng ngay khi vượt `limit` (kể cả khi Content-Length sai / chunked)."""
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise body_too_large(limit)
+        yield chunk
 
-    except requests.exceptions.RequestException as e:
-        # Phản hồi giống api.py: 500 khi tải ảnh lỗi
-        raise HTTPException(status_code=500, detail=f"Failed to download image from URL: {e}")
+async def read_body_limited(request: Request) -> bytes:
+    """Body dạng raw bytes, dừng ngay khi vượt quá CAPTION_MAX_IMAGE_BYTES."""
+    check_content_length(request, CAPTION_MAX_IMAGE_BYTES)
+    content = bytearray()
+    async for chunk in limited_stream(request, CAPTION_MAX_IMAGE_BYTES):
+        content.extend(chunk)
+    return bytes(content)
+
+async def read_upload(request: Request):
+    """
+    multipart/form-data: file ở field "image", chế độ decode (tùy chọn) ở field "decoding".
+    Không dùng request.form() (spool cả body trước khi kiểm tra): parser đọc từ
+    limited_stream nên upload bị hủy ngay khi vượt giới hạn.
+    """
+    limit = CAPTION_MAX_IMAGE_BYTES + CAPTION_MULTIPART_OVERHEAD_BYTES
+    check_content_length(request, limit)
+    try:
+        form = await MultiPartParser(request.headers, limited_stream(request, limit)).parse()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid multipart body: {e}")
+    try:
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="multipart field 'image' (file) is required")
+        content = await upload.read(CAPTION_MAX_IMAGE_BYTES + 1)
+        if len(content) > CAPTION_MAX_IMAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {CAPTION_MAX_IMAGE_BYTES} bytes.")
+        return content, form.get("decoding")
+    finally:
+        await form.close()
+
+async def caption_with_errors(awaitable, invalid_image_detail: str) -> CaptionResponse:
+    try:
+        return await awaitable
+    except HTTPException:
+        raise
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ImageDownloadError as e:
+        # Phản hồi giống api.py: 500 khi tải ảnh lỗi; 413/415 khi ảnh quá lớn / sai định dạng
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except UnidentifiedImageError:
-        # Phản hồi 400 khi URL không phải ảnh hợp lệ
-        raise HTTPException(status_code=400, detail="The provided URL does not point to a valid image.")
+        # Phản hồi 400 khi dữ liệu không phải ảnh hợp lệ
+        raise HTTPException(status_code=400, detail=invalid_image_detail)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+async def caption_request(body: CaptionRequest) -> CaptionResponse:
+    """Caption cho request JSON: imageUrl (tải về) hoặc imagePath (file local được cho phép)."""
+    mode = caption_mode(body.decoding)
+    if body.imagePath:
+        async def from_file():
+            loop = asyncio.get_running_loop()
+            content = await loop.run_in_executor(decode_executor, read_local_image, body.imagePath)
+            return await caption_image_bytes(content, mode)
+        return await caption_with_errors(from_file(), "The provided file is not a valid image.")
+    if not body.imageUrl:
+        raise HTTPException(status_code=400, detail="imageUrl is required")
+    return await caption_with_errors(
+        caption_image_url(body.imageUrl, mode), "The provided URL does not point to a valid image."
+    )
+
+# Handler đọc body thủ công theo Content-Type nên FastAPI không tự sinh requestBody;
+# khai báo tay để /docs và client sinh từ OpenAPI thấy đủ ba dạng input.
+CAPTION_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": CaptionRequest.model_json_schema()},
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["image"],
+                "properties": {
+                    "image": {"type": "string", "format": "binary"},
+                    "decoding": {"type": "string"},
+                },
+            }
+        },
+        "image/*": {"schema": {"type": "string", "format": "binary"}},
+        **{t: {"schema": {"type": "string", "format": "binary"}} for t in sorted(ALLOWED_EXTRA_CONTENT_TYPES)},
+    },
+}
+
+@app.post("/caption", response_model=CaptionResponse, openapi_extra={"requestBody": CAPTION_REQUEST_BODY})
+async def get_image_caption(request: Request, decoding: str = None):
+    """
+    Ảnh đầu vào theo Content-Type:
+    - application/json: CaptionRequest ({"imageUrl": ...} hoặc {"imagePath": ...})
+    - multipart/form-data: file ở field "image" (+ field "decoding" tùy chọn)
+    - image/* hoặc application/octet-stream: body là bytes của ảnh (?decoding=...)
+    Mọi nguồn đi qua cùng pipeline decode + caption + cache.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type == "multipart/form-data":
+        content, form_decoding = await read_upload(request)
+        mode = caption_mode(form_decoding or decoding)
+        return await caption_with_errors(
+            caption_image_bytes(content, mode), "The uploaded file is not a valid image."
+        )
+    if media_type.startswith("image/") or media_type in ALLOWED_EXTRA_CONTENT_TYPES:
+        content = await read_body_limited(request)
+        mode = caption_mode(decoding)
+        return await caption_with_errors(
+            caption_image_bytes(content, mode), "The request body is not a valid image."
+        )
+
+    try:
+        body = CaptionRequest(**(await request.json()))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid caption request: {e}")
+    if decoding and not body.decoding:
+        body.decoding = decoding
+    return await caption_request(body)
+
+# -----------------------------------------------------------------------------
+# Job API: chấm điểm / caption bất đồng bộ qua hàng đợi có ưu tiên
+# -----------------------------------------------------------------------------
+# Lớp ưu tiên theo thứ tự giảm dần: "live" (thí sinh đang thi) trước "rescore" (chấm lại hàng loạt).
+# JobQueue luôn giữ ít nhất một slot cho "live": rescore chạy tối đa JOB_CONCURRENCY - 1 job
+# (JOB_CONCURRENCY=1 -> rescore bị tắt).
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+JOB_QUEUE_MAX_LIVE = int(os.getenv("JOB_QUEUE_MAX_LIVE", "200"))
+JOB_QUEUE_MAX_RESCORE = int(os.getenv("JOB_QUEUE_MAX_RESCORE", "1000"))
+JOB_RESCORE_MAX_RUNNING = int(os.getenv("JOB_RESCORE_MAX_RUNNING", str(max(0, JOB_CONCURRENCY - 1))))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "600"))
+# File SQLite lưu trạng thái job dùng chung giữa các worker (để trống = chỉ trong process)
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")
+# callback_url: chỉ cho phép các host này (mục bắt đầu bằng "." = mọi subdomain), để trống = tắt callback
+JOB_CALLBACK_ALLOWED_HOSTS = [
+    h.strip() for h in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if h.strip()
+]
+JOB_CALLBACK_SCHEMES = [
+    s.strip() for s in os.getenv("JOB_CALLBACK_SCHEMES", "https").split(",") if s.strip()
+]
+# true: host ghi chính xác trong allowlist được phép resolve ra địa chỉ private / loopback
+# (backend nội bộ, vd. localhost:7162); mặc định chỉ cho địa chỉ public
+JOB_CALLBACK_ALLOW_PRIVATE = os.getenv("JOB_CALLBACK_ALLOW_PRIVATE", "false").lower() == "true"
+
+class ScoreJobRequest(ScoreRequest):
+    priority: str = "live"  # "live" | "rescore"
+    callback_url: str = None  # Optional: POST JobResponse tới URL này khi job xong
+
+class CaptionJobRequest(CaptionRequest):
+    priority: str = "live"
+    callback_url: str = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    priority: str
+    status: str  # queued | running | succeeded | failed
+    queue_position: int = None
+    result: dict = None  # ScoreResponse / CaptionResponse khi succeeded
+    error: dict = None   # {"status_code", "detail"} giống lỗi của endpoint đồng bộ
+    created_at: float
+    started_at: float = None
+    finished_at: float = None
+
+async def run_score_job(request: ScoreRequest) -> dict:
+    try:
+        response = await asyncio.get_running_loop().run_in_executor(None, score_request, request)
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    return jsonable_encoder(response, exclude_none=True)
+
+async def run_caption_job(request: CaptionRequest) -> dict:
+    try:
+        response = await caption_request(request)
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    return jsonable_encoder(response)
+
+def job_response(job) -> JobResponse:
+    return JobResponse(**job.to_dict(), queue_position=job_queue.position(job))
+
+async def post_job_callback(job) -> None:
+    try:
+        # Kiểm tra lại lúc gửi: DNS của host có thể đã đổi sang địa chỉ nội bộ
+        await check_callback_url(
+            job.callback_url, JOB_CALLBACK_ALLOWED_HOSTS, JOB_CALLBACK_SCHEMES, JOB_CALLBACK_ALLOW_PRIVATE
+        )
+        # Không theo redirect: host đích đã được check_callback_url kiểm tra, host redirect tới thì chưa
+        resp = await get_http_client().post(
+            job.callback_url, json=jsonable_encoder(job_response(job)), follow_redirects=False
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        score_logger.warning("Job callback to %s failed for job %s: %s", job.callback_url, job.id, e)
+
+job_queue = JobQueue(
+    {"score": run_score_job, "caption": run_caption_job},
+    [
+        PriorityClass("live", JOB_QUEUE_MAX_LIVE, JOB_CONCURRENCY),
+        PriorityClass("rescore", JOB_QUEUE_MAX_RESCORE, JOB_RESCORE_MAX_RUNNING),
+    ],
+    concurrency=JOB_CONCURRENCY,
+    result_ttl=JOB_RESULT_TTL_SECONDS,
+    on_complete=post_job_callback,
+    store=JobStore(JOB_STORE_PATH) if JOB_STORE_PATH else None,
+)
+
+async def submit_job(kind: str, payload, priority: str, callback_url: str = None) -> JSONResponse:
+    """Đưa job vào hàng đợi: 202 + JobResponse, 429 + Retry-After khi lớp ưu tiên đã đầy."""
+    if callback_url:
+        try:
+            await check_callback_url(
+                callback_url, JOB_CALLBACK_ALLOWED_HOSTS, JOB_CALLBACK_SCHEMES, JOB_CALLBACK_ALLOW_PRIVATE
+            )
+        except CallbackURLRejected as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        job = await job_queue.submit(kind, payload, priority, callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        jobs_submitted_total.inc(kind=kind, priority=priority, outcome="rejected")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    jobs_submitted_total.inc(kind=kind, priority=priority, outcome="accepted")
+    return JSONResponse(status_code=202, content=jsonable_encoder(job_response(job)))
+
+@app.post("/jobs/score", response_model=JobResponse, status_code=202)
+async def submit_score_job(body: ScoreJobRequest):
+    """Như /score_nlp nhưng trả về job_id ngay; kết quả lấy qua GET /jobs/{job_id} hoặc callback_url."""
+    return await submit_job("score", body, body.priority, body.callback_url)
+
+@app.post("/jobs/caption", response_model=JobResponse, status_code=202)
+async def submit_caption_job(body: CaptionJobRequest):
+    """Như /caption nhưng trả về job_id ngay; kết quả lấy qua GET /jobs/{job_id} hoặc callback_url."""
+    return await submit_job("caption", body, body.priority, body.callback_url)
+
+@app.get("/jobs/stats")
+async def get_job_stats():
+    return job_queue.stats()
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found (unknown or expired)")
+    return job_response(job)
+
+# -----------------------------------------------------------------------------
+# Multi-worker serving (gunicorn --preload, xem gunicorn.conf.py)
+# -----------------------------------------------------------------------------
+def after_fork(torch_threads: int = TORCH_NUM_THREADS) -> None:
+    """
+    Chạy trong mỗi worker ngay sau khi fork từ master đã tải sẵn model.
+    Trọng số model được dùng chung copy-on-write; chỉ tạo lại những gì không
+    đi qua fork được: thread pool, lock, connection SQLite, số thread của torch.
+    Pool LanguageTool (FORK_LOCAL_SUBSYSTEMS) được tải riêng trong từng worker.
+    """
+    global grammar_executor, decode_executor
+    configure_torch_threads(torch_threads)
+    for component in subsystems:
+        component.after_fork()
+        if component.enabled and component.name in FORK_LOCAL_SUBSYSTEMS:
+            component.start_background()
+    # Session ONNX Runtime có thread pool riêng (backend torch không cần)
+    if semantic_component.ready and hasattr(embedding_cache.model, "after_fork"):
+        embedding_cache.model.after_fork(torch_threads)
+    grammar_cache.after_fork()
+    prompt_registry.after_fork()
+    if job_queue.store is not None:
+        job_queue.store.after_fork()
+    if caption_cache:
+        caption_cache.after_fork()
+    grammar_executor = TrackedThreadPoolExecutor(max_workers=GRAMMAR_BATCH_WORKERS, thread_name_prefix="grammar")
+    decode_executor = TrackedThreadPoolExecutor(max_workers=CAPTION_DECODE_WORKERS, thread_name_prefix="caption-decode")
@@ -0,0 +1,91 @@
+# batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+
+class MicroBatcher:
+    """
+    Gom các request đồng thời thành một batch rồi gọi `batch_fn` một lần.
+
+    - Request đầu tiên mở một "cửa sổ" chờ tối đa `max_wait_ms`.
+    - Batch được xử lý ngay khi đủ `max_batch_size` hoặc hết thời gian chờ.
+    - `batch_fn(items)` phải trả về list kết quả cùng thứ tự với `items`,
+      mỗi kết quả được trả về đúng Future của caller tương ứng.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        name: str = "micro-batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item: Any) -> Future:
+        """Đưa một item vào hàng đợi, trả về Future chứa kết quả của riêng item đó."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any, timeout: float = None) -> Any:
+        return self.submit(item).result(timeout=timeout)
+
+    def _ensure_started(self):
+        # Khởi động worker thread lười (lazy) để an toàn khi process bị fork
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Bỏ qua các Future đã bị caller hủy
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(batch)} items"
+                    )
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
@@ -0,0 +1,278 @@
+# run.py
+"""
+Benchmark /score_nlp và /caption.
+
+Chạy từ thư mục ToolScoring:
+    python -m benchmarks.run                          # stub backend, chạy offline
+    python -m benchmarks.run --real                   # model thật (cần tải model + Java)
+    python -m benchmarks.run --url http://host:5000   # đo một server đang chạy (không có số liệu theo stage)
+
+Kết quả (JSON) gồm p50/p95/p99, mean, throughput cho từng endpoint / part / mức concurrency
+và thời gian từng stage (grammar, embedding, contradiction, download, decode, generate).
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from benchmarks.workloads import generate_image_set, part_mix
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies_ms, errors: int, wall_seconds: float) -> dict:
+    return {
+        "requests": len(latencies_ms) + errors,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+        "throughput_rps": round(len(latencies_ms) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+class StageTimer:
+    """Ghi lại thời gian của từng stage (ms) khi service chạy trong cùng process."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples[stage].append(elapsed_ms)
+
+    def wrap(self, stage: str, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, started)
+        return wrapper
+
+    def wrap_async(self, stage: str, fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.record(stage, started)
+        return wrapper
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples.clear()
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                stage: {
+                    "calls": len(values),
+                    "p50_ms": round(percentile(values, 50), 2),
+                    "p95_ms": round(percentile(values, 95), 2),
+                    "p99_ms": round(percentile(values, 99), 2),
+                    "mean_ms": round(sum(values) / len(values), 2),
+                }
+                for stage, values in self.samples.items() if values
+            }
+
+
+def instrument(service, timer: StageTimer) -> None:
+    service.check_grammar = timer.wrap("grammar_check", service.check_grammar)
+    service.embedding_cache.encode_many = timer.wrap("embedding_encode", service.embedding_cache.encode_many)
+    service.detect_semantic_contradiction = timer.wrap("contradiction", service.detect_semantic_contradiction)
+    service.decode_image = timer.wrap("caption_decode", service.decode_image)
+    service.download_image = timer.wrap_async("caption_download", service.download_image)
+    service.caption_batcher.batch_fn = timer.wrap("caption_generate", service.caption_batcher.batch_fn)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_in_process_server(asgi_app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.time() + 120
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("in-process server did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def start_image_server(directory: str):
+    """HTTP server cục bộ phục vụ bộ ảnh benchmark (thay cho host ảnh thật)."""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="bench-images", daemon=True).start()
+    return server
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+async def run_level(client: httpx.AsyncClient, url: str, payloads, concurrency: int) -> dict:
+    """Gửi toàn bộ `payloads` với tối đa `concurrency` request đồng thời."""
+    latencies, errors = [], 0
+    queue = list(payloads)
+    lock = asyncio.Lock()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            async with lock:
+                if not queue:
+                    return
+                payload = queue.pop()
+            started = time.perf_counter()
+            try:
+                resp = await client.post(url, json=payload)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_benchmark(base_url: str, image_base_url: str, image_names, args, timer: StageTimer = None) -> dict:
+    results = {"score_nlp": {}, "caption": {}, "stages": {}}
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        # Warmup: tải model (lazy) và làm nóng cache của tokenizer / JIT
+        for payloads in part_mix(args.warmup, seed=args.seed + 1).values():
+            for payload in payloads:
+                await client.post(f"{base_url}/score_nlp", json=payload)
+        if image_names and not args.skip_caption:
+            await client.post(f"{base_url}/caption", json={"imageUrl": f"{image_base_url}/{image_names[0]}"})
+        if timer:
+            timer.reset()
+
+        for concurrency in args.concurrency:
+            level = {}
+            for part, payloads in part_mix(args.requests, seed=args.seed + concurrency).items():
+                level[part] = await run_level(client, f"{base_url}/score_nlp", payloads, concurrency)
+            results["score_nlp"][str(concurrency)] = level
+
+            if not args.skip_caption:
+                payloads = [
+                    {"imageUrl": f"{image_base_url}/{image_names[i % len(image_names)]}?r={concurrency}-{i}"}
+                    for i in range(args.requests)
+                ]
+                results["caption"][str(concurrency)] = await run_level(
+                    client, f"{base_url}/caption", payloads, concurrency
+                )
+
+            if timer:
+                results["stages"][str(concurrency)] = timer.summary()
+                timer.reset()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /score_nlp and /caption")
+    parser.add_argument("--url", help="Đo server có sẵn thay vì khởi động app trong process")
+    parser.add_argument("--real", action="store_true", help="Dùng model thật thay cho stub")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=50, help="Số request mỗi part / mỗi mức concurrency")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--images", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--skip-caption", action="store_true")
+    parser.add_argument("--output", default="bench_results.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    timer = None
+    server = None
+
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        # Không cache: mỗi request phải đi qua toàn bộ pipeline
+        os.environ.setdefault("MODEL_LOAD_MODE", "lazy")
+        os.environ["CAPTION_CACHE_PATH"] = ""
+        os.environ.setdefault("GRAMMAR_CACHE_SIZE", "1")
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        import app as service
+
+        if not args.real:
+            from benchmarks.stubs import install_stubs
+            install_stubs(service)
+        timer = StageTimer()
+        instrument(service, timer)
+        port = free_port()
+        server, _ = start_in_process_server(service.app, port)
+        base_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory(prefix="bench_images_") as image_dir:
+        image_names = [] if args.skip_caption else generate_image_set(image_dir, args.images, seed=args.seed)
+        image_server = start_image_server(image_dir)
+        image_base_url = f"http://127.0.0.1:{image_server.server_address[1]}"
+        try:
+            results = asyncio.run(run_benchmark(base_url, image_base_url, image_names, args, timer))
+        finally:
+            image_server.shutdown()
+            if server is not None:
+                server.should_exit = True
+
+    report = {
+        "config": {
+            "target": args.url or "in-process",
+            "backends": "real" if (args.real or args.url) else "stub",
+            "concurrency": args.concurrency,
+            "requests_per_level": args.requests,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
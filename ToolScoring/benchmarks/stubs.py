@@ -0,0 +1,92 @@
+# stubs.py
+"""
+Backend giả lập cho benchmark offline: không tải model, không khởi động JVM.
+Mỗi stub mô phỏng độ trễ (cố định + theo kích thước input) để benchmark
+phản ánh được hàng đợi / batching / concurrency của service.
+"""
+import hashlib
+import time
+from types import SimpleNamespace
+
+import torch
+
+EMBEDDING_DIM = 384
+
+
+class StubLanguageTool:
+    """Thay LanguageTool: sleep theo số từ, trả về match giả (tất định theo text)."""
+
+    RULES = [
+        ("SUBJECT_VERB_AGREEMENT", "GRAMMAR"),
+        ("EN_A_VS_AN", "MISC"),
+        ("UPPERCASE_SENTENCE_START", "CASING"),
+        ("MORFOLOGIK_RULE_EN_US", "TYPOS"),
+    ]
+
+    def __init__(self, base_ms: float = 8.0, per_word_ms: float = 0.3):
+        self.base_ms = base_ms
+        self.per_word_ms = per_word_ms
+
+    def check(self, text: str):
+        words = text.split()
+        time.sleep((self.base_ms + self.per_word_ms * len(words)) / 1000.0)
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        matches = []
+        for i in range(seed % max(2, len(words) // 8 + 1)):
+            rule_id, category = self.RULES[(seed + i) % len(self.RULES)]
+            matches.append(SimpleNamespace(ruleId=rule_id, category=category, offset=i, errorLength=1))
+        return matches
+
+    def close(self):
+        pass
+
+
+class StubEncoder:
+    """Thay SentenceTransformer: vector chuẩn hóa sinh từ hash của text."""
+
+    def __init__(self, base_ms: float = 4.0, per_text_ms: float = 1.5):
+        self.base_ms = base_ms
+        self.per_text_ms = per_text_ms
+
+    def _vector(self, text: str) -> torch.Tensor:
+        seed = int(hashlib.md5(text.lower().encode("utf-8")).hexdigest()[:8], 16)
+        generator = torch.Generator().manual_seed(seed)
+        vector = torch.randn(EMBEDDING_DIM, generator=generator)
+        return vector / vector.norm()
+
+    def encode(self, sentences, convert_to_tensor: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        time.sleep((self.base_ms + self.per_text_ms * len(texts)) / 1000.0)
+        embeddings = torch.stack([self._vector(t) for t in texts]) if texts else torch.zeros((0, EMBEDDING_DIM))
+        if not convert_to_tensor:
+            embeddings = embeddings.numpy()
+        return embeddings[0] if single else embeddings
+
+
+def stub_caption_runner(base_ms: float = 120.0, per_image_ms: float = 25.0):
+    """Thay CaptionEngine.runner (run_caption_model): chi phí generate cố định mỗi batch + theo số ảnh."""
+
+    def run_caption_model(captioner, images, mode=None):
+        time.sleep((base_ms + per_image_ms * len(images)) / 1000.0)
+        return [f"a stub caption for a {image.width}x{image.height} image" for image in images]
+
+    return run_caption_model
+
+
+def install_stubs(service, grammar_pool_size: int = 2) -> None:
+    """
+    Thay loader của các subsystem trong module app bằng stub.
+    Phải gọi trước khi subsystem được tải (MODEL_LOAD_MODE=lazy).
+    """
+    from grammar_pool import GrammarToolPool
+
+    def load_stub_semantic():
+        service.embedding_cache.model = StubEncoder()
+        return service.embedding_cache
+
+    service.caption_engine.runner = stub_caption_runner()
+    service.caption_component.loader = lambda: SimpleNamespace(device="cpu")
+    service.grammar_component.loader = lambda: GrammarToolPool(StubLanguageTool, size=grammar_pool_size,
+                                                               health_check_interval=0)
+    service.semantic_component.loader = load_stub_semantic
@@ -0,0 +1,156 @@
+# workloads.py
+import os
+import random
+from typing import Dict, List
+
+from PIL import Image, ImageDraw
+
+PART_CODES = ["SPEAKING_PART_1", "SPEAKING_PART_2", "SPEAKING_PART_3", "SPEAKING_PART_4", "SPEAKING_PART_5"]
+
+READ_ALOUD_PASSAGES = [
+    "Attention passengers. The train to Boston will depart from platform four in ten minutes. "
+    "Please have your tickets ready and keep your belongings with you at all times.",
+    "Thank you for calling Greenfield Dental Clinic. Our office is open from eight in the morning until six "
+    "in the evening, Monday through Friday. To schedule an appointment, please press one.",
+    "Welcome to this week's edition of Business Today. In today's program, we will discuss the latest trends "
+    "in online shopping, interview a successful entrepreneur, and review the performance of local markets.",
+]
+
+PICTURE_SAMPLES = [
+    "In this picture I can see a busy market. Several people are walking between the stalls and a man "
+    "in a white shirt is selling fresh vegetables. In the background there are tall buildings.",
+    "This picture shows an office. A woman is sitting at a desk and typing on a laptop. Next to her, "
+    "two colleagues are standing and talking about a document.",
+    "The image shows a quiet park on a sunny day. A family is sitting on the grass having a picnic "
+    "and a small dog is running near a large tree.",
+]
+
+QUESTIONS = {
+    "SPEAKING_PART_3": [
+        ("How often do you use public transportation, and why?",
+         "I take the bus to work almost every day because it is cheaper than driving and I can read on the way."),
+        ("What do you usually do on weekends?",
+         "On weekends I usually go hiking with my friends, and in the evening I like to watch a movie at home."),
+    ],
+    "SPEAKING_PART_4": [
+        ("What time does the conference registration start, and where is it?",
+         "Registration starts at eight thirty in the morning in the main lobby, just before the opening speech."),
+        ("Which sessions are scheduled after lunch?",
+         "After lunch there is a workshop on digital marketing at one o'clock, followed by a panel discussion at three."),
+    ],
+    "SPEAKING_PART_5": [
+        ("Do you prefer working from home or in an office? Give reasons and examples.",
+         "In my opinion, working from home is better. First, I save time because I do not have to commute. "
+         "Second, I can focus more easily, for example when I write reports. However, I still think meeting "
+         "colleagues in the office is useful sometimes. Therefore, a mix of both is ideal for me."),
+        ("What is the most important quality of a good manager?",
+         "I believe the most important quality is the ability to listen. A good manager should understand "
+         "employees' problems, for instance by holding regular meetings. As a result, the team feels valued "
+         "and works harder. In conclusion, listening builds trust."),
+    ],
+}
+
+FILLERS = ["uh", "um", "hmm", "er"]
+OPENERS = ["I think", "In my opinion", "Well", "Actually", "I believe", "To be honest"]
+CONNECTORS = ["because", "so", "and", "but", "although", "for example", "also", "however", "then"]
+TOPIC_WORDS = [
+    "work", "office", "team", "schedule", "customers", "meeting", "project", "budget", "colleagues",
+    "transportation", "weekend", "manager", "training", "presentation", "deadline", "service", "quality",
+    "experience", "market", "products", "communication", "responsibility", "improvement", "efficiency",
+]
+PEOPLE = ["a man", "a woman", "a customer", "a worker", "a child", "a waiter"]
+ACTIONS = ["walking", "standing", "sitting", "talking", "working", "selling fruit", "reading a newspaper"]
+POSITIONS = ["next to", "behind", "in front of", "near", "on the left of", "on the right of"]
+PLACES = ["a large table", "a busy counter", "a small shop", "a colorful stall", "a bright window", "an old building"]
+
+
+def _sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = [rng.choice(OPENERS)]
+    target = rng.randint(min_words, max_words)
+    while len(" ".join(words).split()) < target:
+        choice = rng.random()
+        if choice < 0.15:
+            words.append(rng.choice(CONNECTORS))
+        elif choice < 0.22:
+            words.append(rng.choice(FILLERS))
+        else:
+            words.append(rng.choice(TOPIC_WORDS))
+    return " ".join(words) + "."
+
+
+def read_aloud_item(rng: random.Random) -> dict:
+    passage = rng.choice(READ_ALOUD_PASSAGES)
+    words = passage.split()
+    spoken = []
+    for word in words:
+        roll = rng.random()
+        if roll < 0.08:
+            continue  # bỏ từ
+        if roll < 0.12:
+            spoken.append(rng.choice(FILLERS))
+        spoken.append(word)
+    return {"transcript": " ".join(spoken), "sample_answer": passage, "question": "", "part_code": "SPEAKING_PART_1"}
+
+
+def picture_item(rng: random.Random) -> dict:
+    sample = rng.choice(PICTURE_SAMPLES)
+    sentences = []
+    for _ in range(rng.randint(2, 6)):
+        sentence = f"{rng.choice(PEOPLE)} is {rng.choice(ACTIONS)} {rng.choice(POSITIONS)} {rng.choice(PLACES)}"
+        if rng.random() < 0.25:
+            sentence = f"I cannot see if {sentence}"  # câu phủ định -> contradiction detection
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    return {
+        "transcript": "In this picture I can see " + " ".join(sentences),
+        "sample_answer": sample,
+        "question": "Describe the picture in as much detail as you can.",
+        "part_code": "SPEAKING_PART_2",
+    }
+
+
+def answer_item(rng: random.Random, part_code: str) -> dict:
+    question, sample = rng.choice(QUESTIONS[part_code])
+    if rng.random() < 0.1:
+        transcript = f"{rng.choice(FILLERS)} {rng.choice(FILLERS)} I don't know."  # fragment
+    else:
+        length = {"SPEAKING_PART_3": (2, 3), "SPEAKING_PART_4": (2, 4), "SPEAKING_PART_5": (4, 9)}[part_code]
+        transcript = " ".join(_sentence(rng, 6, 16) for _ in range(rng.randint(*length)))
+    return {"transcript": transcript, "sample_answer": sample, "question": question, "part_code": part_code}
+
+
+def generate_score_requests(part_code: str, count: int, seed: int = 42) -> List[dict]:
+    """Sinh `count` request /score_nlp cho một part (tất định theo seed)."""
+    rng = random.Random(f"{seed}-{part_code}")
+    if part_code == "SPEAKING_PART_1":
+        return [read_aloud_item(rng) for _ in range(count)]
+    if part_code == "SPEAKING_PART_2":
+        return [picture_item(rng) for _ in range(count)]
+    return [answer_item(rng, part_code) for _ in range(count)]
+
+
+def generate_image_set(directory: str, count: int = 8, seed: int = 7) -> List[str]:
+    """
+    Tạo bộ ảnh JPEG cục bộ với kích thước khác nhau (từ ảnh nhỏ đến ảnh chụp độ phân giải cao).
+    Trả về danh sách tên file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    sizes = [(320, 240), (640, 480), (1280, 960), (1920, 1080), (3000, 2000), (4032, 3024)]
+    names = []
+    for i in range(count):
+        width, height = sizes[i % len(sizes)]
+        image = Image.new("RGB", (width, height), tuple(rng.randint(0, 255) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x0, y0 = rng.randint(0, width - 1), rng.randint(0, height - 1)
+            x1, y1 = min(width, x0 + rng.randint(10, width // 2)), min(height, y0 + rng.randint(10, height // 2))
+            draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        name = f"bench_{i}_{width}x{height}.jpg"
+        image.save(os.path.join(directory, name), format="JPEG", quality=90)
+        names.append(name)
+    return names
+
+
+def part_mix(count_per_part: int, seed: int = 42) -> Dict[str, List[dict]]:
+    """`count_per_part` request /score_nlp cho mỗi part, theo thứ tự PART_CODES."""
+    return {part: generate_score_requests(part, count_per_part, seed) for part in PART_CODES}
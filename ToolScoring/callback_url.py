@@ -0,0 +1,82 @@
+# callback_url.py
+import asyncio
+import ipaddress
+import socket
+from typing import Iterable
+from urllib.parse import urlsplit
+
+
+class CallbackURLRejected(ValueError):
+    """callback_url không nằm trong allowlist hoặc trỏ tới địa chỉ nội bộ."""
+
+
+def host_allowed(host: str, allowed_hosts: Iterable[str]) -> bool:
+    """Khớp chính xác, hoặc theo hậu tố với mục bắt đầu bằng "." (".example.com")."""
+    host = host.lower().rstrip(".")
+    for allowed in allowed_hosts:
+        allowed = allowed.lower().rstrip(".")
+        if host == allowed or (allowed.startswith(".") and host.endswith(allowed)):
+            return True
+    return False
+
+
+def _parse_address(address: str):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip
+
+
+def is_public_address(address: str) -> bool:
+    ip = _parse_address(address)
+    # is_global loại private, loopback, link-local, shared (100.64/10), reserved, ...
+    return ip.is_global and not ip.is_multicast
+
+
+def is_internal_address(address: str) -> bool:
+    """
+    Địa chỉ trong mạng nội bộ mà operator có thể cho phép: private hoặc loopback.
+    Link-local (metadata cloud 169.254.169.254), multicast, unspecified, reserved không tính.
+    """
+    ip = _parse_address(address)
+    if ip.is_loopback:
+        return True
+    return ip.is_private and not (ip.is_link_local or ip.is_multicast or ip.is_unspecified or ip.is_reserved)
+
+
+async def check_callback_url(url: str, allowed_hosts: Iterable[str], allowed_schemes: Iterable[str],
+                             allow_private: bool = False) -> None:
+    """
+    Chặn SSRF qua callback_url: scheme và host phải nằm trong allowlist, và mọi
+    địa chỉ IP mà host resolve ra đều phải là địa chỉ public (không private,
+    loopback, link-local, ...). Nên gọi lại ngay trước khi POST để chặn DNS rebinding.
+
+    `allow_private=True`: host khớp CHÍNH XÁC một mục của allowlist (không tính mục
+    hậu tố ".example.com") được resolve ra địa chỉ private / loopback, ví dụ backend
+    nội bộ localhost:7162. Link-local / multicast vẫn bị chặn.
+
+    Raises:
+        CallbackURLRejected
+    """
+    allowed_hosts = list(allowed_hosts)
+    if not allowed_hosts:
+        raise CallbackURLRejected("callback_url is disabled on this instance")
+    parts = urlsplit(url)
+    if parts.scheme.lower() not in {s.lower() for s in allowed_schemes}:
+        raise CallbackURLRejected(f"callback_url scheme '{parts.scheme}' is not allowed")
+    host = parts.hostname
+    if not host or parts.username or parts.password:
+        raise CallbackURLRejected("callback_url must be an absolute URL without credentials")
+    if not host_allowed(host, allowed_hosts):
+        raise CallbackURLRejected(f"callback_url host '{host}' is not in the allowlist")
+    try:
+        port = parts.port or (443 if parts.scheme.lower() == "https" else 80)
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, ValueError) as e:
+        raise CallbackURLRejected(f"callback_url host '{host}' cannot be resolved: {e}")
+    internal_ok = allow_private and host_allowed(host, [h for h in allowed_hosts if not h.startswith(".")])
+    for *_, sockaddr in infos:
+        address = sockaddr[0]
+        if is_public_address(address) or (internal_ok and is_internal_address(address)):
+            continue
+        raise CallbackURLRejected(f"callback_url host '{host}' resolves to a non-public address")
@@ -0,0 +1,150 @@
+# caption_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+class CaptionEntry(NamedTuple):
+    url: str
+    caption: str
+    content_hash: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    created_at: float
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class CaptionCache:
+    """
+    Cache caption lưu trên đĩa (SQLite), giữ nguyên qua các lần restart.
+
+    - Key chính là URL ảnh; lưu kèm SHA-256 nội dung và ETag/Last-Modified
+      để có thể revalidate với server ảnh.
+    - Entry quá `ttl_seconds` bị coi là hết hạn.
+    - Khi vượt `max_entries`, các entry ít được truy cập gần đây nhất bị xóa.
+      Việc dọn (TTL + số dòng) chạy mỗi `evict_every` lần ghi chứ không phải mỗi lần,
+      nên bảng có thể vượt `max_entries` tối đa `evict_every` dòng trong chốc lát.
+    - Mọi method đều là I/O đồng bộ: từ code async hãy gọi qua thread pool.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 10000,
+                 evict_every: int = 64):
+        self.path = path
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.evict_every = max(1, int(evict_every))
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._inherited_conn = None
+        self._conn = self._connect()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS captions (
+                url TEXT PRIMARY KEY,
+                caption TEXT NOT NULL,
+                content_hash TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_captions_hash ON captions(content_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_captions_access ON captions(last_access)")
+        conn.commit()
+        return conn
+
+    def after_fork(self) -> None:
+        """
+        Gọi trong process con sau fork: SQLite không cho dùng connection qua fork,
+        nên mở connection mới (giữ lại, không đóng connection của process cha).
+        """
+        self._inherited_conn = self._conn
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def _is_fresh(self, created_at: float, now: float) -> bool:
+        return now - created_at <= self.ttl_seconds
+
+    def get(self, url: str) -> Optional[CaptionEntry]:
+        """Trả về entry còn hạn theo URL, hoặc None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, caption, content_hash, etag, last_modified, created_at FROM captions WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None or not self._is_fresh(row[5], now):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE captions SET last_access = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+            self.hits += 1
+            return CaptionEntry(*row)
+
+    def get_by_hash(self, digest: str) -> Optional[str]:
+        """Tìm caption của cùng nội dung ảnh (có thể khác URL)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT caption, created_at FROM captions WHERE content_hash = ? ORDER BY created_at DESC LIMIT 1",
+                (digest,),
+            ).fetchone()
+        if row is None or not self._is_fresh(row[1], now):
+            return None
+        return row[0]
+
+    def put(self, url: str, caption: str, digest: str = None, etag: str = None, last_modified: str = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO captions (url, caption, content_hash, etag, last_modified, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (url, caption, digest, etag, last_modified, now, now),
+            )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM captions WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM captions WHERE url IN (SELECT url FROM captions ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()
+        total = self.hits + self.misses
+        return {
+            "size": count,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,96 @@
+# caption_decoding.py
+import threading
+import time
+from typing import Dict
+
+BASELINE_MODE = "beam4"
+
+# Tham số generate cho từng chế độ. "beam4" là cấu hình gốc từ api.py.
+DECODING_MODES: Dict[str, dict] = {
+    "beam4": {"max_length": 16, "num_beams": 4},
+    "beam2": {"max_length": 16, "num_beams": 2},
+    "greedy": {"max_length": 16, "num_beams": 1, "do_sample": False},
+}
+
+
+def resolve_mode(mode: str, default: str = BASELINE_MODE) -> str:
+    name = (mode or default).lower()
+    if name not in DECODING_MODES:
+        raise ValueError(f"Unknown decoding mode '{mode}', expected one of {sorted(DECODING_MODES)}")
+    return name
+
+
+def variant_key(key: str, mode: str, quantized: bool = False) -> str:
+    """Key cache theo biến thể model: chế độ decode và trọng số int8 / float32 cho caption khác nhau."""
+    return f"{key}#decoding={mode}#{'int8' if quantized else 'fp32'}"
+
+
+def conv1d_to_linear(module):
+    """
+    Thay (tại chỗ) mọi Conv1D của GPT-2 bằng nn.Linear tương đương.
+    Conv1D tính x @ weight + bias với weight (in, out), tức Linear có weight chuyển vị;
+    quantize_dynamic chỉ nhận nn.Linear nên phải đổi trước.
+    """
+    import torch
+    try:
+        from transformers.pytorch_utils import Conv1D
+    except ImportError:  # transformers < 4.19
+        from transformers.modeling_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features, bias=child.bias is not None)
+            with torch.no_grad():
+                linear.weight.copy_(child.weight.t())
+                if child.bias is not None:
+                    linear.bias.copy_(child.bias)
+            setattr(module, name, linear)
+        else:
+            conv1d_to_linear(child)
+    return module
+
+
+def quantize_for_cpu(model):
+    """
+    Quantize dynamic int8 mọi lớp tuyến tính: nn.Linear của ViT encoder / lm_head và
+    các Conv1D (attention, MLP) của decoder GPT-2, nơi tốn phần lớn thời gian decode.
+    """
+    import torch
+
+    return torch.quantization.quantize_dynamic(conv1d_to_linear(model), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class LatencyTracker:
+    """Thống kê thời gian generate (ms / ảnh) theo từng chế độ decode."""
+
+    def __init__(self):
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, started: float, images: int) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stat = self._stats.setdefault(mode, {"batches": 0, "images": 0, "seconds": 0.0})
+            stat["batches"] += 1
+            stat["images"] += images
+            stat["seconds"] += elapsed
+
+    def report(self) -> dict:
+        with self._lock:
+            per_image = {
+                mode: stat["seconds"] * 1000 / stat["images"]
+                for mode, stat in self._stats.items() if stat["images"]
+            }
+            baseline = per_image.get(BASELINE_MODE)
+            return {
+                mode: {
+                    "batches": stat["batches"],
+                    "images": stat["images"],
+                    "avg_ms_per_image": round(per_image.get(mode, 0.0), 2),
+                    "speedup_vs_baseline": (
+                        round(baseline / per_image[mode], 2) if baseline and per_image.get(mode) else None
+                    ),
+                }
+                for mode, stat in self._stats.items()
+            }
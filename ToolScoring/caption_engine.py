@@ -0,0 +1,157 @@
+# caption_engine.py
+"""
+Model serving dùng chung cho image captioning (nlpconnect/vit-gpt2-image-captioning).
+
+Cả ToolScoring/app.py (FastAPI) và PictureCaptioningAPI/api.py (Flask shim)
+dùng CaptionEngine này: một bản trọng số cho mỗi process, một API
+generate_caption(s) có micro-batching, cùng tham số decode.
+"""
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import Callable, List, Optional, Tuple
+
+import torch
+from PIL import Image
+from transformers import AutoTokenizer, ViTImageProcessor, VisionEncoderDecoderModel
+
+from batching import MicroBatcher
+from caption_decoding import DECODING_MODES, LatencyTracker, quantize_for_cpu, resolve_mode
+from image_decode import DEFAULT_INPUT_SIZE
+from model_loader import LazyComponent
+
+MODEL_NAME = "nlpconnect/vit-gpt2-image-captioning"
+
+
+def quantization_applies(quantize: bool) -> bool:
+    """Quantize int8 chỉ áp dụng khi model chạy trên CPU."""
+    return quantize and not torch.cuda.is_available()
+
+
+def load_caption_model(model_name: str = MODEL_NAME, quantize: bool = False) -> SimpleNamespace:
+    """
+    Tải processor + tokenizer + model. low_cpu_mem_usage: trọng số safetensors
+    (nếu repo có) được đọc qua mmap thẳng vào model, không khởi tạo ngẫu nhiên
+    một bản rồi copy đè (đỉnh RAM ~1x thay vì ~2x kích thước model).
+    """
+    try:
+        feature_extractor = ViTImageProcessor.from_pretrained(model_name)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        model = VisionEncoderDecoderModel.from_pretrained(model_name, low_cpu_mem_usage=True)
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        model.to(device)
+        model.eval()
+
+        # Thiết lập tham số decoder giống bản gốc
+        model.config.decoder_start_token_id = getattr(tokenizer, "bos_token_id", None) or tokenizer.cls_token_id
+        model.config.eos_token_id = tokenizer.eos_token_id
+        model.config.pad_token_id = tokenizer.pad_token_id
+        model.config.vocab_size = model.config.decoder.vocab_size
+
+        quantized = quantization_applies(quantize)
+        if quantized:
+            model = quantize_for_cpu(model)
+
+        print(f"[Caption] Loaded {model_name} on {device} (quantized={quantized})")
+    except Exception as e:
+        raise RuntimeError(f"Failed to load caption model '{model_name}': {e}")
+
+    return SimpleNamespace(
+        feature_extractor=feature_extractor,
+        tokenizer=tokenizer,
+        model=model,
+        device=device,
+    )
+
+
+def run_caption_model(captioner: SimpleNamespace, images: List[Image.Image], mode: str) -> List[str]:
+    """Một lần generate cho cả batch ảnh với một chế độ decode."""
+    pixel_values = captioner.feature_extractor(images=images, return_tensors="pt").pixel_values.to(captioner.device)
+    with torch.inference_mode():
+        output_ids = captioner.model.generate(pixel_values, **DECODING_MODES[mode])
+    preds = captioner.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+    return [pred.strip() for pred in preds]
+
+
+class CaptionEngine:
+    """
+    Model caption tải lười (LazyComponent) + MicroBatcher gom các ảnh đồng thời.
+
+    - `submit(image, mode)` trả về Future; `generate_caption(s)` là bản đồng bộ.
+    - `on_batch(mode, seconds, images)` (tùy chọn) được gọi sau mỗi lần generate,
+      ví dụ để ghi metrics.
+    - `runner` mặc định là run_caption_model (benchmark thay bằng stub).
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, default_mode: str = "beam4", quantize: bool = False,
+                 max_batch_size: int = 8, max_wait_ms: float = 20.0, enabled: bool = True,
+                 on_batch: Optional[Callable[[str, float, int], None]] = None):
+        self.model_name = model_name
+        self.default_mode = resolve_mode(default_mode)
+        self.quantize = quantize
+        self.on_batch = on_batch
+        self.runner = run_caption_model
+        self.latency = LatencyTracker()
+        self.component = LazyComponent(
+            "caption",
+            lambda: load_caption_model(self.model_name, self.quantize),
+            warmup=lambda captioner: self.runner(captioner, [Image.new("RGB", DEFAULT_INPUT_SIZE)], self.default_mode),
+            enabled=enabled,
+        )
+        self.batcher = MicroBatcher(
+            self._run_batch,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name="caption-batcher",
+        )
+
+    @property
+    def quantized(self) -> bool:
+        """Trọng số int8 (CAPTION_QUANTIZE trên CPU); caption khác bản float32 nên là một phần key cache."""
+        return quantization_applies(self.quantize)
+
+    @property
+    def input_size(self) -> Tuple[int, int]:
+        """(width, height) mà processor của model resize ảnh về; mặc định 224x224 khi model chưa tải."""
+        if self.component.ready:
+            processor = getattr(self.component.get(), "feature_extractor", None)
+            size = getattr(processor, "size", None)
+            if isinstance(size, dict) and "height" in size and "width" in size:
+                return size["width"], size["height"]
+        return DEFAULT_INPUT_SIZE
+
+    def _run_batch(self, items: List[tuple]) -> List[str]:
+        """
+        Sinh caption cho một batch (image, mode); mỗi chế độ decode được
+        generate một lần cho tất cả ảnh của nó. Kết quả cùng thứ tự với `items`.
+        """
+        captioner = self.component.get()
+        results = [None] * len(items)
+        by_mode = {}
+        for i, (_, mode) in enumerate(items):
+            by_mode.setdefault(mode, []).append(i)
+
+        for mode, indices in by_mode.items():
+            started = time.perf_counter()
+            captions = self.runner(captioner, [items[i][0] for i in indices], mode)
+            self.latency.record(mode, started, len(indices))
+            if self.on_batch is not None:
+                self.on_batch(mode, time.perf_counter() - started, len(indices))
+            for i, caption in zip(indices, captions):
+                results[i] = caption
+        return results
+
+    def submit(self, image: Image.Image, mode: str = None) -> Future:
+        return self.batcher.submit((image, resolve_mode(mode, self.default_mode)))
+
+    def generate_caption(self, image: Image.Image, mode: str = None) -> str:
+        return self.submit(image, mode).result()
+
+    def generate_captions(self, images: List[Image.Image], mode: str = None) -> List[str]:
+        """Nhiều ảnh một lần: đưa tất cả vào batcher trước rồi mới chờ, để chúng chung batch."""
+        futures = [self.submit(image, mode) for image in images]
+        return [future.result() for future in futures]
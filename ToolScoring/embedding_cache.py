@@ -0,0 +1,115 @@
+# embedding_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Sequence, Union
+
+import torch
+
+
+def normalize_text(text: str) -> str:
+    """
+    Chuẩn hóa text trước khi làm key cache.
+    all-MiniLM-L6-v2 dùng tokenizer uncased nên lowercase + gộp khoảng trắng
+    không làm thay đổi embedding.
+    """
+    return " ".join((text or "").lower().split())
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    LRU cache giới hạn số phần tử đặt trước SentenceTransformer.encode.
+
+    Dùng cho các text lặp lại nhiều (question, sample answer trong ngân hàng câu hỏi).
+    Transcript của thí sinh nên gọi encode(..., cache=False) để không đẩy các
+    entry hữu ích ra khỏi cache.
+    """
+
+    def __init__(self, model, max_entries: int = 2048):
+        self.model = model
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text: str):
+        key = text_key(text)
+        with self._lock:
+            emb = self._entries.get(key)
+            if emb is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return emb
+
+    def put(self, text: str, emb) -> None:
+        key = text_key(text)
+        with self._lock:
+            self._entries[key] = emb
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def encode(self, text: str, cache: bool = True):
+        """Trả về embedding (tensor) của text, dùng cache nếu được phép."""
+        return self.encode_many([text], cache=cache)[0]
+
+    def encode_many(self, texts: Sequence[str], cache: Union[bool, List[bool]] = True) -> torch.Tensor:
+        """
+        Encode nhiều text bằng MỘT lần gọi model.encode.
+
+        - `cache` là bool hoặc list bool (cùng độ dài `texts`) cho biết text nào
+          được đọc/ghi cache.
+        - Các text trùng nhau chỉ được encode một lần.
+        - Trả về ma trận (len(texts), dim) theo đúng thứ tự đầu vào.
+        """
+        flags = list(cache) if isinstance(cache, (list, tuple)) else [cache] * len(texts)
+        if len(flags) != len(texts):
+            raise ValueError("cache flags must match texts length")
+
+        results = [None] * len(texts)
+        pending = OrderedDict()  # text -> các vị trí cần embedding này
+        for i, (text, use_cache) in enumerate(zip(texts, flags)):
+            if use_cache:
+                emb = self.get(text)
+                if emb is not None:
+                    results[i] = emb
+                    continue
+            pending.setdefault(text, []).append(i)
+
+        if pending:
+            batch = list(pending)
+            batch_embs = self.model.encode(batch, convert_to_tensor=True)
+            for text, emb in zip(batch, batch_embs):
+                positions = pending[text]
+                for i in positions:
+                    results[i] = emb
+                if any(flags[i] for i in positions):
+                    # clone để entry trong cache không giữ cả tensor batch
+                    self.put(text, emb.clone())
+
+        return torch.stack(results)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
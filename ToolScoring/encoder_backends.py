@@ -0,0 +1,198 @@
+# encoder_backends.py
+"""
+Backend cho encoder semantic (all-MiniLM-L6-v2).
+
+- "torch": SentenceTransformer như cũ.
+- "onnx":  graph ONNX export từ cùng model, chạy bằng ONNX Runtime trên CPU,
+           tùy chọn quantize dynamic int8.
+
+Cả hai backend đều có `encode(texts, convert_to_tensor=True)` giống
+SentenceTransformer nên EmbeddingCache dùng được như nhau.
+
+CLI:
+    python encoder_backends.py export [--quantize] [--output DIR]
+    python encoder_backends.py parity [--quantize] [--output DIR] [--tolerance 0.02]
+"""
+import argparse
+import os
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+
+# Bộ câu cố định để so sánh cosine similarity giữa hai backend
+PARITY_PAIRS: List[Tuple[str, str]] = [
+    ("Describe the picture.", "In this picture I can see people walking in a busy market."),
+    ("What do you usually do on weekends?", "On weekends I usually go hiking with my friends."),
+    ("What do you usually do on weekends?", "The meeting has been moved to Thursday afternoon."),
+    ("people walking in the market", "i see anyone in the market"),
+    ("Do you prefer working from home or in an office?",
+     "I think working from home is better because I can focus and save time on commuting."),
+    ("How often do you use public transportation?", "I take the bus to work every day."),
+    ("The conference will be held in the main hall.", "The main hall hosts the conference."),
+    ("uh um I don't know", "A woman is sitting at a desk and typing on a laptop."),
+    ("What is the most important quality of a good manager?",
+     "In my opinion, a good manager should listen to employees, for example by holding regular meetings."),
+    ("Please read the following announcement aloud.",
+     "Attention passengers, the train to Boston will depart from platform four in ten minutes."),
+]
+
+
+class OnnxSentenceEncoder:
+    """
+    Encoder chạy graph ONNX: tokenizer HF -> ONNX Runtime -> mean pooling -> L2 normalize
+    (cùng pipeline với SentenceTransformer all-MiniLM-L6-v2).
+    """
+
+    def __init__(self, onnx_path: str, tokenizer_name: str = DEFAULT_MODEL_NAME,
+                 intra_op_threads: int = 0, batch_size: int = 32):
+        from transformers import AutoTokenizer
+
+        self.onnx_path = onnx_path
+        self.intra_op_threads = intra_op_threads
+        self.session = self._create_session()
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        self.batch_size = batch_size
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if self.intra_op_threads > 0:
+            options.intra_op_num_threads = self.intra_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(self.onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    def after_fork(self, intra_op_threads: int = None) -> None:
+        """
+        Thread pool của ONNX Runtime không đi qua fork: process con tạo session mới
+        (đọc lại file .onnx, có thể đổi số thread cho từng worker).
+        """
+        if intra_op_threads is not None:
+            self.intra_op_threads = intra_op_threads
+        self.session = self._create_session()
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors="np"
+        )
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def encode(self, sentences: Union[str, Sequence[str]], convert_to_tensor: bool = False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        chunks = [self._encode_batch(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        embeddings = np.concatenate(chunks, axis=0) if chunks else np.zeros((0, 384), dtype=np.float32)
+
+        result = torch.from_numpy(embeddings) if convert_to_tensor else embeddings
+        return result[0] if single else result
+
+
+def export_onnx(output_dir: str, model_name: str = DEFAULT_MODEL_NAME, quantize: bool = False) -> str:
+    """
+    Export transformer của all-MiniLM-L6-v2 sang ONNX (token embeddings),
+    tùy chọn quantize dynamic int8. Trả về đường dẫn file .onnx cần dùng.
+    """
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    onnx_path = os.path.join(output_dir, ONNX_FILE)
+
+    if not os.path.exists(onnx_path):
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = tokenizer(["export sample sentence"], return_tensors="pt")
+        input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+        dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+        dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[n] for n in input_names),
+                onnx_path,
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        print(f"[Semantic] Exported {model_name} to {onnx_path}")
+
+    if not quantize:
+        return onnx_path
+
+    int8_path = os.path.join(output_dir, ONNX_INT8_FILE)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"[Semantic] Quantized model written to {int8_path}")
+    return int8_path
+
+
+def parity_check(reference, candidate, pairs: Sequence[Tuple[str, str]] = PARITY_PAIRS,
+                 tolerance: float = 0.02) -> dict:
+    """
+    So sánh cosine similarity của từng cặp câu giữa hai encoder.
+    `ok` = True khi sai lệch lớn nhất <= tolerance.
+    """
+    left = [a for a, _ in pairs]
+    right = [b for _, b in pairs]
+
+    def similarities(encoder) -> torch.Tensor:
+        embs = encoder.encode(left + right, convert_to_tensor=True).float().cpu()
+        a, b = embs[:len(pairs)], embs[len(pairs):]
+        return torch.nn.functional.cosine_similarity(a, b, dim=1)
+
+    diffs = (similarities(reference) - similarities(candidate)).abs()
+    max_diff = float(diffs.max()) if len(pairs) else 0.0
+    return {
+        "ok": max_diff <= tolerance,
+        "max_abs_diff": round(max_diff, 5),
+        "mean_abs_diff": round(float(diffs.mean()) if len(pairs) else 0.0, 5),
+        "tolerance": tolerance,
+        "pairs": len(pairs),
+    }
+
+
+def load_onnx_encoder(output_dir: str, quantize: bool = False, intra_op_threads: int = 0) -> OnnxSentenceEncoder:
+    """Export (nếu chưa có) rồi tải encoder ONNX."""
+    return OnnxSentenceEncoder(export_onnx(output_dir, quantize=quantize), intra_op_threads=intra_op_threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX backend tools for the semantic encoder")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--output", default="onnx_minilm")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(export_onnx(args.output, quantize=args.quantize))
+        return
+
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer("all-MiniLM-L6-v2")
+    candidate = load_onnx_encoder(args.output, quantize=args.quantize)
+    result = parity_check(reference, candidate, tolerance=args.tolerance)
+    print(result)
+    raise SystemExit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
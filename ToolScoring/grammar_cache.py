@@ -0,0 +1,166 @@
+# grammar_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional
+
+
+class GrammarMatch(NamedTuple):
+    """Phần kết quả LanguageTool mà bước chấm điểm cần dùng."""
+    ruleId: str
+    category: str
+    offset: int
+    errorLength: int
+
+    @classmethod
+    def from_match(cls, match) -> "GrammarMatch":
+        return cls(
+            ruleId=match.ruleId or "",
+            category=match.category or "",
+            offset=int(getattr(match, "offset", 0) or 0),
+            errorLength=int(getattr(match, "errorLength", 0) or 0),
+        )
+
+
+# Tăng khi đổi cách tính key: entry cũ trên đĩa không còn được đọc tới
+KEY_VERSION = "2"
+
+
+def rules_signature(disabled_rules: Iterable[str], enabled_categories: Iterable[str] = ()) -> str:
+    """Chuỗi mô tả cấu hình rule; đổi cấu hình -> key cache khác."""
+    return "disabled=" + ",".join(sorted(disabled_rules)) + ";categories=" + ",".join(sorted(enabled_categories))
+
+
+class GrammarCache:
+    """
+    LRU cache kết quả LanguageTool theo (transcript nguyên văn, cấu hình rule).
+
+    Nếu có `path` thì thêm tầng SQLite trên đĩa: miss ở bộ nhớ sẽ đọc từ đĩa
+    và đưa ngược lên bộ nhớ. Tầng đĩa dùng cùng chính sách với CaptionCache:
+    entry quá `ttl_seconds` bị coi là hết hạn, quá `disk_max_entries` thì xóa các
+    entry ít được truy cập gần đây nhất; việc dọn chạy mỗi `evict_every` lần ghi.
+    """
+
+    def __init__(self, signature: str, max_entries: int = 4096, path: str = None,
+                 disk_max_entries: int = 100000, ttl_seconds: float = 30 * 24 * 3600, evict_every: int = 64):
+        self.signature = signature
+        self.max_entries = max(1, int(max_entries))
+        self.disk_max_entries = max(1, int(disk_max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.evict_every = max(1, int(evict_every))
+        self._writes = 0
+        self._entries: "OrderedDict[str, List[GrammarMatch]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.path = path
+        self._inherited_conn = None
+        self._conn = self._connect() if path else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS grammar_matches (key TEXT PRIMARY KEY, matches TEXT NOT NULL)")
+        # File cache cũ không có cột thời gian: thêm vào, các dòng cũ coi như đã hết hạn
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(grammar_matches)")}
+        for column in ("created_at", "last_access"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE grammar_matches ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_grammar_access ON grammar_matches(last_access)")
+        conn.commit()
+        return conn
+
+    def after_fork(self) -> None:
+        """Gọi trong process con sau fork: mở connection SQLite riêng (xem CaptionCache.after_fork)."""
+        self._lock = threading.Lock()
+        if self._conn is not None:
+            self._inherited_conn = self._conn
+            self._conn = self._connect()
+
+    def key(self, text: str) -> str:
+        # Key theo đúng text (không gộp khoảng trắng): offset trong match trỏ vào chính text đó
+        raw = KEY_VERSION + "\0" + self.signature + "\0" + (text or "")
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[GrammarMatch]]:
+        key = self.key(text)
+        with self._lock:
+            matches = self._entries.get(key)
+            if matches is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return matches
+
+            if self._conn is not None:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT matches, created_at FROM grammar_matches WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    self._conn.execute("UPDATE grammar_matches SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    matches = [GrammarMatch(*m) for m in json.loads(row[0])]
+                    self._remember(key, matches)
+                    self.disk_hits += 1
+                    return matches
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, matches: List[GrammarMatch]) -> None:
+        key = self.key(text)
+        with self._lock:
+            self._remember(key, matches)
+            if self._conn is not None:
+                now = time.time()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO grammar_matches (key, matches, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps([list(m) for m in matches]), now, now),
+                )
+                self._writes += 1
+                if self._writes % self.evict_every == 0:
+                    self._evict(now)
+                self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM grammar_matches WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM grammar_matches").fetchone()
+        overflow = count - self.disk_max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM grammar_matches WHERE key IN "
+                "(SELECT key FROM grammar_matches ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def _remember(self, key: str, matches: List[GrammarMatch]) -> None:
+        self._entries[key] = matches
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_enabled": self._conn is not None,
+                "disk_max_entries": self.disk_max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,221 @@
+# grammar_pool.py
+import itertools
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Iterable, List, Optional
+
+HEALTH_CHECK_TEXT = "This is a simple sentence."
+
+
+class GrammarCheckError(Exception):
+    """LanguageTool không trả kết quả (timeout, backend lỗi hoặc pool quá tải)."""
+
+    def __init__(self, message: str, generation: int = None):
+        super().__init__(message)
+        self.generation = generation  # thế hệ của worker khi lỗi xảy ra (xem GrammarWorker.generation)
+
+
+class GrammarCheckTimeout(GrammarCheckError):
+    """Backend chạy check quá timeout (JVM treo) -> cần restart."""
+
+
+class GrammarBackendFailure(GrammarCheckError):
+    """Backend ném lỗi khi check (JVM chết / mất kết nối) -> cần restart."""
+
+
+class GrammarPoolBusy(GrammarCheckError):
+    """Hàng đợi của worker đã đầy: từ chối ngay, không restart gì cả."""
+
+
+class GrammarWorkerRestarted(GrammarCheckError):
+    """Request đang chờ trên worker thì worker bị restart: thử lại, không restart thêm."""
+
+
+class GrammarWorker:
+    """
+    Một backend LanguageTool (một JVM) + một thread riêng để gọi check.
+    Thread riêng cho phép caller bỏ chờ khi quá timeout mà không bị treo theo.
+
+    - Timeout chỉ tính thời gian `tool.check` thực sự chạy, không tính thời gian
+      xếp hàng sau các request khác.
+    - Tối đa `max_queue` request chờ (ngoài request đang chạy); vượt quá -> GrammarPoolBusy.
+    - `generation` tăng mỗi lần restart; lỗi kèm generation cũ được bỏ qua.
+    """
+
+    def __init__(self, index: int, factory: Callable[[], object], max_queue: int = 32):
+        self.index = index
+        self.factory = factory
+        self.max_queue = max(0, int(max_queue))
+        self.tool = None
+        self.executor = None
+        self.healthy = False
+        self.in_flight = 0
+        self.restarts = 0
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self.tool = self.factory()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"grammar-worker-{self.index}")
+        self.healthy = True
+
+    def stop(self) -> None:
+        self.healthy = False
+        tool, executor = self.tool, self.executor
+        self.tool, self.executor = None, None
+        if executor is not None:
+            # Request đang chờ nhận Future bị hủy -> GrammarWorkerRestarted
+            executor.shutdown(wait=False, cancel_futures=True)
+        if tool is not None:
+            try:
+                # Tắt JVM -> request đang treo (nếu có) sẽ lỗi và thread cũ kết thúc
+                tool.close()
+            except Exception as e:
+                print(f"[Grammar] Failed to close worker {self.index}: {e}")
+
+    def restart(self) -> None:
+        with self._lock:
+            self.generation += 1
+        self.stop()
+        self.restarts += 1
+        self.start()
+        print(f"[Grammar] Restarted worker {self.index} (restarts={self.restarts})")
+
+    def check(self, text: str, timeout: Optional[float]):
+        with self._lock:
+            executor, tool, generation = self.executor, self.tool, self.generation
+            if executor is None or tool is None:
+                raise GrammarWorkerRestarted(f"Grammar worker {self.index} is not running", generation)
+            if self.in_flight > self.max_queue:
+                raise GrammarPoolBusy(f"Grammar worker {self.index} queue is full", generation)
+            self.in_flight += 1
+        started = threading.Event()
+
+        def run():
+            started.set()
+            return tool.check(text)
+
+        try:
+            try:
+                future = executor.submit(run)
+            except RuntimeError:  # executor đã shutdown (đang restart)
+                raise GrammarWorkerRestarted(f"Grammar worker {self.index} is restarting", generation)
+            # Chờ đến lượt (không giới hạn: hàng đợi có giới hạn, worker treo sẽ bị restart và hủy Future)
+            while not started.wait(0.05):
+                if future.cancelled():
+                    raise GrammarWorkerRestarted(
+                        f"Grammar worker {self.index} restarted while the request was queued", generation
+                    )
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise GrammarCheckTimeout(
+                    f"Grammar check timed out after {timeout}s on worker {self.index}", generation
+                )
+            except CancelledError:
+                raise GrammarWorkerRestarted(f"Grammar worker {self.index} restarted", generation)
+            except Exception as e:
+                raise GrammarBackendFailure(f"Grammar backend error on worker {self.index}: {e}", generation)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class GrammarToolPool:
+    """
+    Pool nhiều backend LanguageTool, phân phối round-robin.
+
+    - `check_timeout`: thời gian chạy tối đa cho mỗi lần check (giây, không tính thời gian chờ).
+    - `max_queue`: số request chờ tối đa trên mỗi worker; mọi worker đầy -> GrammarPoolBusy.
+    - Chỉ worker treo (timeout) hoặc backend lỗi mới bị đánh dấu unhealthy và restart ở
+      background, và chỉ khi lỗi thuộc thế hệ hiện tại của worker; request được thử lại
+      một lần trên worker khác.
+    - `start_supervisor()` chạy health check định kỳ cho các worker rảnh.
+    """
+
+    def __init__(self, factory: Callable[[], object], size: int = 1,
+                 check_timeout: float = 15.0, health_check_interval: float = 30.0, max_queue: int = 32):
+        self.size = max(1, int(size))
+        self.check_timeout = check_timeout
+        self.health_check_interval = health_check_interval
+        self.workers: List[GrammarWorker] = [GrammarWorker(i, factory, max_queue) for i in range(self.size)]
+        self._next = itertools.count()
+        self._next_lock = threading.Lock()
+        self._supervisor = None
+
+        for worker in self.workers:
+            worker.start()
+
+    def _pick(self, exclude: Iterable[GrammarWorker] = ()) -> GrammarWorker:
+        exclude = set(exclude)
+        with self._next_lock:
+            start = next(self._next)
+        candidates = [self.workers[(start + i) % self.size] for i in range(self.size)]
+        for worker in candidates:
+            if worker.healthy and worker not in exclude:
+                return worker
+        # Không còn worker healthy: vẫn thử worker kế tiếp thay vì từ chối ngay
+        return candidates[0]
+
+    def _restart_async(self, worker: GrammarWorker, error: GrammarCheckError) -> None:
+        """Restart worker nếu lỗi là crash / treo thật của thế hệ hiện tại."""
+        if not isinstance(error, (GrammarCheckTimeout, GrammarBackendFailure)):
+            return
+        with worker._lock:
+            if not worker.healthy or worker.generation != error.generation:
+                return  # đã / đang restart vì lỗi của thế hệ trước
+            worker.healthy = False
+        threading.Thread(target=worker.restart, name=f"grammar-restart-{worker.index}", daemon=True).start()
+
+    def check(self, text: str):
+        tried = []
+        last_error = None
+        for _ in range(min(2, self.size)):
+            worker = self._pick(exclude=tried)
+            tried.append(worker)
+            try:
+                return worker.check(text, self.check_timeout)
+            except GrammarCheckError as e:
+                last_error = e
+                if not isinstance(e, GrammarPoolBusy):
+                    print(f"[Grammar] Worker {worker.index} failed: {e}")
+                self._restart_async(worker, e)
+        raise last_error
+
+    def health_check(self) -> None:
+        for worker in self.workers:
+            if not worker.healthy or worker.in_flight:
+                continue
+            try:
+                worker.check(HEALTH_CHECK_TEXT, self.check_timeout)
+            except GrammarCheckError as e:
+                print(f"[Grammar] Health check failed on worker {worker.index}: {e}")
+                self._restart_async(worker, e)
+
+    def _supervise(self) -> None:
+        while True:
+            time.sleep(self.health_check_interval)
+            self.health_check()
+
+    def start_supervisor(self) -> None:
+        if self.health_check_interval <= 0 or self._supervisor is not None:
+            return
+        self._supervisor = threading.Thread(target=self._supervise, name="grammar-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def status(self) -> list:
+        return [
+            {
+                "worker": w.index,
+                "healthy": w.healthy,
+                "in_flight": w.in_flight,
+                "restarts": w.restarts,
+                "generation": w.generation,
+            }
+            for w in self.workers
+        ]
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.stop()
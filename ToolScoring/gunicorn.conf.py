@@ -0,0 +1,63 @@
+# gunicorn.conf.py
+"""
+Chế độ serving production (Linux): nhiều worker uvicorn dưới gunicorn.
+
+Model (caption, MiniLM) được tải + warmup MỘT lần trong master trước khi fork
+(preload_app), nên các worker dùng chung trang bộ nhớ copy-on-write thay vì mỗi
+worker giữ một bản.
+
+LanguageTool KHÔNG được tải trong master: JVM bị tắt bởi process sở hữu nó
+(restart khi health check lỗi, hook atexit khi worker thoát), nên không thể dùng
+chung qua fork. Mỗi worker tự khởi động pool của mình sau fork, hoặc đặt
+GRAMMAR_REMOTE_SERVER để mọi worker dùng chung một LanguageTool server chạy riêng.
+
+Prompt đăng ký qua /prompts và trạng thái job của /jobs được lưu trong SQLite
+(PROMPT_REGISTRY_PATH, JOB_STORE_PATH) để mọi worker đều thấy.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Biến môi trường:
+    SERVE_BIND         địa chỉ lắng nghe (mặc định 0.0.0.0:5000)
+    SERVE_WORKERS      số worker (mặc định: số core / TORCH_NUM_THREADS)
+    TORCH_NUM_THREADS  thread intra-op torch / ONNX Runtime cho mỗi worker (mặc định 1)
+    SERVE_TIMEOUT      timeout (giây) của một request trước khi worker bị restart
+    GRAMMAR_REMOTE_SERVER  URL LanguageTool server dùng chung (mặc định: mỗi worker một JVM)
+    PROMPT_REGISTRY_PATH   file SQLite của prompt registry (mặc định prompt_registry.sqlite3)
+    JOB_STORE_PATH         file SQLite lưu trạng thái job cho GET /jobs/{id} (mặc định jobs.sqlite3)
+"""
+import gc
+import multiprocessing
+import os
+
+WORKER_TORCH_THREADS = max(1, int(os.getenv("TORCH_NUM_THREADS", "1")))
+
+# Master tải model đồng bộ (không dùng thread nền) và chỉ dùng 1 thread torch:
+# thread pool OpenMP / tokenizers tạo trong master không đi qua fork được.
+os.environ["MODEL_LOAD_MODE"] = "eager"
+os.environ["TORCH_NUM_THREADS"] = "1"
+os.environ["SERVE_PRELOAD"] = "true"
+os.environ.setdefault("PROMPT_REGISTRY_PATH", "prompt_registry.sqlite3")
+os.environ.setdefault("JOB_STORE_PATH", "jobs.sqlite3")
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = os.getenv("SERVE_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("SERVE_WORKERS", "0")) or max(1, multiprocessing.cpu_count() // WORKER_TORCH_THREADS)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("SERVE_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def pre_fork(server, worker):
+    # Đưa mọi object đã tạo vào generation cố định: GC của worker không ghi
+    # vào header của chúng, tránh làm bẩn (copy) các trang bộ nhớ dùng chung
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import app as service
+
+    service.after_fork(WORKER_TORCH_THREADS)
+    server.log.info("Worker %s ready (torch threads=%s)", worker.pid, WORKER_TORCH_THREADS)
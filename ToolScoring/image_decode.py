@@ -0,0 +1,50 @@
+# image_decode.py
+import io
+from typing import Tuple
+
+from PIL import Image
+
+# Kích thước input của ViT trong model caption (ViTImageProcessor resize về 224x224)
+DEFAULT_INPUT_SIZE = (224, 224)
+# Ảnh (sau khi decode rút gọn với JPEG) lớn hơn số pixel này bị từ chối
+DEFAULT_MAX_PIXELS = 40_000_000
+# Resize qua Image.reduce() (trung bình khối, rất nhanh) trước, rồi mới lọc bilinear
+# ở độ phân giải <= 3x kích thước đích
+REDUCING_GAP = 3.0
+
+
+class ImageDecodeError(Exception):
+    """Ảnh không decode được theo giới hạn của service, kèm HTTP status code."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def decode_image(content: bytes, size: Tuple[int, int] = DEFAULT_INPUT_SIZE,
+                 max_pixels: int = DEFAULT_MAX_PIXELS) -> Image.Image:
+    """
+    Decode ảnh thẳng về kích thước input của model (RGB, `size`).
+
+    - JPEG: draft mode để libjpeg decode ở tỉ lệ 1/2, 1/4 hoặc 1/8 (DCT scaling),
+      vẫn >= `size` mỗi chiều, nên không bao giờ giữ ảnh full-resolution trong RAM.
+    - Định dạng khác: decode đầy đủ rồi resize với reducing_gap.
+    - Kích thước đọc từ header được kiểm tra trước khi decode pixel.
+
+    Raises:
+        ImageDecodeError: 413 nếu số pixel cần decode vượt `max_pixels`.
+        PIL.UnidentifiedImageError: không phải ảnh.
+    """
+    image = Image.open(io.BytesIO(content))
+    if image.format == "JPEG":
+        image.draft("RGB", size)
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageDecodeError(
+            f"Image is too large to decode ({width}x{height} pixels, limit {max_pixels}).", status_code=413
+        )
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != tuple(size):
+        image = image.resize(size, Image.BILINEAR, reducing_gap=REDUCING_GAP)
+    return image
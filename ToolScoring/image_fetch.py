@@ -0,0 +1,95 @@
+# image_fetch.py
+from typing import NamedTuple, Optional
+
+import httpx
+
+# Số lần redirect tối đa khi tải ảnh (CDN / signed URL thường chỉ 1-2 lần)
+DEFAULT_MAX_REDIRECTS = 5
+
+# Một số storage trả về octet-stream cho ảnh -> vẫn cho qua, Pillow sẽ kiểm tra lại
+ALLOWED_EXTRA_CONTENT_TYPES = {"application/octet-stream", "binary/octet-stream"}
+
+
+class FetchedImage(NamedTuple):
+    content: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+
+
+class ImageDownloadError(Exception):
+    """Lỗi khi tải ảnh, kèm HTTP status code để endpoint trả về cho client."""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def create_http_client(timeout: float = 20.0, max_connections: int = 32,
+                       max_redirects: int = DEFAULT_MAX_REDIRECTS) -> httpx.AsyncClient:
+    """
+    AsyncClient dùng chung cho cả process: giữ kết nối keep-alive (pool)
+    thay vì mở TCP/TLS mới cho mỗi ảnh.
+
+    Redirect được theo tối đa `max_redirects` lần (chuỗi dài hơn -> lỗi tải ảnh).
+    Request gửi tới URL do client khác kiểm soát mà không được đi tiếp sang host
+    khác (vd. callback) phải truyền follow_redirects=False.
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        follow_redirects=True,
+        max_redirects=max_redirects,
+    )
+
+
+def check_content_type(content_type: str) -> None:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type and not media_type.startswith("image/") and media_type not in ALLOWED_EXTRA_CONTENT_TYPES:
+        raise ImageDownloadError(f"Unsupported content type '{media_type}', expected an image.", status_code=415)
+
+
+async def download_image(client: httpx.AsyncClient, url: str, max_bytes: int,
+                         etag: str = None, last_modified: str = None) -> FetchedImage:
+    """
+    Tải ảnh theo kiểu streaming, dừng ngay khi vượt quá `max_bytes`.
+
+    Nếu truyền `etag` / `last_modified` thì gửi conditional GET; server trả 304
+    -> FetchedImage(not_modified=True) với content rỗng.
+
+    Raises:
+        ImageDownloadError: 413 nếu ảnh quá lớn, 415 nếu không phải ảnh,
+        500 nếu tải lỗi (timeout, HTTP status lỗi, ...).
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        async with client.stream("GET", url, headers=headers) as resp:
+            if resp.status_code == 304:
+                return FetchedImage(b"", etag=etag, last_modified=last_modified, not_modified=True)
+            resp.raise_for_status()
+            check_content_type(resp.headers.get("content-type", ""))
+
+            content_length = resp.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise ImageDownloadError(f"Image exceeds the {max_bytes} byte limit.", status_code=413)
+
+            buffer = bytearray()
+            async for chunk in resp.aiter_bytes():
+                buffer.extend(chunk)
+                if len(buffer) > max_bytes:
+                    raise ImageDownloadError(f"Image exceeds the {max_bytes} byte limit.", status_code=413)
+            return FetchedImage(
+                bytes(buffer),
+                etag=resp.headers.get("etag"),
+                last_modified=resp.headers.get("last-modified"),
+            )
+    except httpx.HTTPError as e:
+        raise ImageDownloadError(f"Failed to download image from URL: {e}", status_code=500)
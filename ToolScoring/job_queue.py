@@ -0,0 +1,388 @@
+# job_queue.py
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class PriorityClass(NamedTuple):
+    """Một lớp ưu tiên: số job chờ tối đa và số job được chạy đồng thời tối đa."""
+    name: str
+    max_queued: int
+    max_running: int
+
+
+class JobQueueFull(Exception):
+    """Hàng đợi của lớp ưu tiên đã đầy; `retry_after` là số giây gợi ý trước khi gửi lại."""
+
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"Job queue '{priority}' is full")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class JobError(Exception):
+    """Lỗi của handler kèm HTTP status code (giống lỗi của endpoint đồng bộ tương ứng)."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(str(detail))
+        self.status_code = status_code
+        self.detail = detail
+
+
+class Job:
+    def __init__(self, kind: str, payload: Any, priority: str, callback_url: str = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.priority = priority
+        self.callback_url = callback_url
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        """Job đọc từ JobStore (không có payload: job đang / đã chạy ở worker khác)."""
+        job = cls(data["kind"], None, data["priority"], data.get("callback_url"))
+        job.id = data["job_id"]
+        job.status = data["status"]
+        job.result = data.get("result")
+        job.error = data.get("error")
+        job.created_at = data["created_at"]
+        job.started_at = data.get("started_at")
+        job.finished_at = data.get("finished_at")
+        return job
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """
+    Trạng thái job (không gồm payload) trong SQLite dùng chung giữa các process:
+    job chạy ở worker đã nhận nó, nhưng GET /jobs/{id} ở worker nào cũng đọc được.
+    `result` / `error` phải serialize được bằng JSON.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._inherited_conn = None
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                callback_url TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_finished ON jobs(finished_at)")
+        conn.commit()
+        return conn
+
+    def after_fork(self) -> None:
+        """Process con sau fork: mở connection SQLite mới (giống CaptionCache.after_fork)."""
+        self._inherited_conn = self._conn
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+
+    def save(self, job: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO jobs
+                    (job_id, kind, priority, status, result, error, callback_url, created_at, started_at, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job["job_id"], job["kind"], job["priority"], job["status"],
+                    json.dumps(job["result"]) if job["result"] is not None else None,
+                    json.dumps(job["error"]) if job["error"] is not None else None,
+                    job.get("callback_url"), job["created_at"], job["started_at"], job["finished_at"],
+                ),
+            )
+            self._conn.commit()
+
+    def load(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, kind, priority, status, result, error, callback_url, created_at, started_at, finished_at "
+                "FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "kind", "priority", "status", "result", "error", "callback_url",
+                "created_at", "started_at", "finished_at")
+        data = dict(zip(keys, row))
+        for key in ("result", "error"):
+            if data[key] is not None:
+                data[key] = json.loads(data[key])
+        return data
+
+    def prune(self, finished_before: float, max_finished: int) -> None:
+        """Xóa job đã xong trước `finished_before` và giữ tối đa `max_finished` job đã xong."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,))
+            self._conn.execute(
+                """
+                DELETE FROM jobs WHERE job_id IN (
+                    SELECT job_id FROM jobs WHERE finished_at IS NOT NULL
+                    ORDER BY finished_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (max_finished,),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Hàng đợi job trong process với các lớp ưu tiên.
+
+    - `classes` theo thứ tự ưu tiên giảm dần; worker rảnh luôn lấy job của lớp
+      cao nhất còn job chờ và chưa chạm `max_running` của lớp đó. Đặt
+      `max_running` của lớp thấp nhỏ hơn `concurrency` để luôn còn worker cho lớp cao.
+    - Mỗi lớp có giới hạn số job chờ riêng: vượt quá -> JobQueueFull (HTTP 429).
+    - `handlers[kind](payload)` là coroutine trả về kết quả (dict) hoặc ném JobError.
+    - Job đã xong được giữ `result_ttl` giây để client poll; `on_complete(job)` (tùy chọn)
+      được gọi sau khi job xong, ví dụ để POST callback.
+    - Luôn giữ ít nhất một slot cho lớp cao nhất: `max_running` của các lớp thấp hơn
+      bị giới hạn ở `concurrency - 1` (= 0 khi concurrency = 1: lớp đó bị tắt).
+    - `store` (JobStore, tùy chọn): trạng thái job được ghi vào storage dùng chung
+      (trên thread riêng, không chặn event loop) để mọi worker đọc được.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[Any], Awaitable[Any]]], classes: List[PriorityClass],
+                 concurrency: int = 4, result_ttl: float = 600.0, max_finished: int = 10000,
+                 on_complete: Callable[[Job], Awaitable[None]] = None, store: JobStore = None,
+                 prune_every: int = 100):
+        self.handlers = handlers
+        self.concurrency = max(1, int(concurrency))
+        self.classes = list(classes[:1]) + [
+            c._replace(max_running=max(0, min(c.max_running, self.concurrency - 1))) for c in classes[1:]
+        ]
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self.on_complete = on_complete
+        self.store = store
+        self.prune_every = max(1, int(prune_every))
+        self._submitted = 0
+        self._store_executor = None
+        self._queues = {c.name: deque() for c in self.classes}
+        self._running = {c.name: 0 for c in self.classes}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._avg_seconds = 1.0
+        self._cond = None
+        self._workers = []
+
+    @property
+    def priorities(self) -> List[str]:
+        return [c.name for c in self.classes]
+
+    def _ensure_started(self) -> None:
+        # Worker (coroutine) tạo lười trong event loop của process hiện tại
+        if self._workers:
+            return
+        self._cond = asyncio.Condition()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+    async def _store_call(self, fn, *args):
+        if self._store_executor is None:
+            self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        return await asyncio.get_running_loop().run_in_executor(self._store_executor, fn, *args)
+
+    async def _persist(self, job: Job) -> None:
+        if self.store is not None:
+            await self._store_call(self.store.save, {**job.to_dict(), "callback_url": job.callback_url})
+
+    def _retry_after(self, priority: str) -> int:
+        queued = sum(len(self._queues[c.name]) for c in self.classes[:self.priorities.index(priority) + 1])
+        return max(1, math.ceil(queued * self._avg_seconds / self.concurrency))
+
+    async def submit(self, kind: str, payload: Any, priority: str, callback_url: str = None) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority '{priority}'. Available: {', '.join(self.priorities)}")
+        priority_class = next(c for c in self.classes if c.name == priority)
+        if priority_class.max_running == 0:
+            raise ValueError(f"Priority '{priority}' is disabled: concurrency {self.concurrency} leaves no slot for it")
+        self._ensure_started()
+        self._prune()
+        if len(self._queues[priority]) >= priority_class.max_queued:
+            raise JobQueueFull(priority, self._retry_after(priority))
+
+        job = Job(kind, payload, priority, callback_url)
+        await self._persist(job)
+        self._jobs[job.id] = job
+        self._queues[priority].append(job)
+        asyncio.ensure_future(self._notify())
+        self._submitted += 1
+        if self.store is not None and self._submitted % self.prune_every == 0:
+            await self._store_call(self.store.prune, time.time() - self.result_ttl, self.max_finished)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Job của process này, hoặc (nếu có store) trạng thái job do worker khác nhận."""
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        data = await self._store_call(self.store.load, job_id)
+        if data is None:
+            return None
+        job = Job.from_dict(data)
+        if job.done and time.time() - job.finished_at > self.result_ttl:
+            return None
+        return job
+
+    def position(self, job: Job) -> Optional[int]:
+        """
+        Số job đứng trước `job` (tính cả các lớp ưu tiên cao hơn); None nếu job
+        không còn chờ hoặc đang chờ ở worker khác.
+        """
+        if job.status != QUEUED or self._jobs.get(job.id) is not job:
+            return None
+        ahead = 0
+        for c in self.classes:
+            queue = self._queues[c.name]
+            if c.name == job.priority:
+                return ahead + queue.index(job)
+            ahead += len(queue)
+        return None
+
+    def _prune(self) -> None:
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(finished) - self.max_finished
+        for job in finished:
+            if excess > 0 or now - job.finished_at > self.result_ttl:
+                self._jobs.pop(job.id, None)
+                excess -= 1
+
+    async def _notify(self) -> None:
+        async with self._cond:
+            self._cond.notify_all()
+
+    def _pick(self) -> Optional[Job]:
+        for c in self.classes:
+            queue = self._queues[c.name]
+            if queue and self._running[c.name] < c.max_running:
+                self._running[c.name] += 1
+                return queue.popleft()
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._cond:
+                job = self._pick()
+                while job is None:
+                    await self._cond.wait()
+                    job = self._pick()
+            try:
+                await self._run(job)
+            finally:
+                self._running[job.priority] -= 1
+                await self._notify()
+
+    async def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        await self._persist_quietly(job)
+        try:
+            job.result = await self.handlers[job.kind](job.payload)
+            job.status = SUCCEEDED
+        except JobError as e:
+            job.error = {"status_code": e.status_code, "detail": e.detail}
+            job.status = FAILED
+        except Exception as e:
+            job.error = {"status_code": 500, "detail": f"An unexpected error occurred: {e}"}
+            job.status = FAILED
+        job.finished_at = time.time()
+        job.payload = None
+        await self._persist_quietly(job)
+        # Trung bình trượt thời gian chạy, dùng để ước lượng Retry-After
+        self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (job.finished_at - job.started_at)
+        if self.on_complete is not None and job.callback_url:
+            # Callback chạy riêng, không giữ chỗ của worker
+            asyncio.ensure_future(self._complete(job))
+
+    async def _persist_quietly(self, job: Job) -> None:
+        # Lỗi storage không được làm hỏng job; trạng thái trong process vẫn đúng
+        try:
+            await self._persist(job)
+        except Exception:
+            pass
+
+    async def _complete(self, job: Job) -> None:
+        try:
+            await self.on_complete(job)
+        except Exception:
+            pass  # on_complete tự ghi log; lỗi callback không ảnh hưởng job
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "avg_job_seconds": round(self._avg_seconds, 3),
+            "classes": {
+                c.name: {
+                    "queued": len(self._queues[c.name]),
+                    "running": self._running[c.name],
+                    "max_queued": c.max_queued,
+                    "max_running": c.max_running,
+                }
+                for c in self.classes
+            },
+            "tracked_jobs": len(self._jobs),
+        }
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {name: len(queue) for name, queue in self._queues.items()}
@@ -0,0 +1,91 @@
+# lexicon.py
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+# Từ (chữ, số, dấu nháy đơn) hoặc dấu kết thúc câu
+_TOKEN_RE = re.compile(r"[a-z0-9']+|[.!?]")
+_SENTENCE_END = {".", "!", "?"}
+
+
+class LexiconScan:
+    """Kết quả quét một transcript: số lần xuất hiện, cụm từ khác nhau và số câu theo từng category."""
+
+    def __init__(self):
+        self.occurrences: Dict[str, int] = defaultdict(int)
+        self.phrases: Dict[str, Set[str]] = defaultdict(set)
+        self.sentence_ids: Dict[str, Set[int]] = defaultdict(set)
+
+    def count(self, category: str) -> int:
+        """Tổng số lần xuất hiện của mọi cụm từ trong category."""
+        return self.occurrences.get(category, 0)
+
+    def distinct(self, category: str) -> int:
+        """Số cụm từ khác nhau của category có mặt trong text."""
+        return len(self.phrases.get(category, ()))
+
+    def has(self, category: str) -> bool:
+        return category in self.phrases
+
+    def sentences(self, category: str) -> int:
+        """Số câu chứa ít nhất một cụm từ của category."""
+        return len(self.sentence_ids.get(category, ()))
+
+
+class Lexicon:
+    """
+    Bộ so khớp nhiều danh sách từ / cụm từ trong MỘT lượt quét.
+
+    Mọi cụm từ được biên dịch một lần thành trie trên token (automaton
+    nhiều pattern), nên so khớp luôn theo ranh giới từ ("so" không khớp
+    trong "also") và tìm được cả các match chồng nhau ("next to" và "next").
+    Chi phí quét tỉ lệ với số token x độ dài cụm dài nhất, không phụ thuộc
+    số danh sách.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self._trie: dict = {}
+        self.max_phrase_tokens = 0
+        self.categories = {}
+        for category, phrases in categories.items():
+            self.categories[category] = list(phrases)
+            for phrase in self.categories[category]:
+                self._add(category, phrase)
+
+    def _add(self, category: str, phrase: str) -> None:
+        tokens = _TOKEN_RE.findall(phrase.lower())
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(None, []).append((category, " ".join(tokens)))
+        self.max_phrase_tokens = max(self.max_phrase_tokens, len(tokens))
+
+    def scan(self, text: str) -> LexiconScan:
+        result = LexiconScan()
+        words: List[str] = []
+        sentence_of: List[int] = []
+        sentence = 0
+        for token in _TOKEN_RE.findall((text or "").lower()):
+            if token in _SENTENCE_END:
+                if sentence_of and sentence_of[-1] == sentence:
+                    sentence += 1
+                continue
+            words.append(token)
+            sentence_of.append(sentence)
+
+        for start in range(len(words)):
+            node = self._trie
+            for pos in range(start, min(start + self.max_phrase_tokens, len(words))):
+                node = node.get(words[pos])
+                if node is None:
+                    break
+                # Cụm từ không vắt qua hai câu
+                if sentence_of[pos] != sentence_of[start]:
+                    break
+                for category, phrase in node.get(None, ()):
+                    result.occurrences[category] += 1
+                    result.phrases[category].add(phrase)
+                    result.sentence_ids[category].add(sentence_of[start])
+        return result
@@ -0,0 +1,114 @@
+# model_loader.py
+import threading
+import time
+from typing import Callable, Optional
+
+DISABLED = "disabled"
+PENDING = "pending"
+LOADING = "loading"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class ComponentUnavailable(Exception):
+    """Subsystem bị tắt trên instance này hoặc tải thất bại."""
+
+
+class LazyComponent:
+    """
+    Một subsystem (model / công cụ) được tải lười hoặc tải nền, rồi warmup.
+
+    - `loader()` trả về object của subsystem.
+    - `warmup(obj)` (tùy chọn) chạy một lần inference để khởi tạo kernel / JIT;
+      warmup lỗi chỉ ghi log, component vẫn READY.
+    - `get()` chờ đến khi tải xong (tự tải nếu chưa ai bắt đầu).
+    """
+
+    def __init__(self, name: str, loader: Callable[[], object],
+                 warmup: Optional[Callable[[object], None]] = None, enabled: bool = True):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.enabled = enabled
+        self.state = PENDING if enabled else DISABLED
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._value = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start_background(self) -> None:
+        if not self.enabled or self._thread is not None or self.state != PENDING:
+            return
+        self._thread = threading.Thread(target=self._load_quietly, name=f"load-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _load_quietly(self) -> None:
+        try:
+            self.load()
+        except ComponentUnavailable:
+            pass
+
+    def load(self) -> object:
+        if not self.enabled:
+            raise ComponentUnavailable(f"'{self.name}' is disabled on this instance")
+        with self._lock:
+            if self.state == READY:
+                return self._value
+            if self.state == FAILED:
+                raise ComponentUnavailable(f"'{self.name}' failed to load: {self.error}")
+
+            self.state = LOADING
+            started = time.perf_counter()
+            try:
+                value = self.loader()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                print(f"[Startup] Failed to load {self.name}: {e}")
+                raise ComponentUnavailable(f"'{self.name}' failed to load: {e}")
+            self.load_seconds = round(time.perf_counter() - started, 3)
+
+            if self.warmup is not None:
+                self.state = WARMING
+                started = time.perf_counter()
+                try:
+                    self.warmup(value)
+                except Exception as e:
+                    print(f"[Startup] Warmup for {self.name} failed: {e}")
+                self.warmup_seconds = round(time.perf_counter() - started, 3)
+
+            self._value = value
+            self.state = READY
+            print(f"[Startup] {self.name} ready (load {self.load_seconds}s, warmup {self.warmup_seconds}s)")
+            return value
+
+    def get(self) -> object:
+        if self.state == READY:
+            return self._value
+        return self.load()
+
+    def after_fork(self) -> None:
+        """
+        Gọi trong process con sau fork. Component đã READY được dùng chung
+        (copy-on-write); component đang tải dở trên thread của process cha
+        thì quay về PENDING để process con tự tải lại.
+        """
+        self._lock = threading.Lock()
+        self._thread = None
+        if self.state in (LOADING, WARMING):
+            self.state = PENDING
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
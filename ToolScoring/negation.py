@@ -0,0 +1,99 @@
+# negation.py
+import re
+from typing import List, Tuple
+
+# Token: từ (kể cả dạng rút gọn can't / don't), hoặc dấu ngắt mệnh đề / câu
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[,;:.!?]")
+# Dấu nháy cong (speech recognizer / bàn phím điện thoại: can’t, don‘t) -> "'"
+_APOSTROPHES = str.maketrans({"\u2019": "'", "\u2018": "'"})
+_SENTENCE_END = {".", "!", "?"}
+_CLAUSE_PUNCT = {",", ";", ":"}
+
+# Từ nối mở đầu mệnh đề mới -> kết thúc phạm vi phủ định
+CLAUSE_BREAKERS = {
+    "but", "however", "although", "though", "yet", "while", "whereas", "because", "so", "and",
+}
+
+# Từ phủ định -> từ thay thế khi dựng lại nội dung bị phủ định ("" = bỏ đi)
+NEGATION_CUES = {
+    "not": "", "no": "", "never": "", "neither": "", "nor": "", "without": "with",
+    "cannot": "can", "cant": "can",
+    "nobody": "somebody", "noone": "someone", "nothing": "something",
+    "nowhere": "somewhere", "none": "some",
+}
+
+# Dạng rút gọn n't -> động từ gốc (các dạng khác bỏ "n't")
+CONTRACTIONS = {
+    "can't": "can", "won't": "will", "shan't": "shall", "ain't": "is",
+}
+
+MIN_CLAUSE_CHARS = 5
+
+
+def negation_replacement(token: str):
+    """Từ thay thế nếu token là từ phủ định, ngược lại None."""
+    if token in NEGATION_CUES:
+        return NEGATION_CUES[token]
+    if token in CONTRACTIONS:
+        return CONTRACTIONS[token]
+    if token.endswith("n't"):
+        return token[:-3]
+    return None
+
+
+def _clauses(tokens: List[str]) -> List[List[str]]:
+    """Tách dãy token thành các mệnh đề theo dấu câu và từ nối."""
+    clauses, current = [], []
+    for token in tokens:
+        if token in _SENTENCE_END or token in _CLAUSE_PUNCT:
+            if current:
+                clauses.append(current)
+            current = []
+        elif token in CLAUSE_BREAKERS and current:
+            clauses.append(current)
+            current = [token]
+        else:
+            current.append(token)
+    if current:
+        clauses.append(current)
+    return clauses
+
+
+def find_negated_clauses(text: str, max_clauses: int = None) -> List[Tuple[str, str]]:
+    """
+    Tìm các mệnh đề có từ phủ định thật sự (so khớp theo token: "know" không chứa "no",
+    "nothing" không bị coi là "not" + "hing") và dựng lại nội dung bị phủ định:
+    bỏ từ phủ định hoặc thay bằng dạng khẳng định ("can't" -> "can", "nobody" -> "somebody").
+
+    "no one" được xử lý thành "someone". Trả về list (clause, de_negated_clause),
+    tối đa `max_clauses` phần tử (theo thứ tự xuất hiện).
+    """
+    tokens = _TOKEN_RE.findall((text or "").translate(_APOSTROPHES).lower())
+    results = []
+    for clause in _clauses(tokens):
+        rebuilt, negated = [], False
+        i = 0
+        while i < len(clause):
+            token = clause[i]
+            if token == "no" and i + 1 < len(clause) and clause[i + 1] == "one":
+                rebuilt.append("someone")
+                negated = True
+                i += 2
+                continue
+            replacement = negation_replacement(token)
+            if replacement is None:
+                rebuilt.append(token)
+            else:
+                negated = True
+                if replacement:
+                    rebuilt.append(replacement)
+            i += 1
+        if not negated:
+            continue
+        clean = " ".join(rebuilt)
+        if len(clean) < MIN_CLAUSE_CHARS:
+            continue
+        results.append((" ".join(clause), clean))
+        if max_clauses is not None and len(results) >= max_clauses:
+            break
+    return results
@@ -0,0 +1,165 @@
+# prompt_registry.py
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class PromptArtifacts(NamedTuple):
+    """
+    Các dữ liệu chỉ phụ thuộc vào câu hỏi / sample answer, tính một lần
+    rồi dùng lại cho mọi transcript của cùng một prompt.
+    """
+    prompt_id: Optional[str]
+    question_text: str              # đã fallback về sample answer nếu không có question
+    sample_answer_text: str
+    part_code: Optional[str]
+    question_keywords: List[str]
+    read_aloud_words: List[str]     # sample đã bỏ dấu câu + lowercase (Part 1)
+    sample_length: int
+    question_embedding: object = None
+    sample_embedding: object = None
+
+
+def extract_keywords(text: str) -> List[str]:
+    question_words = {'what', 'when', 'where', 'who', 'why', 'how', 'which',
+                      'do', 'does', 'did', 'is', 'are', 'was', 'were', 'can'}
+    stop_words = {'the', 'be', 'to', 'of', 'and', 'a', 'in', 'that', 'have',
+                  'it', 'for', 'not', 'on', 'with', 'as', 'you', 'at'}
+    words = re.sub(r'[^\w\s]', '', text.lower()).split()
+    return [w for w in words if w not in question_words and w not in stop_words and len(w) > 3]
+
+
+def build_prompt_artifacts(question: str, sample_answer: str, part_code: str = None,
+                           prompt_id: str = None, encoder=None) -> PromptArtifacts:
+    """
+    Tính các artifact cho một prompt. Nếu truyền `encoder` (EmbeddingCache)
+    thì embedding của question và sample answer cũng được tính sẵn trong một lần encode.
+    """
+    sample_answer_text = sample_answer or ""
+    question_text = question or sample_answer_text  # Fallback to sample if no question
+    read_aloud_words = re.sub(r'[^\w\s]', '', sample_answer_text.lower()).split()
+
+    question_embedding = sample_embedding = None
+    if encoder is not None:
+        embs = encoder.encode_many([question_text, sample_answer_text], cache=False)
+        question_embedding, sample_embedding = embs[0].clone(), embs[1].clone()
+
+    return PromptArtifacts(
+        prompt_id=prompt_id,
+        question_text=question_text,
+        sample_answer_text=sample_answer_text,
+        part_code=(part_code or "").upper() or None,
+        question_keywords=extract_keywords(question_text),
+        read_aloud_words=read_aloud_words,
+        sample_length=len(sample_answer_text.split()),
+        question_embedding=question_embedding,
+        sample_embedding=sample_embedding,
+    )
+
+
+class PromptRegistry:
+    """
+    Lưu PromptArtifacts theo prompt_id (thread-safe).
+
+    Nếu có `path`, nội dung prompt (question, sample answer, part code) được lưu
+    trong SQLite dùng chung giữa các process (gunicorn nhiều worker): worker nào
+    cũng thấy prompt do worker khác đăng ký / xóa. Mỗi worker tự tính lại artifact
+    (kể cả embedding) bằng `builder(question, sample_answer, part_code, prompt_id)`
+    khi gặp prompt mới hoặc phiên bản mới, rồi giữ trong bộ nhớ.
+    """
+
+    def __init__(self, path: str = None, builder: Callable[..., PromptArtifacts] = None):
+        self.path = path
+        self.builder = builder or (
+            lambda question, sample_answer, part_code, prompt_id:
+            build_prompt_artifacts(question, sample_answer, part_code, prompt_id=prompt_id)
+        )
+        self._prompts: Dict[str, PromptArtifacts] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._inherited_conn = None
+        self._conn = self._connect() if path else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prompts (
+                prompt_id TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                sample_answer TEXT NOT NULL,
+                part_code TEXT,
+                version INTEGER NOT NULL
+            )
+            """
+        )
+        conn.commit()
+        return conn
+
+    def after_fork(self) -> None:
+        """Process con sau fork: mở connection SQLite mới (giống CaptionCache.after_fork)."""
+        self._lock = threading.Lock()
+        if self._conn is not None:
+            self._inherited_conn = self._conn
+            self._conn = self._connect()
+
+    def register(self, artifacts: PromptArtifacts) -> None:
+        version = time.time_ns()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO prompts (prompt_id, question, sample_answer, part_code, version) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (artifacts.prompt_id, artifacts.question_text, artifacts.sample_answer_text,
+                     artifacts.part_code, version),
+                )
+                self._conn.commit()
+            self._prompts[artifacts.prompt_id] = artifacts
+            self._versions[artifacts.prompt_id] = version
+
+    def get(self, prompt_id: str) -> Optional[PromptArtifacts]:
+        with self._lock:
+            if self._conn is None:
+                return self._prompts.get(prompt_id)
+            row = self._conn.execute(
+                "SELECT question, sample_answer, part_code, version FROM prompts WHERE prompt_id = ?",
+                (prompt_id,),
+            ).fetchone()
+            if row is None:
+                # Đã bị xóa (có thể bởi worker khác)
+                self._prompts.pop(prompt_id, None)
+                self._versions.pop(prompt_id, None)
+                return None
+            if self._versions.get(prompt_id) == row[3]:
+                return self._prompts[prompt_id]
+        # Prompt do worker khác đăng ký / cập nhật: tính artifact ngoài lock (có thể encode)
+        question, sample_answer, part_code, version = row
+        artifacts = self.builder(question, sample_answer, part_code, prompt_id)
+        with self._lock:
+            self._prompts[prompt_id] = artifacts
+            self._versions[prompt_id] = version
+        return artifacts
+
+    def remove(self, prompt_id: str) -> bool:
+        with self._lock:
+            removed = self._prompts.pop(prompt_id, None) is not None
+            self._versions.pop(prompt_id, None)
+            if self._conn is not None:
+                removed = self._conn.execute("DELETE FROM prompts WHERE prompt_id = ?", (prompt_id,)).rowcount > 0
+                self._conn.commit()
+            return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._conn is not None:
+                return self._conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+            return len(self._prompts)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
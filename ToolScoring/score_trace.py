@@ -0,0 +1,76 @@
+# score_trace.py
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+
+class ScoreTrace:
+    """
+    Breakdown của một lần chấm: dimension, penalty, bonus theo từng phần
+    (grammar / content / vocabulary). Chỉ được tạo khi request cần trace,
+    code chấm điểm kiểm tra `trace is not None` nên không tốn gì khi tắt.
+    """
+
+    def __init__(self, reason: str):
+        self.reason = reason  # "explain" | "sampled"
+        self.sections: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, section: str, **values) -> None:
+        self.sections.setdefault(section, {}).update(values)
+
+    def append(self, section: str, key: str, item: Any) -> None:
+        self.sections.setdefault(section, {}).setdefault(key, []).append(item)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: dict(values) for name, values in self.sections.items()}
+
+
+def start_trace(explain: bool, sample_rate: float) -> Optional[ScoreTrace]:
+    """ScoreTrace khi client yêu cầu explain hoặc request rơi vào tỉ lệ lấy mẫu, ngược lại None."""
+    if explain:
+        return ScoreTrace("explain")
+    if sample_rate > 0 and random.random() < sample_rate:
+        return ScoreTrace("sampled")
+    return None
+
+
+def create_async_logger(name: str, level: str = "WARNING") -> logging.Logger:
+    """
+    Logger ghi qua QueueHandler: thread của request chỉ đưa record vào queue,
+    QueueListener (thread riêng) mới ghi ra stderr.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, level.upper(), logging.WARNING))
+    logger.propagate = False
+    if not logger.handlers:
+        records: "queue.Queue" = queue.Queue(-1)
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+        listener = QueueListener(records, stream, respect_handler_level=True)
+        handler = QueueHandler(records)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(handler)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=lambda: _restart_listener(listener, handler))
+    return logger
+
+
+def _restart_listener(listener: QueueListener, handler: QueueHandler) -> None:
+    """Thread của listener không tồn tại trong process con sau fork: tạo queue + thread mới."""
+    records: "queue.Queue" = queue.Queue(-1)
+    listener.queue = records
+    handler.queue = records
+    listener._thread = None
+    listener.start()
+
+
+def log_trace(logger: logging.Logger, trace: ScoreTrace, **context) -> None:
+    """Ghi breakdown thành một dòng JSON ở mức INFO (bỏ qua hoàn toàn nếu level cao hơn)."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"reason": trace.reason, **context, "breakdown": trace.to_dict()}, default=str))
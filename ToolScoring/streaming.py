@@ -0,0 +1,135 @@
+# streaming.py
+import asyncio
+import re
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Tuple
+
+# Dấu kết thúc câu; là ranh giới câu khi theo sau là khoảng trắng (hoặc hết text)
+_BOUNDARY_RE = re.compile(r"[.!?]+")
+
+# Từ viết tắt có dấu chấm không kết thúc câu ("Dr. Smith", "e.g. this"), so khớp không phân biệt hoa thường
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "st", "jr", "sr", "vs", "mt", "e.g", "i.e", "approx",
+}
+
+
+def split_sentences(text: str) -> Tuple[List[Tuple[int, str]], int]:
+    """
+    Tách các câu hoàn chỉnh ở đầu `text`.
+
+    Trả về ([(offset, sentence)], consumed): offset là vị trí của câu (đã strip)
+    trong `text`, consumed là số ký tự đã tách (phần sau đó chưa có dấu kết thúc câu).
+    Dấu chấm nằm trong token ("3.5", "U.S.A") hoặc sau từ viết tắt ("Dr.") không kết thúc câu.
+    """
+    sentences, start = [], 0
+    for match in _BOUNDARY_RE.finditer(text):
+        end = match.end()
+        if end < len(text) and not text[end].isspace():
+            continue
+        if match.group() == ".":
+            words = text[start:match.start()].split()
+            if words and words[-1].lower() in ABBREVIATIONS:
+                continue
+        raw = text[start:end]
+        sentence = raw.strip()
+        if sentence.rstrip(".!?").strip():
+            sentences.append((start + len(raw) - len(raw.lstrip()), sentence))
+        start = end
+    return sentences, start
+
+
+class TranscriptAccumulator:
+    """
+    Ghép các segment do speech recognizer gửi tới thành transcript và tách
+    ra những câu vừa hoàn chỉnh (phần chưa có dấu kết thúc câu được giữ lại).
+    `sentences` giữ mọi câu đã tách kèm offset của câu trong `text`.
+    """
+
+    def __init__(self):
+        self.segments: List[str] = []
+        self.sentences: List[Tuple[int, str]] = []
+        self._pending = ""
+        self._pending_offset = 0
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.sentences)
+
+    @property
+    def text(self) -> str:
+        """Transcript hiện tại: các segment nối bằng một khoảng trắng."""
+        return " ".join(self.segments)
+
+    def append(self, segment: str) -> List[str]:
+        """Thêm một segment, trả về các câu vừa hoàn chỉnh."""
+        segment = (segment or "").strip()
+        if not segment:
+            return []
+        if not self._pending:
+            # _pending luôn là đoạn cuối của text, bắt đầu tại _pending_offset
+            self._pending_offset = len(self.text) + (1 if self.segments else 0)
+        self.segments.append(segment)
+        self._pending = f"{self._pending} {segment}" if self._pending else segment
+
+        found, consumed = split_sentences(self._pending)
+        found = [(self._pending_offset + offset, sentence) for offset, sentence in found]
+        remainder = self._pending[consumed:]
+        self._pending = remainder.strip()
+        self._pending_offset += consumed + len(remainder) - len(remainder.lstrip())
+        self.sentences.extend(found)
+        return [sentence for _, sentence in found]
+
+    def flush(self) -> List[str]:
+        """Câu cuối chưa có dấu kết thúc (khi thí sinh nói xong)."""
+        remainder, self._pending = self._pending, ""
+        if remainder:
+            self.sentences.append((self._pending_offset, remainder))
+            return [remainder]
+        return []
+
+
+def _shift_offset(match, delta: int):
+    return match._replace(offset=match.offset + delta)
+
+
+class SentenceChecker:
+    """
+    Chạy `fn(text)` trên executor cho từng câu vừa hoàn chỉnh (mỗi câu đúng một lần)
+    thay vì chạy lại trên cả transcript sau mỗi câu, nên tổng công việc tuyến tính
+    theo độ dài transcript.
+
+    - Câu trước được ghép vào làm ngữ cảnh (rule liên quan đến câu liền trước vẫn
+      bắt được); chỉ giữ các match bắt đầu trong câu mới.
+    - Offset của match (`shift(match, delta)`) được dời về vị trí câu trong transcript.
+    - Lỗi của các lần chạy nền bị bỏ qua trong `completed()`.
+    """
+
+    def __init__(self, fn: Callable[[str], list], executor: Optional[Executor] = None,
+                 shift: Callable[[Any, int], Any] = _shift_offset):
+        self.fn = fn
+        self.executor = executor
+        self.shift = shift
+        self.runs = 0
+        self._checks = []  # asyncio.Future, theo thứ tự câu
+        self._previous = ""
+
+    def submit(self, offset: int, sentence: str) -> None:
+        context, self._previous = self._previous, sentence
+        prefix = f"{context} " if context else ""
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, self._check, prefix + sentence, len(prefix), offset
+        )
+        # Tránh cảnh báo "exception was never retrieved" cho lần chạy lỗi
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._checks.append(future)
+        self.runs += 1
+
+    def _check(self, text: str, start: int, offset: int) -> list:
+        return [self.shift(match, offset - start) for match in self.fn(text) if match.offset >= start]
+
+    def completed(self) -> Optional[list]:
+        """Match của các câu đã check xong (None nếu chưa có câu nào xong)."""
+        done = [f for f in self._checks if f.done() and not f.cancelled() and f.exception() is None]
+        if not done:
+            return None
+        return [match for future in done for match in future.result()]
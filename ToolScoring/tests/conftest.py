@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def service():
+    """Module app với subsystem giả lập (benchmarks/stubs.py): không tải model, không khởi động JVM."""
+    for module in ("fastapi", "httpx", "torch", "transformers", "sentence_transformers", "language_tool_python"):
+        pytest.importorskip(module)
+    os.environ["MODEL_LOAD_MODE"] = "lazy"
+    os.environ["CAPTION_CACHE_PATH"] = ""
+    import app
+    from benchmarks.stubs import install_stubs
+
+    install_stubs(app)
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(service):
+    from fastapi.testclient import TestClient
+
+    return TestClient(service.app)
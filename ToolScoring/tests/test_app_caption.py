@@ -0,0 +1,6 @@
+def test_caption_openapi_documents_every_input_form(client):
+    spec = client.get("/openapi.json").json()
+    body = spec["paths"]["/caption"]["post"]["requestBody"]["content"]
+    assert set(body) >= {"application/json", "multipart/form-data", "image/*", "application/octet-stream"}
+    assert set(body["application/json"]["schema"]["properties"]) == {"imageUrl", "imagePath", "decoding"}
+    assert body["multipart/form-data"]["schema"]["properties"]["image"]["format"] == "binary"
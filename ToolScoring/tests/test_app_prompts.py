@@ -0,0 +1,39 @@
+from model_loader import LazyComponent
+
+
+def test_score_requires_sample_answer_or_prompt_id(client):
+    response = client.post("/score_nlp", json={"transcript": "I like the park.", "question": "Where do you go?"})
+    assert response.status_code == 422
+    assert "sample_answer is required" in response.text
+
+
+def test_score_accepts_explicit_empty_sample_answer(client):
+    # Như trước: trường có mặt (kể cả rỗng) là hợp lệ
+    response = client.post("/score_nlp", json={
+        "transcript": "Good morning everyone.", "sample_answer": "", "part_code": "SPEAKING_PART_1",
+    })
+    assert response.status_code == 200
+
+
+def test_score_with_registered_prompt_needs_no_sample_answer(client):
+    registered = client.post("/prompts", json={
+        "prompt_id": "read-aloud-1", "sample_answer": "Welcome to the city museum.", "part_code": "SPEAKING_PART_1",
+    })
+    assert registered.status_code == 200
+    response = client.post("/score_nlp", json={"transcript": "Welcome to the city museum.", "prompt_id": "read-aloud-1"})
+    assert response.status_code == 200
+
+
+def test_read_aloud_prompt_registers_without_semantic_scoring(service, client, monkeypatch):
+    disabled = LazyComponent("semantic", lambda: None, enabled=False)
+    monkeypatch.setattr(service, "semantic_component", disabled)
+    response = client.post("/prompts", json={
+        "prompt_id": "read-aloud-2", "sample_answer": "Please keep your ticket.", "part_code": "SPEAKING_PART_1",
+    })
+    assert response.status_code == 200
+    assert response.json()["sample_length"] == 4
+    # Prompt cần embedding vẫn báo 503 khi semantic bị tắt
+    response = client.post("/prompts", json={
+        "prompt_id": "describe-1", "sample_answer": "A busy street.", "part_code": "SPEAKING_PART_2",
+    })
+    assert response.status_code == 503
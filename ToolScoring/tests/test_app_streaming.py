@@ -0,0 +1,43 @@
+PROMPT = {
+    "question": "Describe a place you like to visit in your city.",
+    "sample_answer": "I like to visit the park near my house because it is quiet and green.",
+    "part_code": "SPEAKING_PART_3",
+    "explain": True,
+}
+TRANSCRIPT = (
+    "I like the park near my house. Dr. Smith does not go there, but I go every weekend! "
+    "It is quiet and green. Nobody makes noise there because people read books"
+)
+
+
+def stream_result(client, segments, end=None):
+    with client.websocket_connect("/score_nlp/stream") as websocket:
+        websocket.send_json(PROMPT)
+        for segment in segments:
+            websocket.send_json({"type": "segment", "text": segment})
+        websocket.send_json({"type": "end", **(end or {})})
+        while True:
+            message = websocket.receive_json()
+            if message["type"] != "progress":
+                break
+    assert message.pop("type") == "result", message
+    return message
+
+
+def word_segments(text, size=3):
+    words = text.split()
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+def test_stream_result_equals_score_nlp(client):
+    streamed = stream_result(client, word_segments(TRANSCRIPT))
+    response = client.post("/score_nlp", json={**PROMPT, "transcript": TRANSCRIPT})
+    assert response.status_code == 200
+    assert streamed == response.json()
+
+
+def test_stream_with_corrected_final_transcript_equals_score_nlp(client):
+    corrected = TRANSCRIPT.replace("every weekend", "every Sunday")
+    streamed = stream_result(client, word_segments(TRANSCRIPT), end={"transcript": corrected})
+    response = client.post("/score_nlp", json={**PROMPT, "transcript": corrected})
+    assert streamed == response.json()
@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_concurrent_items_share_a_batch_and_keep_their_results():
+    batches = []
+
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(4)]
+    assert [f.result(timeout=2) for f in futures] == [0, 10, 20, 30]
+    assert batches == [[0, 1, 2, 3]]
+
+
+def test_batch_is_flushed_when_the_wait_window_expires():
+    batcher = MicroBatcher(lambda items: [len(items)] * len(items), max_batch_size=8, max_wait_ms=10)
+    started = time.monotonic()
+    assert batcher(1, timeout=2) == 1
+    assert time.monotonic() - started < 1
+
+
+def test_batch_size_is_capped():
+    sizes = []
+    release = threading.Event()
+
+    def batch_fn(items):
+        release.wait(2)
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=3, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=7) as pool:
+        futures = [pool.submit(batcher, i, 2) for i in range(7)]
+        time.sleep(0.1)
+        release.set()
+        assert sorted(f.result() for f in futures) == list(range(7))
+    assert max(sizes) <= 3
+    assert sum(sizes) == 7
+
+
+def test_batch_errors_reach_every_caller():
+    def batch_fn(items):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(batch_fn, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(ValueError, match="model failed"):
+            future.result(timeout=2)
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = MicroBatcher(lambda items: [], max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="returned 0 results"):
+        batcher(1, timeout=2)
+
+
+def test_cancelled_items_are_skipped():
+    seen = []
+    release = threading.Event()
+
+    def batch_fn(items):
+        release.wait(2)
+        seen.extend(items)
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=1, max_wait_ms=0)
+    first = batcher.submit("first")
+    second = batcher.submit("second")
+    assert second.cancel()
+    release.set()
+    assert first.result(timeout=2) == "first"
+    third = batcher.submit("third")
+    assert third.result(timeout=2) == "third"
+    assert seen == ["first", "third"]
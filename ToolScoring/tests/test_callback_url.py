@@ -0,0 +1,86 @@
+import asyncio
+import socket
+
+import pytest
+
+from callback_url import (
+    CallbackURLRejected, check_callback_url, host_allowed, is_internal_address, is_public_address,
+)
+
+
+def check(url, hosts=("hooks.example.com", "127.0.0.1", "10.1.2.3", "8.8.8.8"), schemes=("https",),
+          allow_private=False):
+    asyncio.run(check_callback_url(url, hosts, schemes, allow_private))
+
+
+def test_host_allowlist_matching():
+    assert host_allowed("api.example.com", [".example.com"])
+    assert host_allowed("API.example.com.", ["api.example.com"])
+    assert not host_allowed("example.com.evil.net", [".example.com"])
+    assert not host_allowed("evil.net", ["example.com"])
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "192.168.1.1", "169.254.169.254",
+                                     "100.64.0.1", "::1", "fe80::1", "::ffff:127.0.0.1", "0.0.0.0"])
+def test_non_public_addresses(address):
+    assert not is_public_address(address)
+
+
+def test_public_address():
+    assert is_public_address("8.8.8.8")
+
+
+@pytest.mark.parametrize("url", [
+    "https://127.0.0.1/hook",            # loopback dù có trong allowlist
+    "https://10.1.2.3/hook",             # private
+    "http://8.8.8.8/hook",               # scheme không cho phép
+    "https://other.example.org/hook",    # host ngoài allowlist
+    "https://user:pw@8.8.8.8/hook",      # có credentials
+    "/relative/hook",
+])
+def test_rejected_callback_urls(url):
+    with pytest.raises(CallbackURLRejected):
+        check(url)
+
+
+def test_callbacks_disabled_without_allowlist():
+    with pytest.raises(CallbackURLRejected):
+        check("https://8.8.8.8/hook", hosts=())
+
+
+def test_allowed_public_ip_callback():
+    check("https://8.8.8.8/hook")
+
+
+@pytest.mark.parametrize("url", [
+    "https://127.0.0.1/hook",
+    "https://localhost:7162/api/jobs/callback",
+    "https://10.1.2.3/hook",
+])
+def test_allow_private_accepts_exact_allowlisted_internal_hosts(url):
+    hosts = ("localhost", "127.0.0.1", "10.1.2.3")
+    with pytest.raises(CallbackURLRejected):
+        check(url, hosts=hosts)
+    check(url, hosts=hosts, allow_private=True)
+
+
+def test_allow_private_still_rejects_suffix_entries(monkeypatch):
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, port, *args, **kwargs: [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.7", port)),
+    ])
+    check("https://svc.corp.example/hook", hosts=("svc.corp.example",), allow_private=True)
+    with pytest.raises(CallbackURLRejected):
+        check("https://svc.corp.example/hook", hosts=(".corp.example",), allow_private=True)
+
+
+def test_allow_private_still_rejects_link_local_metadata_address():
+    with pytest.raises(CallbackURLRejected):
+        check("https://169.254.169.254/latest", hosts=("169.254.169.254",), allow_private=True)
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("10.0.0.5", True), ("192.168.1.1", True), ("127.0.0.1", True), ("::1", True),
+    ("169.254.169.254", False), ("fe80::1", False), ("0.0.0.0", False), ("8.8.8.8", False),
+])
+def test_internal_addresses(address, expected):
+    assert is_internal_address(address) is expected
@@ -0,0 +1,46 @@
+import time
+
+from caption_cache import CaptionCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return CaptionCache(str(tmp_path / "captions.sqlite3"), **kwargs)
+
+
+def test_put_get_roundtrip_and_hash_lookup(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("http://img/a.jpg", "a cat", "h1", etag='"e1"')
+    entry = cache.get("http://img/a.jpg")
+    assert entry.caption == "a cat"
+    assert entry.etag == '"e1"'
+    assert cache.get_by_hash("h1") == "a cat"
+    assert cache.get("http://img/missing.jpg") is None
+    cache.close()
+
+
+def test_eviction_runs_every_n_writes(tmp_path):
+    cache = make_cache(tmp_path, max_entries=3, evict_every=4)
+    for i in range(3):
+        cache.put(f"u{i}", "c")
+    cache.put("u3", "c")  # lần ghi thứ 4: dọn về max_entries
+    assert cache.stats()["size"] == 3
+    assert cache.get("u0") is None
+    for i in range(4, 7):
+        cache.put(f"u{i}", "c")
+    # chưa tới lần dọn tiếp theo: tạm thời vượt giới hạn
+    assert cache.stats()["size"] == 6
+    cache.put("u7", "c")
+    assert cache.stats()["size"] == 3
+    cache.close()
+
+
+def test_expired_entries_are_misses_and_get_evicted(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=0.05, evict_every=2)
+    cache.put("old", "c", "h")
+    time.sleep(0.1)
+    assert cache.get("old") is None
+    assert cache.get_by_hash("h") is None
+    cache.put("new", "c")
+    assert cache.stats()["size"] == 1
+    assert cache.get("new").caption == "c"
+    cache.close()
@@ -0,0 +1,42 @@
+import pytest
+
+from caption_decoding import DECODING_MODES, resolve_mode, variant_key
+
+
+def test_resolve_mode():
+    assert resolve_mode(None) == "beam4"
+    assert resolve_mode("GREEDY") == "greedy"
+    with pytest.raises(ValueError):
+        resolve_mode("beam8")
+
+
+def test_variant_key_separates_modes_and_quantization():
+    keys = {variant_key("http://img/a.jpg", mode, quantized) for mode in DECODING_MODES for quantized in (False, True)}
+    assert len(keys) == len(DECODING_MODES) * 2
+
+
+def test_gpt2_conv1d_layers_are_converted_and_quantized():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    from caption_decoding import conv1d_to_linear, quantize_for_cpu
+
+    torch.manual_seed(0)
+    config = GPT2Config(n_layer=2, n_head=2, n_embd=32, vocab_size=50, n_positions=16)
+    model = GPT2LMHeadModel(config).eval()
+    ids = torch.tensor([[1, 2, 3, 4]])
+    with torch.no_grad():
+        expected = model(ids).logits
+
+    converted = conv1d_to_linear(model)
+    with torch.no_grad():
+        assert torch.allclose(converted(ids).logits, expected, atol=1e-5)
+    assert isinstance(converted.transformer.h[0].attn.c_attn, torch.nn.Linear)
+
+    quantized = quantize_for_cpu(converted)
+    block = quantized.transformer.h[0]
+    assert "Conv1D" not in {type(m).__name__ for m in block.modules()}
+    # dynamic int8 Linear (torch.ao.nn.quantized.dynamic / torch.nn.quantized.dynamic)
+    assert "quantized" in type(block.mlp.c_fc).__module__
+    assert "quantized" in type(block.attn.c_attn).__module__
@@ -0,0 +1,57 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from embedding_cache import EmbeddingCache, normalize_text  # noqa: E402
+
+
+class FakeModel:
+    """Embedding = [độ dài text, số lần gọi encode]; ghi lại từng batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, convert_to_tensor=True):
+        self.batches.append(list(texts))
+        return torch.tensor([[float(len(t)), float(len(self.batches))] for t in texts])
+
+
+def test_normalize_text_ignores_case_and_whitespace():
+    assert normalize_text("  Describe   THE picture ") == "describe the picture"
+
+
+def test_encode_many_batches_misses_and_dedupes():
+    model = FakeModel()
+    cache = EmbeddingCache(model)
+    out = cache.encode_many(["question", "answer", "question"])
+    assert model.batches == [["question", "answer"]]
+    assert out.shape == (3, 2)
+    assert torch.equal(out[0], out[2])
+
+
+def test_cached_texts_are_not_encoded_again():
+    model = FakeModel()
+    cache = EmbeddingCache(model)
+    cache.encode("Question one")
+    cache.encode_many(["question  ONE", "transcript"], cache=[True, False])
+    assert model.batches == [["Question one"], ["transcript"]]
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["size"] == 1  # transcript (cache=False) không được ghi vào cache
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(FakeModel(), max_entries=2)
+    for text in ["a", "b"]:
+        cache.encode(text)
+    cache.get("a")
+    cache.encode("c")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_flags_must_match_texts():
+    cache = EmbeddingCache(FakeModel())
+    with pytest.raises(ValueError):
+        cache.encode_many(["a", "b"], cache=[True])
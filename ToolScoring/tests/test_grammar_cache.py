@@ -0,0 +1,81 @@
+import sqlite3
+import time
+
+from grammar_cache import GrammarCache, GrammarMatch
+
+MATCH = GrammarMatch("RULE", "GRAMMAR", 0, 3)
+
+
+def disk_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM grammar_matches").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "grammar.sqlite3")
+    first = GrammarCache("sig", path=path)
+    first.put("He go home.", [MATCH])
+    first.close()
+
+    second = GrammarCache("sig", path=path)
+    assert second.get("He go home.") == [MATCH]
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+
+def test_disk_eviction_runs_every_n_writes(tmp_path):
+    path = str(tmp_path / "grammar.sqlite3")
+    cache = GrammarCache("sig", path=path, disk_max_entries=2, evict_every=3)
+    cache.put("one", [])
+    cache.put("two", [])
+    assert disk_rows(path) == 2
+    cache.put("three", [])
+    assert disk_rows(path) == 2
+    cache.put("four", [])
+    cache.put("five", [])
+    assert disk_rows(path) == 4
+    cache.put("six", [])
+    assert disk_rows(path) == 2
+    cache.close()
+
+
+def test_expired_disk_entries_are_misses(tmp_path):
+    path = str(tmp_path / "grammar.sqlite3")
+    cache = GrammarCache("sig", path=path, ttl_seconds=0.05)
+    cache.put("old text", [MATCH])
+    cache.close()
+    time.sleep(0.1)
+
+    fresh = GrammarCache("sig", path=path, ttl_seconds=0.05)
+    assert fresh.get("old text") is None
+    fresh.close()
+
+
+def test_legacy_table_without_timestamps_is_migrated(tmp_path):
+    path = str(tmp_path / "grammar.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE grammar_matches (key TEXT PRIMARY KEY, matches TEXT NOT NULL)")
+    conn.execute("INSERT INTO grammar_matches VALUES ('k', '[]')")
+    conn.commit()
+    conn.close()
+
+    cache = GrammarCache("sig", path=path, evict_every=1)
+    cache.put("new text", [MATCH])
+    assert cache.get("new text") == [MATCH]
+    assert disk_rows(path) == 1  # dòng cũ không có thời gian bị coi là hết hạn
+    cache.close()
+
+
+def test_texts_differing_only_in_spacing_do_not_share_offsets(tmp_path):
+    cache = GrammarCache("sig", path=str(tmp_path / "grammar.sqlite3"))
+    cache.put("He go home.", [GrammarMatch("AGREEMENT", "GRAMMAR", 3, 2)])
+    # "go" nằm ở offset 5 trong text này: không được dùng lại match của text kia
+    assert cache.get("He   go home.") is None
+    assert cache.get(" He go home.") is None
+    cache.put("He   go home.", [GrammarMatch("AGREEMENT", "GRAMMAR", 5, 2)])
+    assert cache.get("He go home.")[0].offset == 3
+    assert cache.get("He   go home.")[0].offset == 5
+    cache.close()
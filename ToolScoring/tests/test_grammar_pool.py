@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from grammar_pool import GrammarPoolBusy, GrammarToolPool
+
+
+class FakeTool:
+    """Backend giả: mỗi check mất `delay` giây; `hang` = treo cho đến khi close()."""
+
+    created = 0
+
+    def __init__(self, delay=0.0, hang=False):
+        FakeTool.created += 1
+        self.delay = delay
+        self.hang = hang
+        self.closed = threading.Event()
+
+    def check(self, text):
+        if self.hang:
+            self.closed.wait()
+            raise RuntimeError("backend closed")
+        time.sleep(self.delay)
+        return [text]
+
+    def close(self):
+        self.closed.set()
+
+
+def make_pool(factory, **kwargs):
+    kwargs.setdefault("health_check_interval", 0)
+    return GrammarToolPool(factory, **kwargs)
+
+
+def run_concurrently(pool, count):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(pool.check, f"text {i}") for i in range(count)]
+    results, errors = [], []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    return results, errors
+
+
+def test_queue_wait_does_not_count_towards_timeout():
+    # 12 request đồng thời x 0.3s trên một backend khỏe, timeout 1s: không lỗi, không restart
+    pool = make_pool(lambda: FakeTool(delay=0.3), size=1, check_timeout=1.0, max_queue=16)
+    results, errors = run_concurrently(pool, 12)
+    assert errors == []
+    assert len(results) == 12
+    assert pool.workers[0].restarts == 0
+
+
+def test_queue_overflow_is_rejected_without_restart():
+    pool = make_pool(lambda: FakeTool(delay=0.3), size=1, check_timeout=5.0, max_queue=2)
+    results, errors = run_concurrently(pool, 8)
+    assert len(results) == 3  # 1 đang chạy + 2 chờ
+    assert len(errors) == 5 and all(isinstance(e, GrammarPoolBusy) for e in errors)
+    assert pool.workers[0].restarts == 0
+    assert pool.workers[0].healthy
+
+
+def test_hung_backend_is_restarted_once():
+    tools = []
+
+    def factory():
+        # Backend đầu tiên treo, backend sau khi restart chạy bình thường
+        tool = FakeTool(delay=0.01, hang=not tools)
+        tools.append(tool)
+        return tool
+
+    pool = make_pool(factory, size=1, check_timeout=0.3, max_queue=16)
+    results, errors = run_concurrently(pool, 6)
+    worker = pool.workers[0]
+    deadline = time.time() + 2
+    while not worker.healthy and time.time() < deadline:
+        time.sleep(0.01)
+    # Request treo bị timeout; các request đang chờ trên thế hệ cũ không gây restart lần hai
+    assert errors
+    assert worker.restarts == 1
+    assert worker.generation == 1
+    assert pool.check("after restart") == ["after restart"]
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from image_fetch import ImageDownloadError, create_http_client, download_image  # noqa: E402
+
+
+def redirecting_client(max_redirects):
+    def handler(request):
+        hop = int(request.url.params.get("hop", "0"))
+        if hop < 10:
+            return httpx.Response(302, headers={"location": f"http://img.example/a.jpg?hop={hop + 1}"})
+        return httpx.Response(200, headers={"content-type": "image/jpeg"}, content=b"jpeg")
+
+    client = create_http_client(max_redirects=max_redirects)
+    # Giữ cấu hình redirect của client, chỉ thay transport mạng
+    client._transport = httpx.MockTransport(handler)
+    return client
+
+
+def fetch(client, url):
+    async def run():
+        async with client:
+            return await download_image(client, url, max_bytes=1024)
+    return asyncio.run(run())
+
+
+def test_redirect_chain_is_capped():
+    with pytest.raises(ImageDownloadError) as excinfo:
+        fetch(redirecting_client(max_redirects=5), "http://img.example/a.jpg")
+    assert excinfo.value.status_code == 500
+
+
+def test_short_redirect_chain_is_followed():
+    fetched = fetch(redirecting_client(max_redirects=5), "http://img.example/a.jpg?hop=7")
+    assert fetched.content == b"jpeg"
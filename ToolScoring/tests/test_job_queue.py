@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from job_queue import FAILED, SUCCEEDED, JobError, JobQueue, JobQueueFull, JobStore, PriorityClass
+
+
+async def wait_done(queue, job, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        current = await queue.get(job.id)
+        if current is not None and current.done:
+            return current
+        assert asyncio.get_running_loop().time() < deadline, "job did not finish"
+        await asyncio.sleep(0.01)
+
+
+def make_queue(handler, concurrency=2, live_running=None, rescore_running=1, **kwargs):
+    return JobQueue(
+        {"echo": handler},
+        [
+            PriorityClass("live", 10, live_running or concurrency),
+            PriorityClass("rescore", 2, rescore_running),
+        ],
+        concurrency=concurrency,
+        **kwargs,
+    )
+
+
+def test_job_runs_and_reports_result():
+    async def handler(payload):
+        return {"value": payload}
+
+    async def scenario():
+        queue = make_queue(handler)
+        job = await queue.submit("echo", 42, "live")
+        done = await wait_done(queue, job)
+        assert done.status == SUCCEEDED
+        assert done.result == {"value": 42}
+
+    asyncio.run(scenario())
+
+
+def test_handler_error_is_recorded():
+    async def handler(payload):
+        raise JobError(404, "missing")
+
+    async def scenario():
+        queue = make_queue(handler)
+        done = await wait_done(queue, await queue.submit("echo", None, "live"))
+        assert done.status == FAILED
+        assert done.error == {"status_code": 404, "detail": "missing"}
+
+    asyncio.run(scenario())
+
+
+def test_full_class_raises_queue_full():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def handler(payload):
+            await gate.wait()
+            return {}
+
+        queue = make_queue(handler, concurrency=1)
+        with pytest.raises(ValueError):
+            # concurrency 1: không còn slot cho rescore ngoài slot dành cho live
+            await queue.submit("echo", None, "rescore")
+        for _ in range(10):
+            await queue.submit("echo", None, "live")
+        with pytest.raises(JobQueueFull) as info:
+            await queue.submit("echo", None, "live")
+        assert info.value.retry_after >= 1
+        gate.set()
+
+    asyncio.run(scenario())
+
+
+def test_lower_class_never_takes_the_last_slot():
+    async def scenario():
+        gate = asyncio.Event()
+        started = []
+
+        async def handler(payload):
+            started.append(payload)
+            await gate.wait()
+            return {}
+
+        # rescore được cấu hình chạy 2 job, nhưng bị giới hạn ở concurrency - 1 = 1
+        queue = make_queue(handler, concurrency=2, rescore_running=2)
+        await queue.submit("echo", "r1", "rescore")
+        await queue.submit("echo", "r2", "rescore")
+        await asyncio.sleep(0.05)
+        assert started == ["r1"]
+        await queue.submit("echo", "live", "live")
+        await asyncio.sleep(0.05)
+        assert started == ["r1", "live"]
+        gate.set()
+
+    asyncio.run(scenario())
+
+
+def test_job_state_is_shared_through_store(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def handler(payload):
+        return {"value": payload}
+
+    async def scenario():
+        accepting = make_queue(handler, store=JobStore(path))
+        polling = make_queue(handler, store=JobStore(path))  # worker khác
+        job = await accepting.submit("echo", 7, "live")
+        await wait_done(accepting, job)
+        seen = await polling.get(job.id)
+        assert seen is not None
+        assert seen.status == SUCCEEDED
+        assert seen.result == {"value": 7}
+        assert polling.position(seen) is None
+        assert await polling.get("unknown") is None
+
+    asyncio.run(scenario())
+
+
+def test_store_prune_keeps_newest_finished(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    for i in range(5):
+        store.save({
+            "job_id": f"j{i}", "kind": "echo", "priority": "live", "status": SUCCEEDED,
+            "result": {}, "error": None, "created_at": i, "started_at": i, "finished_at": 100 + i,
+        })
+    store.prune(finished_before=101, max_finished=2)
+    assert [store.load(f"j{i}") is not None for i in range(5)] == [False, False, False, True, True]
@@ -0,0 +1,46 @@
+from lexicon import Lexicon
+
+LEXICON = Lexicon({
+    "filler": ["um", "uh", "you know"],
+    "linker": ["so", "also", "next to", "next"],
+    "empty": [""],
+})
+
+
+def test_matches_on_word_boundaries_only():
+    scan = LEXICON.scan("I also like soup.")
+    assert scan.count("linker") == 1
+    assert scan.phrases["linker"] == {"also"}
+    assert not scan.has("filler")
+
+
+def test_counts_occurrences_distinct_phrases_and_sentences():
+    scan = LEXICON.scan("Um, you know, um. The shop is next to the bank. Uh!")
+    assert scan.count("filler") == 4
+    assert scan.distinct("filler") == 3
+    assert scan.sentences("filler") == 2
+    # cụm chồng nhau: "next to" và "next" đều được đếm
+    assert scan.count("linker") == 2
+    assert scan.phrases["linker"] == {"next to", "next"}
+
+
+def test_phrases_do_not_span_sentences():
+    scan = LEXICON.scan("I asked you. Know what?")
+    assert scan.count("filler") == 0
+
+
+def test_empty_input_and_unknown_category():
+    scan = LEXICON.scan(None)
+    assert scan.count("filler") == 0
+    assert scan.distinct("missing") == 0
+    assert scan.sentences("missing") == 0
+    assert LEXICON.max_phrase_tokens == 2
+
+
+def test_fixes_baseline_substring_counting():
+    # Cách đếm cũ (chuỗi con) tìm thấy "so" trong "also" và "um" trong "umbrella"
+    text = "I also took my umbrella"
+    assert "so" in text and "um" in text
+    scan = LEXICON.scan(text)
+    assert scan.phrases["linker"] == {"also"}
+    assert scan.count("filler") == 0
@@ -0,0 +1,37 @@
+import threading
+
+from metrics import MetricsRegistry, TrackedThreadPoolExecutor
+
+
+def test_tracked_executor_counts_unfinished_tasks():
+    release = threading.Event()
+    executor = TrackedThreadPoolExecutor(max_workers=1)
+    futures = [executor.submit(release.wait) for _ in range(3)]
+    assert executor.pending == 3  # 1 đang chạy + 2 đang chờ
+    release.set()
+    for future in futures:
+        future.result()
+    executor.shutdown(wait=True)
+    assert executor.pending == 0
+
+
+def test_tracked_executor_counts_cancelled_tasks_as_done():
+    release = threading.Event()
+    executor = TrackedThreadPoolExecutor(max_workers=1)
+    running = executor.submit(release.wait)
+    queued = executor.submit(release.wait)
+    assert queued.cancel()
+    assert executor.pending == 1
+    release.set()
+    running.result()
+    executor.shutdown(wait=True)
+    assert executor.pending == 0
+
+
+def test_gauge_callback_renders_executor_depth():
+    executor = TrackedThreadPoolExecutor(max_workers=1)
+    registry = MetricsRegistry()
+    registry.gauge("queue_depth", "Pending work items", ("queue",),
+                   callback=lambda: {("decode",): executor.pending})
+    assert 'queue_depth{queue="decode"} 0' in registry.render()
+    executor.shutdown()
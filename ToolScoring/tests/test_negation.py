@@ -0,0 +1,83 @@
+import re
+
+import pytest
+
+from negation import find_negated_clauses, negation_replacement
+
+
+@pytest.mark.parametrize("apostrophe", ["'", "’", "‘"])
+def test_contractions_with_straight_and_curly_apostrophes(apostrophe):
+    text = f"I can{apostrophe}t swim and I don{apostrophe}t like water."
+    assert find_negated_clauses(text) == [
+        ("i can't swim", "i can swim"),
+        ("and i don't like water", "and i do like water"),
+    ]
+
+
+def test_negation_words_matched_as_whole_tokens():
+    # "know" không chứa "no", "nothing" không phải "not" + "hing"
+    assert find_negated_clauses("I know the answer well.") == []
+    assert find_negated_clauses("Nothing happened there.") == [("nothing happened there", "something happened there")]
+    assert find_negated_clauses("She cannot come today.") == [("she cannot come today", "she can come today")]
+
+
+def test_scope_ends_at_punctuation_and_clause_breakers():
+    text = "I did not go, I stayed home. He went out but nobody came."
+    assert find_negated_clauses(text) == [
+        ("i did not go", "i did go"),
+        ("but nobody came", "but somebody came"),
+    ]
+
+
+def test_no_one_becomes_someone_and_short_clauses_are_skipped():
+    assert find_negated_clauses("No one called me.") == [("no one called me", "someone called me")]
+    assert find_negated_clauses("Not. No.") == []
+
+
+def test_max_clauses_limits_results_in_order():
+    text = "I never run. I won't swim. I can't fly."
+    assert find_negated_clauses(text, max_clauses=2) == [
+        ("i never run", "i run"),
+        ("i won't swim", "i will swim"),
+    ]
+
+
+def test_negation_replacement():
+    assert negation_replacement("won't") == "will"
+    assert negation_replacement("isn't") == "is"
+    assert negation_replacement("without") == "with"
+    assert negation_replacement("now") is None
+
+
+def baseline_negated_sentences(text):
+    """Bộ phát hiện cũ (so khớp chuỗi con theo câu) trong app.py, để so sánh hành vi."""
+    negation_words = [
+        'not', 'no', 'cannot', "can't", 'cant',
+        'nobody', 'no one', 'noone', 'nothing', 'nowhere',
+        'neither', 'never', 'none', 'without'
+    ]
+    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+    return [s.lower() for s in sentences if any(neg in s.lower() for neg in negation_words)]
+
+
+@pytest.mark.parametrize("text", [
+    "I do not like the city center.",
+    "There is nothing to do at night.",
+    "We never travel in winter.",
+    "Nobody visits the old museum.",
+    "She went without her friends.",
+])
+def test_agrees_with_baseline_on_plain_negations(text):
+    assert [clause for clause, _ in find_negated_clauses(text)] == [
+        sentence.rstrip(".") for sentence in baseline_negated_sentences(text)
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "I know another good place.",
+    "The notes are on the table.",
+    "We ate some noodles at noon.",
+])
+def test_fixes_baseline_substring_false_positives(text):
+    assert baseline_negated_sentences(text)
+    assert find_negated_clauses(text) == []
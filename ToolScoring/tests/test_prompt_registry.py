@@ -0,0 +1,48 @@
+from prompt_registry import PromptRegistry, build_prompt_artifacts
+
+
+def make_prompt(prompt_id, question="Describe the picture", sample="People are walking in the market"):
+    return build_prompt_artifacts(question, sample, "speaking_part_2", prompt_id=prompt_id)
+
+
+def test_in_memory_registry():
+    registry = PromptRegistry()
+    registry.register(make_prompt("p1"))
+    assert registry.get("p1").part_code == "SPEAKING_PART_2"
+    assert len(registry) == 1
+    assert registry.remove("p1")
+    assert registry.get("p1") is None
+    assert not registry.remove("p1")
+
+
+def test_shared_registry_is_visible_across_instances(tmp_path):
+    # Hai instance trên cùng file = hai worker gunicorn
+    path = str(tmp_path / "prompts.sqlite3")
+    first, second = PromptRegistry(path), PromptRegistry(path)
+
+    first.register(make_prompt("p1"))
+    prompt = second.get("p1")
+    assert prompt is not None
+    assert prompt.sample_answer_text == "People are walking in the market"
+    assert prompt.question_keywords == make_prompt("p1").question_keywords
+
+    first.register(make_prompt("p1", sample="A man is selling fruit"))
+    assert second.get("p1").sample_answer_text == "A man is selling fruit"
+
+    assert second.remove("p1")
+    assert first.get("p1") is None
+    assert len(first) == 0
+
+
+def test_shared_registry_rebuilds_once_per_version(tmp_path):
+    path = str(tmp_path / "prompts.sqlite3")
+    builds = []
+
+    def builder(question, sample_answer, part_code, prompt_id):
+        builds.append(prompt_id)
+        return build_prompt_artifacts(question, sample_answer, part_code, prompt_id=prompt_id)
+
+    PromptRegistry(path).register(make_prompt("p1"))
+    reader = PromptRegistry(path, builder=builder)
+    assert reader.get("p1") is reader.get("p1")
+    assert builds == ["p1"]
@@ -0,0 +1,79 @@
+import asyncio
+
+from grammar_cache import GrammarMatch
+from streaming import SentenceChecker, TranscriptAccumulator, split_sentences
+
+
+def test_accumulator_emits_complete_sentences_across_segments():
+    acc = TranscriptAccumulator()
+    assert acc.append("I like") == []
+    assert acc.append("tea. And coffee!  Maybe") == ["I like tea.", "And coffee!"]
+    assert acc.append("") == []
+    assert acc.flush() == ["Maybe"]
+    assert acc.sentence_count == 3
+    assert acc.text == "I like tea. And coffee!  Maybe"
+
+
+def test_sentence_offsets_point_into_text():
+    acc = TranscriptAccumulator()
+    for segment in ["Hello there.", "How are", "you?  Fine", "thanks."]:
+        acc.append(segment)
+    assert [s for _, s in acc.sentences] == ["Hello there.", "How are you?", "Fine thanks."]
+    for offset, sentence in acc.sentences:
+        assert acc.text[offset:offset + len(sentence)] == sentence
+
+
+def test_abbreviations_do_not_end_sentences():
+    acc = TranscriptAccumulator()
+    assert acc.append("I met Dr.") == []
+    assert acc.append("Smith and Mrs. Jones, e.g. at 3.5 St. Mary street.") == [
+        "I met Dr. Smith and Mrs. Jones, e.g. at 3.5 St. Mary street."
+    ]
+
+
+def test_split_sentences_skips_bare_punctuation():
+    sentences, consumed = split_sentences("... Right. So")
+    assert sentences == [(4, "Right.")]
+    assert consumed == len("... Right.")
+
+
+def test_sentence_checker_checks_each_sentence_once_with_shifted_offsets():
+    seen = []
+
+    def check(text):
+        seen.append(text)
+        return [GrammarMatch("R", "C", i, 1) for i, ch in enumerate(text) if ch == "x"]
+
+    async def scenario():
+        acc = TranscriptAccumulator()
+        checker = SentenceChecker(check)
+        for segment in ["A x.", "B b x.", "C x x."]:
+            new = acc.append(segment)
+            for offset, sentence in acc.sentences[len(acc.sentences) - len(new):]:
+                checker.submit(offset, sentence)
+        await asyncio.sleep(0.05)
+        return acc.text, checker.completed()
+
+    text, matches = asyncio.run(scenario())
+    # câu trước được ghép làm ngữ cảnh, nhưng mỗi câu mới chỉ được check một lần
+    assert seen == ["A x.", "A x. B b x.", "B b x. C x x."]
+    assert [m.offset for m in matches] == [i for i, ch in enumerate(text) if ch == "x"]
+
+
+def test_sentence_checker_completed_skips_failed_sentences():
+    def check(text):
+        if text == "bad.":
+            raise RuntimeError("backend restarting")
+        return [GrammarMatch("R", "C", text.index("x"), 1)]
+
+    async def scenario():
+        checker = SentenceChecker(check)
+        assert checker.completed() is None
+        checker.submit(0, "bad.")
+        await asyncio.sleep(0.05)
+        assert checker.completed() is None  # lỗi của lần chạy nền không lộ ra progress
+        checker.submit(5, "One x.")
+        await asyncio.sleep(0.05)
+        return checker.completed()
+
+    assert [m.offset for m in asyncio.run(scenario())] == [9]
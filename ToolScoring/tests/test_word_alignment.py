@@ -0,0 +1,135 @@
+import random
+
+import pytest
+
+from word_alignment import DELETE, INSERT, MATCH, SUBSTITUTE, align_words
+
+
+def full_matrix_matches(reference, hypothesis):
+    """Số từ khớp tối đa theo DP đầy đủ (n x m, không band) - chuẩn để so sánh."""
+    n, m = len(reference), len(hypothesis)
+    table = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            if reference[i - 1] == hypothesis[j - 1]:
+                table[i][j] = table[i - 1][j - 1] + 1
+            else:
+                table[i][j] = max(table[i - 1][j], table[i][j - 1])
+    return table[n][m]
+
+
+def check_operations(alignment, reference, hypothesis):
+    """Các phép căn chỉnh phủ đúng mọi từ của hai dãy, theo thứ tự."""
+    assert [op.ref_index for op in alignment.operations if op.ref_index is not None] == list(range(len(reference)))
+    assert [op.hyp_index for op in alignment.operations if op.hyp_index is not None] == list(range(len(hypothesis)))
+    for op in alignment.operations:
+        if op.op == MATCH:
+            assert op.ref_word == op.hyp_word
+        elif op.op == SUBSTITUTE:
+            assert op.ref_word != op.hyp_word
+
+
+def test_prefers_real_match_over_substitutions():
+    alignment = align_words(["a", "b"], ["b", "x"])
+    assert alignment.matches == 1
+    assert [op.op for op in alignment.operations] == [DELETE, MATCH, INSERT]
+
+
+def test_perfect_read():
+    words = "the market is busy in the morning".split()
+    alignment = align_words(words, words)
+    assert alignment.matches == len(words)
+    assert alignment.coverage == 1.0
+    assert alignment.order_accuracy == 1.0
+    assert alignment.substitutions == alignment.deletions == alignment.insertions == 0
+
+
+def test_insertions_at_start_of_transcript():
+    reference = "the market is busy in the morning".split()
+    hypothesis = "um so uh the market is busy in the morning".split()
+    alignment = align_words(reference, hypothesis)
+    assert alignment.matches == len(reference)
+    assert alignment.insertions == 3
+    assert alignment.coverage == 1.0
+
+
+def test_deletions_at_start_of_transcript():
+    reference = "today the market is busy in the morning".split()
+    hypothesis = "market is busy in the morning".split()
+    alignment = align_words(reference, hypothesis)
+    assert alignment.matches == len(hypothesis)
+    assert alignment.deletions == 2
+    assert alignment.coverage == pytest.approx(len(hypothesis) / len(reference))
+
+
+def test_repeated_words_are_not_counted_twice():
+    reference = "people are walking".split()
+    hypothesis = "people people people are walking".split()
+    alignment = align_words(reference, hypothesis)
+    assert alignment.matches == 3
+    assert alignment.insertions == 2
+    assert alignment.coverage == 1.0
+
+
+def test_out_of_order_read_lowers_order_accuracy():
+    alignment = align_words("a b c d".split(), "d c b a".split())
+    assert alignment.matches == 1
+    assert alignment.order_accuracy == 0.25
+
+
+def test_empty_inputs():
+    assert align_words([], []).matches == 0
+    alignment = align_words(["a", "b"], [])
+    assert alignment.deletions == 2 and alignment.coverage == 0.0
+    alignment = align_words([], ["a"])
+    assert alignment.insertions == 1 and alignment.order_accuracy == 0.0
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_equal_full_matrix_scorer(seed):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(rng.randint(2, 12))]
+    reference = [rng.choice(vocab) for _ in range(rng.randint(0, 60))]
+    hypothesis = list(reference)
+    for _ in range(rng.randint(0, 25)):
+        action = rng.random()
+        position = rng.randint(0, len(hypothesis))
+        if action < 0.4:
+            hypothesis.insert(position, rng.choice(vocab))
+        elif hypothesis and action < 0.8:
+            del hypothesis[min(position, len(hypothesis) - 1)]
+        elif hypothesis:
+            hypothesis[min(position, len(hypothesis) - 1)] = rng.choice(vocab)
+    # Band nhỏ để buộc nhánh mở rộng band được chạy
+    alignment = align_words(reference, hypothesis, band=rng.choice([1, 2, 4, 16]))
+    assert alignment.matches == full_matrix_matches(reference, hypothesis)
+    check_operations(alignment, reference, hypothesis)
+
+
+def baseline_matched_words(sample_words, transcript_words):
+    """Cách đếm cũ của Read Aloud trong app.py: mọi từ của transcript có trong tập từ của bài đọc."""
+    sample_word_set = set(sample_words)
+    return sum(1 for word in transcript_words if word in sample_word_set)
+
+
+@pytest.mark.parametrize("transcript", [
+    "the cat sat on the mat",
+    "cat sat on the mat",
+    "the cat on the mat",
+    "um the cat sat on uh the mat",
+])
+def test_agrees_with_baseline_when_read_in_order(transcript):
+    sample = "the cat sat on the mat".split()
+    words = transcript.split()
+    assert align_words(sample, words).matches == baseline_matched_words(sample, words)
+
+
+@pytest.mark.parametrize("transcript, expected", [
+    ("the the the the the the", 2),        # lặp một từ: cách cũ tính 6/6
+    ("mat the on sat cat the", 3),          # đảo thứ tự: cách cũ tính 6/6
+])
+def test_fixes_baseline_over_crediting(transcript, expected):
+    sample = "the cat sat on the mat".split()
+    words = transcript.split()
+    assert baseline_matched_words(sample, words) == len(sample)
+    assert align_words(sample, words).matches == expected
@@ -0,0 +1,152 @@
+# word_alignment.py
+from collections import Counter
+from typing import List, NamedTuple, Optional, Sequence
+
+MATCH = "match"
+SUBSTITUTE = "substitute"
+DELETE = "delete"   # từ trong bài đọc bị bỏ qua
+INSERT = "insert"   # từ thừa trong transcript (lặp lại, từ đệm, đọc sai chỗ)
+
+# Độ rộng band ban đầu (số từ lệch khỏi đường chéo); tự nhân đôi khi không đủ
+DEFAULT_BAND = 16
+# Thay thế = xóa + chèn (kiểu LCS): đường căn chỉnh tối ưu luôn có số từ khớp lớn nhất,
+# không đánh đổi một từ khớp thật lấy hai phép thay thế
+SUBSTITUTE_COST = 2
+
+
+class AlignmentOp(NamedTuple):
+    op: str
+    ref_index: Optional[int]
+    hyp_index: Optional[int]
+    ref_word: Optional[str]
+    hyp_word: Optional[str]
+
+
+class Alignment(NamedTuple):
+    operations: List[AlignmentOp]
+    matches: int
+    substitutions: int
+    deletions: int
+    insertions: int
+    coverage: float        # tỉ lệ từ của bài đọc được đọc đúng vị trí
+    order_accuracy: float  # trong các từ của bài đọc có mặt trong transcript, tỉ lệ được đọc đúng thứ tự
+    band: int
+
+    def to_dict(self) -> dict:
+        return {
+            "coverage": round(self.coverage, 4),
+            "order_accuracy": round(self.order_accuracy, 4),
+            "matches": self.matches,
+            "substitutions": self.substitutions,
+            "deletions": self.deletions,
+            "insertions": self.insertions,
+            "operations": [op._asdict() for op in self.operations],
+        }
+
+
+def encode_tokens(reference: Sequence[str], hypothesis: Sequence[str]):
+    """Mã hóa hai dãy từ thành dãy số nguyên dùng chung một từ điển (so sánh int thay vì str)."""
+    vocab = {}
+    ref_ids = [vocab.setdefault(word, len(vocab)) for word in reference]
+    hyp_ids = [vocab.setdefault(word, len(vocab)) for word in hypothesis]
+    return ref_ids, hyp_ids
+
+
+def _banded_distance(ref: List[int], hyp: List[int], band: int):
+    """
+    Edit distance trên token (xóa / chèn = 1, thay thế = SUBSTITUTE_COST) chỉ tính
+    các ô |i - j| <= band. Trả về (distance, rows) với rows[i][k] = D[i][i - band + k];
+    ô ngoài band = INF. Đường đi ra ngoài band cần ít nhất band + 1 phép xóa / chèn,
+    nên nếu distance <= band thì kết quả bằng đúng DP đầy đủ.
+    """
+    n, m = len(ref), len(hyp)
+    inf = 2 * (n + m) + 1
+    width = 2 * band + 1
+    rows = []
+    prev = [inf] * width
+    for k in range(width):
+        j = k - band
+        if 0 <= j <= m:
+            prev[k] = j
+    rows.append(prev)
+    for i in range(1, n + 1):
+        cur = [inf] * width
+        token = ref[i - 1]
+        for k in range(width):
+            j = i - band + k
+            if j < 0 or j > m:
+                continue
+            if j == 0:
+                cur[k] = i
+                continue
+            # D[i-1][j-1] nằm ở cùng cột k của hàng trước; D[i-1][j] ở k+1; D[i][j-1] ở k-1
+            best = prev[k] + (0 if hyp[j - 1] == token else SUBSTITUTE_COST)
+            if k + 1 < width and prev[k + 1] + 1 < best:
+                best = prev[k + 1] + 1
+            if k > 0 and cur[k - 1] + 1 < best:
+                best = cur[k - 1] + 1
+            cur[k] = best
+        rows.append(cur)
+        prev = cur
+    k_end = m - n + band
+    distance = rows[n][k_end] if 0 <= k_end < width else inf
+    return distance, rows
+
+
+def align_words(reference: Sequence[str], hypothesis: Sequence[str], band: int = DEFAULT_BAND) -> Alignment:
+    """
+    Căn chỉnh từ của transcript (hypothesis) với bài đọc (reference).
+
+    DP có band quanh đường chéo: O((n + m) x band). Band bắt đầu bằng
+    max(band, |n - m|) và được nhân đôi cho đến khi edit distance <= band,
+    khi đó kết quả là tối ưu (giống DP đầy đủ). Vì thay thế tốn bằng xóa + chèn,
+    số từ khớp (`matches`) luôn bằng độ dài dãy con chung dài nhất (LCS).
+    """
+    reference, hypothesis = list(reference), list(hypothesis)
+    ref, hyp = encode_tokens(reference, hypothesis)
+    n, m = len(ref), len(hyp)
+
+    band = max(1, band, abs(n - m))
+    while True:
+        distance, rows = _banded_distance(ref, hyp, band)
+        if distance <= band or band >= max(n, m):
+            break
+        band *= 2
+
+    # Truy vết từ (n, m) về (0, 0); ưu tiên match/substitute, rồi delete, rồi insert
+    operations = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        k = j - i + band
+        value = rows[i][k]
+        if i > 0 and j > 0:
+            diagonal = rows[i - 1][k]
+            cost = 0 if ref[i - 1] == hyp[j - 1] else SUBSTITUTE_COST
+            if diagonal + cost == value:
+                operations.append(AlignmentOp(
+                    MATCH if cost == 0 else SUBSTITUTE, i - 1, j - 1, reference[i - 1], hypothesis[j - 1]
+                ))
+                i, j = i - 1, j - 1
+                continue
+        if i > 0 and k + 1 < len(rows[i - 1]) and rows[i - 1][k + 1] + 1 == value:
+            operations.append(AlignmentOp(DELETE, i - 1, None, reference[i - 1], None))
+            i -= 1
+            continue
+        operations.append(AlignmentOp(INSERT, None, j - 1, None, hypothesis[j - 1]))
+        j -= 1
+    operations.reverse()
+
+    counts = Counter(op.op for op in operations)
+    matches = counts[MATCH]
+    # Số từ của bài đọc xuất hiện trong transcript (tính theo multiset: lặp lại không được tính hai lần)
+    present = sum((Counter(ref) & Counter(hyp)).values())
+    return Alignment(
+        operations=operations,
+        matches=matches,
+        substitutions=counts[SUBSTITUTE],
+        deletions=counts[DELETE],
+        insertions=counts[INSERT],
+        coverage=matches / n if n else 0.0,
+        order_accuracy=matches / present if present else 0.0,
+        band=band,
+    )
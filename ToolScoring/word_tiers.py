@@ -0,0 +1,107 @@
+# word_tiers.py
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+
+from wordfreq import top_n_list, zipf_frequency
+
+# Tier theo thang Zipf (giữ nguyên ngưỡng của bước chấm vocabulary)
+ADVANCED = 0       # zipf < 3.5: very rare (academic/technical)
+BUSINESS = 1       # zipf < 4.5: uncommon (business/advanced)
+INTERMEDIATE = 2   # zipf < 5.5
+COMMON = 3         # basic words
+
+TIER_SCORES = (100, 85, 65, 40)
+ADVANCED_ZIPF = 3.5
+
+# Số từ phổ biến nhất lấy từ wordfreq; đủ để phủ mọi từ có zipf >= 3.5
+DEFAULT_MAX_WORDS = 60000
+
+
+def tier_for_zipf(zipf: float) -> int:
+    if zipf < 3.5:
+        return ADVANCED
+    if zipf < 4.5:
+        return BUSINESS
+    if zipf < 5.5:
+        return INTERMEDIATE
+    return COMMON
+
+
+@lru_cache(maxsize=16384)
+def _fallback_tier(word: str) -> int:
+    """Từ không có trong bảng (hiếm hoặc wordfreq tách token khác) -> tra wordfreq một lần rồi nhớ lại."""
+    return tier_for_zipf(zipf_frequency(word, 'en'))
+
+
+class WordTierTable:
+    """
+    Bảng word -> tier tính sẵn một lần.
+
+    Chỉ lưu các từ có zipf >= 3.5 (các tier không phải ADVANCED); từ không có
+    trong bảng đi qua _fallback_tier nên kết quả luôn giống zipf_frequency.
+    """
+
+    def __init__(self, tiers: Dict[str, int]):
+        self._tiers = tiers
+
+    def __len__(self) -> int:
+        return len(self._tiers)
+
+    def tier(self, word: str) -> int:
+        tier = self._tiers.get(word)
+        if tier is None:
+            tier = _fallback_tier(word)
+        return tier
+
+    @classmethod
+    def build(cls, max_words: int = DEFAULT_MAX_WORDS) -> "WordTierTable":
+        tiers = {}
+        for word in top_n_list('en', max_words):
+            zipf = zipf_frequency(word, 'en')
+            if zipf < ADVANCED_ZIPF:
+                break  # top_n_list sắp xếp giảm dần theo tần suất
+            tiers[word] = tier_for_zipf(zipf)
+        return cls(tiers)
+
+    @classmethod
+    def load(cls, path: str) -> "WordTierTable":
+        tiers = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                word, _, tier = line.rstrip("\n").partition("\t")
+                if word and tier:
+                    tiers[word] = int(tier)
+        return cls(tiers)
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for word, tier in self._tiers.items():
+                f.write(f"{word}\t{tier}\n")
+        os.replace(tmp_path, path)
+
+
+_table: Optional[WordTierTable] = None
+_table_lock = threading.Lock()
+
+
+def get_word_tiers(path: str = None) -> WordTierTable:
+    """
+    Bảng dùng chung cho cả process, tạo ở lần gọi đầu tiên.
+    Nếu có `path`: đọc từ file nếu đã tồn tại, ngược lại build từ wordfreq rồi ghi ra file.
+    """
+    global _table
+    if _table is not None:
+        return _table
+    with _table_lock:
+        if _table is None:
+            if path and os.path.exists(path):
+                _table = WordTierTable.load(path)
+            else:
+                _table = WordTierTable.build()
+                if path:
+                    _table.save(path)
+            print(f"[Vocabulary] Word tier table ready ({len(_table)} words)")
+    return _table